@@ -0,0 +1,5 @@
+"""
+Benchmark and calibration tooling for the watermarking engines.
+
+Run from the backend directory, e.g. ``python -m benchmarks.calibrate_screening``.
+"""
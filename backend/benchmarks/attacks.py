@@ -0,0 +1,47 @@
+"""
+Parameterized image attacks used by the calibration and robustness tooling.
+"""
+
+import cv2
+import numpy as np
+
+
+def jpeg(image: np.ndarray, quality: int) -> np.ndarray:
+    """Re-encode as JPEG at the given quality."""
+    ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+
+def crop(image: np.ndarray, top: int, left: int, keep: float = 1.0) -> np.ndarray:
+    """Drop `top` rows and `left` columns, then keep a `keep` fraction of the remaining size."""
+    h, w = image.shape[:2]
+    height = int((h - top) * keep)
+    width = int((w - left) * keep)
+    return image[top:top + height, left:left + width].copy()
+
+
+def noise(image: np.ndarray, sigma: float, seed: int = 0) -> np.ndarray:
+    """Add Gaussian pixel noise."""
+    rng = np.random.RandomState(seed)
+    return np.clip(image + rng.randn(*image.shape) * sigma, 0, 255).astype(np.uint8)
+
+
+def rotate(image: np.ndarray, degrees: float) -> np.ndarray:
+    """Rotate about the centre, keeping the canvas size (borders are reflected)."""
+    h, w = image.shape[:2]
+    transform = cv2.getRotationMatrix2D((w / 2, h / 2), degrees, 1.0)
+    return cv2.warpAffine(image, transform, (w, h), borderMode=cv2.BORDER_REFLECT)
+
+
+def scale(image: np.ndarray, factor: float) -> np.ndarray:
+    """Zoom about the centre by `factor`, keeping the canvas size (borders are reflected)."""
+    h, w = image.shape[:2]
+    transform = cv2.getRotationMatrix2D((w / 2, h / 2), 0.0, factor)
+    return cv2.warpAffine(image, transform, (w, h), borderMode=cv2.BORDER_REFLECT)
+
+
+def resize(image: np.ndarray, factor: float) -> np.ndarray:
+    """Change the pixel dimensions by `factor` (area interpolation when shrinking)."""
+    h, w = image.shape[:2]
+    interpolation = cv2.INTER_AREA if factor < 1 else cv2.INTER_LINEAR
+    return cv2.resize(image, (max(1, int(round(w * factor))), max(1, int(round(h * factor)))), interpolation=interpolation)
@@ -0,0 +1,173 @@
+"""
+Calibrate the negative-screening threshold of WatermarkExtractor.screen_watermark.
+
+The screen lets an image through when some (region, step) candidate has a lattice
+coherence of at least SCREEN_MIN_COHERENCE *and* passes a structural check (the
+legacy "INV" header or a tiled sync marker at the origin, or a tile grid found by the
+extractor's grid search when the image was cropped). The statistic that decides this is
+therefore the highest coherence among the structurally valid candidates
+(`valid_coherence`), which is measured on
+
+- clean images, also re-encoded and resized the way uploads usually are
+  (these should be screened out), and
+- watermarked copies (both layouts, every DWT level, several alphas, mild attacks)
+  that the full extractor can still decode (these must never be screened out).
+
+The corpus is the photographs and scans bundled with scikit-image plus synthetic
+images at two sizes. The suggested threshold is the target-FNR quantile of the
+decodable scores, rounded down to three decimals; SCREEN_MIN_COHERENCE is set to it
+(tests/test_screening.py checks the two agree). The false-negative and clean-rejection
+rates of the complete screen are reported at the current threshold. The result is
+written to screening_calibration.json next to this script.
+
+    python -m benchmarks.calibrate_screening [--images DIR] [--fnr 0.001]
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+from typing import Optional
+
+import numpy as np
+
+from benchmarks import attacks
+from benchmarks.corpus import load_images, sample_photographs, synthetic_corpus
+from src.core.embedding import WatermarkEmbedder
+from src.core.extraction import ALPHA_CANDIDATES, BASE_DELTA, SCREEN_MIN_COHERENCE, WatermarkExtractor
+from src.core.layout import SUPPORTED_LAYOUTS, SUPPORTED_LEVELS
+
+OUTPUT_PATH = os.path.join(os.path.dirname(__file__), "screening_calibration.json")
+SYNTHETIC_SIZES = [(384, 512), (768, 1024)]
+ALPHAS = (0.3, 1.0, 2.0, 5.0)
+ATTACKS = {
+    "none": lambda img: img,
+    "jpeg95": lambda img: attacks.jpeg(img, 95),
+    "jpeg90": lambda img: attacks.jpeg(img, 90),
+    "crop": lambda img: attacks.crop(img, 17, 29),
+    "noise1": lambda img: attacks.noise(img, 1.0),
+}
+# Clean images arrive as they were saved, so they are also measured after the usual re-encodings
+CLEAN_VARIANTS = {
+    "original": lambda img: img,
+    "jpeg85": lambda img: attacks.jpeg(img, 85),
+    "resize75": lambda img: attacks.resize(img, 0.75),
+}
+
+
+def valid_coherence(extractor: WatermarkExtractor, image: np.ndarray) -> Optional[float]:
+    """
+    Highest coherence among the structurally valid (region, step) candidates of all levels,
+    without the threshold: 0.0 if there is none, None if the image is too small to be screened.
+    Like the screen, a tiled grid away from the origin is found by the extractor's grid search.
+    """
+    deltas = BASE_DELTA * np.asarray(ALPHA_CANDIDATES, dtype=float)
+    regions = [region for level in SUPPORTED_LEVELS for region in extractor._screen_regions(image, level)]
+    if not regions:
+        return None
+    coherence = extractor._lattice_coherence(np.stack([sample for sample, _, _ in regions]), deltas)
+    best = 0.0
+    for (_, quick_check, _), scores in zip(regions, coherence):
+        passed = quick_check(deltas)
+        if passed.any():
+            best = max(best, float(scores[passed].max()))
+    for level in SUPPORTED_LEVELS:
+        tiled = [index for index, (_, _, tiled_level) in enumerate(regions) if tiled_level == level]
+        grid = extractor._locate_tile_grid(image, deltas, level) if tiled else None
+        if grid is not None:
+            k = int(np.flatnonzero(deltas == grid[3])[0])
+            best = max(best, float(coherence[tiled, k].max()))
+    return best
+
+
+def _summary(scores: np.ndarray) -> dict:
+    if not len(scores):
+        return {}
+    return {
+        "min": float(scores.min()),
+        "p01": float(np.quantile(scores, 0.01)),
+        "median": float(np.median(scores)),
+        "p99": float(np.quantile(scores, 0.99)),
+        "max": float(scores.max()),
+    }
+
+
+def calibrate(corpus, target_fnr: float) -> dict:
+    embedder = WatermarkEmbedder()
+    extractor = WatermarkExtractor()
+    clean_scores, clean_passed = [], []
+    positive_scores, positive_passed = [], []
+    undecodable = skipped = 0
+
+    for name, image in corpus:
+        for variant in CLEAN_VARIANTS.values():
+            clean = variant(image)
+            score = valid_coherence(extractor, clean)
+            if score is None:
+                skipped += 1
+                continue
+            clean_scores.append(score)
+            clean_passed.append(extractor.screen_watermark(clean)[0])
+        for layout in SUPPORTED_LAYOUTS:
+            for level in SUPPORTED_LEVELS:
+                for alpha in ALPHAS:
+                    try:
+                        watermarked = embedder.embed_watermark_dwt_qim(image, "calibration", alpha, layout=layout, level=level)
+                    except ValueError:
+                        skipped += 1  # Too small for this layout and level
+                        continue
+                    for attack in ATTACKS.values():
+                        attacked = attack(watermarked)
+                        ok, _, _ = extractor.extract_multi_delta(attacked, screen=False)
+                        if not ok:
+                            undecodable += 1
+                            continue
+                        score = valid_coherence(extractor, attacked)
+                        if score is None:
+                            skipped += 1
+                            continue
+                        positive_scores.append(score)
+                        positive_passed.append(extractor.screen_watermark(attacked)[0])
+
+    clean = np.array(clean_scores)
+    positive = np.array(positive_scores)
+    threshold = math.floor(np.quantile(positive, target_fnr) * 1000) / 1000 if len(positive) else SCREEN_MIN_COHERENCE
+    return {
+        "target_false_negative_rate": target_fnr,
+        "suggested_threshold": threshold,
+        "current_threshold": SCREEN_MIN_COHERENCE,
+        "decodable_samples": len(positive),
+        "undecodable_samples": undecodable,
+        "clean_samples": len(clean),
+        "skipped_samples": skipped,
+        "false_negative_rate": float(1.0 - np.mean(positive_passed)) if positive_passed else None,
+        "clean_rejection_rate": float(1.0 - np.mean(clean_passed)) if clean_passed else None,
+        # Clean images with a structurally valid candidate above the threshold (before the search budget)
+        "clean_above_threshold": float(np.mean(clean >= SCREEN_MIN_COHERENCE)) if len(clean) else None,
+        "positive_valid_coherence": _summary(positive),
+        "clean_valid_coherence": _summary(clean),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="Directory of sample images to add to the corpus")
+    parser.add_argument("--fnr", type=float, default=0.001, help="Target false-negative rate")
+    parser.add_argument("--seeds", type=int, default=2, help="Synthetic images per kind and size")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    corpus = list(sample_photographs())
+    corpus.extend(synthetic_corpus(SYNTHETIC_SIZES, seeds=range(args.seeds)))
+    if args.images:
+        corpus.extend(load_images(args.images))
+
+    result = calibrate(corpus, args.fnr)
+    with open(OUTPUT_PATH, "w") as f:
+        json.dump(result, f, indent=2)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Deterministic benchmark corpus.
+
+Synthetic images are generated from a fixed seed so every machine (and every commit)
+benchmarks exactly the same pixels. Real sample images can be added with ``load_images``;
+``sample_photographs`` yields the photographs and scans bundled with scikit-image.
+"""
+
+import os
+from typing import Iterator
+
+import cv2
+import numpy as np
+
+KINDS = ("photo", "texture", "gradient", "document")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+# Real images shipped with scikit-image (no download needed): photographs, microscopy,
+# astronomy, textures and scanned text
+SAMPLE_PHOTOGRAPHS = (
+    "astronaut", "camera", "coffee", "chelsea", "rocket", "hubble_deep_field", "immunohistochemistry",
+    "retina", "moon", "page", "text", "coins", "brick", "grass", "gravel", "colorwheel",
+)
+
+
+def synthetic_image(kind: str, height: int, width: int, seed: int = 0) -> np.ndarray:
+    """Generate a deterministic BGR test image of the given kind."""
+    rng = np.random.RandomState(seed)
+
+    if kind == "photo":
+        # Multi-scale smoothed noise: broad shading plus mid-frequency detail, like a natural photo
+        image = np.zeros((height, width, 3), dtype=np.float32)
+        for scale, weight in ((64, 0.6), (16, 0.3), (4, 0.1)):
+            small = rng.rand(max(height // scale, 2), max(width // scale, 2), 3).astype(np.float32)
+            image += weight * cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+        image = np.clip(image * 255, 0, 255)
+    elif kind == "texture":
+        # High-frequency texture: the hardest case for the lattice residual statistic
+        image = cv2.GaussianBlur(rng.rand(height, width, 3).astype(np.float32) * 255, (3, 3), 0)
+    elif kind == "gradient":
+        # Smooth gradient with a little noise (sky, studio backdrops)
+        y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+        base = 40 + 160 * (x / max(width - 1, 1)) * 0.5 + 160 * (y / max(height - 1, 1)) * 0.5
+        image = np.dstack([base, base * 0.9 + 10, base * 0.8 + 20]) + rng.randn(height, width, 3) * 2
+    elif kind == "document":
+        # Mostly flat paper with dark strokes (scans, screenshots)
+        image = np.full((height, width, 3), 235, dtype=np.float32)
+        for _ in range(max(height // 12, 1)):
+            y0 = rng.randint(0, height)
+            x0 = rng.randint(0, max(width - 10, 1))
+            x1 = min(width, x0 + rng.randint(10, max(width // 2, 11)))
+            cv2.line(image, (int(x0), int(y0)), (int(x1), int(y0)), (30, 30, 30), int(rng.randint(1, 3)))
+        image += rng.randn(height, width, 3) * 1.5
+    else:
+        raise ValueError(f"Unknown synthetic image kind: {kind}")
+
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def synthetic_corpus(sizes: list[tuple[int, int]], kinds=KINDS, seeds=range(3)) -> Iterator[tuple[str, np.ndarray]]:
+    """Yield (name, image) for every size x kind x seed combination."""
+    for height, width in sizes:
+        for kind in kinds:
+            for seed in seeds:
+                yield f"{kind}_{width}x{height}_s{seed}", synthetic_image(kind, height, width, seed)
+
+
+def load_images(directory: str) -> Iterator[tuple[str, np.ndarray]]:
+    """Yield (name, image) for the sample images in a directory (sorted, so the order is stable)."""
+    for filename in sorted(os.listdir(directory)):
+        if filename.lower().endswith(IMAGE_EXTENSIONS):
+            image = cv2.imread(os.path.join(directory, filename), cv2.IMREAD_COLOR)
+            if image is not None:
+                yield filename, image
+
+
+def sample_photographs(names=SAMPLE_PHOTOGRAPHS) -> Iterator[tuple[str, np.ndarray]]:
+    """Yield (name, image) for the bundled scikit-image samples as BGR uint8."""
+    from skimage import data
+
+    for name in names:
+        image = getattr(data, name)()
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        else:
+            image = cv2.cvtColor(image[..., :3], cv2.COLOR_RGB2BGR)
+        yield name, np.ascontiguousarray(image)
+
+
+def megapixel_size(megapixels: float, aspect: float = 4 / 3) -> tuple[int, int]:
+    """(height, width) of a 4:3 image with roughly the given number of megapixels."""
+    height = int(round((megapixels * 1e6 / aspect) ** 0.5))
+    return height, int(round(height * aspect))
@@ -0,0 +1,238 @@
+"""
+Stage-level benchmarks for the embed / extract / verify engines.
+
+Every stage runs on deterministic synthetic images (and optional sample images) at
+several resolutions. For each (image, stage) the report contains p50/p99/mean latency,
+throughput in megapixels per second and the peak traced memory of one extra, untimed
+run (tracemalloc; numpy and OpenCV buffers are included).
+
+    python -m benchmarks.engines                       # 0.3, 2, 12 and 48 MP
+    python -m benchmarks.engines --sizes 0.3 2 --repeat 10 --output /tmp/new.json
+    python -m benchmarks.engines --sizes 0.3 2 --compare benchmarks/baselines/engines.json
+
+Results are written as JSON (default: baselines/engines.json next to this script) together
+with the git commit and machine information, so two runs can be diffed with --compare.
+Latencies are wall-clock seconds; repeats stop early once a stage has used --max-seconds.
+Stages that raise are recorded with their error. The committed baseline covers 0.3-12 MP:
+at 48 MP the full-frame SSIM in the metrics stage needs more memory than a 6 GB machine has.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from typing import Callable
+
+import cv2
+import numpy as np
+
+from benchmarks.corpus import load_images, megapixel_size, synthetic_image
+from src.core.embedding import BASE_DELTA, WatermarkEmbedder
+from src.core.extraction import WatermarkExtractor
+from src.core.geometry import GeometryProcessor
+from src.core.layout import LAYOUT_TILED, TILE_SIZE, haar_ll
+from src.services.watermark import WatermarkService
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "engines.json")
+DEFAULT_SIZES = (0.3, 2.0, 12.0, 48.0)
+STAGES = (
+    "decode", "color_conversion", "dwt", "qim", "rs_encode", "rs_decode",
+    "embed", "verify", "extract_unmarked", "dct_fallback", "orb_alignment", "metrics", "encode",
+)
+PAYLOAD = "benchmark payload"
+RS_BYTE_ERRORS = 10  # Corrupted bytes per packet for the rs_decode stage
+REGRESSION_RATIO = 1.2  # --compare flags stages whose p50 grew by more than this factor
+
+
+class Fixture:
+    """Inputs shared by the stages of one image, prepared once outside the timed region."""
+
+    def __init__(self, image: np.ndarray, embedder: WatermarkEmbedder):
+        self.image = image
+        self.png = cv2.imencode(".png", image)[1].tobytes()
+        self.y = cv2.cvtColor(image, cv2.COLOR_BGR2YUV)[:, :, 0].astype(np.float32)
+        self.ll = haar_ll(self.y, symmetric=True)
+        self.watermarked = embedder.embed_watermark_dwt_qim(image, PAYLOAD, 1.0, layout=LAYOUT_TILED)
+        # A rotated and rescaled copy for feature-based alignment
+        h, w = image.shape[:2]
+        transform = cv2.getRotationMatrix2D((w / 2, h / 2), 2.0, 0.98)
+        self.rotated = cv2.warpAffine(self.watermarked, transform, (w, h))
+        packet = embedder.codec.bits_to_packet(embedder.text_to_bits(PAYLOAD))
+        rng = np.random.RandomState(0)
+        for pos in rng.choice(len(packet), RS_BYTE_ERRORS, replace=False):
+            packet[pos] ^= 0xFF
+        self.corrupted_packet = packet
+
+
+def stage_functions(fixture: Fixture, embedder: WatermarkEmbedder, extractor: WatermarkExtractor,
+                    geometry: GeometryProcessor, service: WatermarkService) -> dict[str, Callable[[], object]]:
+    bits = embedder.text_to_bits(PAYLOAD)
+    grid = (fixture.ll.shape[0] // TILE_SIZE, fixture.ll.shape[1] // TILE_SIZE)
+
+    def qim():
+        plane = embedder._bit_plane(0, fixture.ll.shape[0], fixture.ll.shape[1], bits, LAYOUT_TILED, grid)
+        mask = plane >= 0
+        return embedder._qim_embed(fixture.ll[mask], plane[mask], BASE_DELTA)
+
+    def metrics():
+        return service._calculate_psnr(fixture.image, fixture.watermarked), service._calculate_ssim(fixture.image, fixture.watermarked)
+
+    return {
+        "decode": lambda: cv2.imdecode(np.frombuffer(fixture.png, np.uint8), cv2.IMREAD_COLOR),
+        "color_conversion": lambda: cv2.cvtColor(fixture.image, cv2.COLOR_BGR2YUV),
+        "dwt": lambda: haar_ll(fixture.y, symmetric=True),
+        "qim": qim,
+        # _encode_text bypasses the payload cache so the Reed-Solomon encoder really runs
+        "rs_encode": lambda: embedder.codec._encode_text(PAYLOAD),
+        "rs_decode": lambda: embedder.codec.decode(fixture.corrupted_packet),
+        "embed": lambda: embedder.embed_watermark_dwt_qim(fixture.image, PAYLOAD, 1.0, layout=LAYOUT_TILED),
+        "verify": lambda: extractor.extract_multi_delta(fixture.watermarked),
+        # Failure path of /extract: every registered method runs and none decodes
+        "extract_unmarked": lambda: service.orchestrator.run(fixture.image),
+        "dct_fallback": lambda: extractor.extract_watermark_dct(fixture.watermarked),
+        "orb_alignment": lambda: geometry.align_image(fixture.watermarked, fixture.rotated),
+        "metrics": metrics,
+        "encode": lambda: cv2.imencode(".png", fixture.watermarked),
+    }
+
+
+def measure(func: Callable[[], object], repeat: int, max_seconds: float) -> dict:
+    """Time `func` (after one warm-up call) and measure its peak traced memory."""
+    func()
+    samples = []
+    budget_start = time.perf_counter()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+        if time.perf_counter() - budget_start > max_seconds:
+            break
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    samples = np.array(samples)
+    return {
+        "samples": len(samples),
+        "p50_s": float(np.percentile(samples, 50)),
+        "p99_s": float(np.percentile(samples, 99)),
+        "mean_s": float(samples.mean()),
+        "peak_mb": round(peak / 2**20, 2),
+    }
+
+
+def run(images: list[tuple[str, np.ndarray]], stages, repeat: int, max_seconds: float) -> dict:
+    embedder = WatermarkEmbedder()
+    extractor = WatermarkExtractor()
+    geometry = GeometryProcessor()
+    service = WatermarkService()
+    results = {}
+    for name, image in images:
+        megapixels = image.shape[0] * image.shape[1] / 1e6
+        fixture = Fixture(image, embedder)
+        functions = stage_functions(fixture, embedder, extractor, geometry, service)
+        results[name] = {"megapixels": round(megapixels, 3), "stages": {}}
+        for stage in stages:
+            try:
+                result = measure(functions[stage], repeat, max_seconds)
+            except Exception as e:
+                # Record the failure (e.g. MemoryError) and keep benchmarking the other stages
+                results[name]["stages"][stage] = {"error": f"{type(e).__name__}: {e}"}
+                print(f"{name:>24} {stage:>16}  failed: {type(e).__name__}: {e}", flush=True)
+                continue
+            result["throughput_mp_s"] = round(megapixels / result["p50_s"], 2) if result["p50_s"] > 0 else None
+            results[name]["stages"][stage] = result
+            print(f"{name:>24} {stage:>16}  p50 {result['p50_s'] * 1e3:9.2f} ms  p99 {result['p99_s'] * 1e3:9.2f} ms  "
+                  f"peak {result['peak_mb']:8.1f} MB", flush=True)
+    return results
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(current: dict, baseline: dict) -> list[str]:
+    """Print p50 ratios against a baseline; return the regressed (image, stage) pairs."""
+    regressions = []
+    print(f"\nCompared with baseline from commit {baseline['environment'].get('commit')}:")
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        for stage, stats in result["stages"].items():
+            base_stats = base["stages"].get(stage)
+            if base_stats is None or not base_stats.get("p50_s") or "p50_s" not in stats:
+                continue
+            ratio = stats["p50_s"] / base_stats["p50_s"]
+            flag = "  REGRESSION" if ratio > REGRESSION_RATIO else ""
+            print(f"{name:>24} {stage:>16}  p50 x{ratio:5.2f}  peak {base_stats['peak_mb']:8.1f} -> {stats['peak_mb']:8.1f} MB{flag}")
+            if flag:
+                regressions.append(f"{name}/{stage}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=float, nargs="+", default=DEFAULT_SIZES, help="Synthetic image sizes in megapixels")
+    parser.add_argument("--kind", default="photo", help="Synthetic image kind (see benchmarks.corpus.KINDS)")
+    parser.add_argument("--images", help="Directory of sample images to benchmark as well")
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES, metavar="STAGE", help=f"Stages to run: {', '.join(STAGES)}")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per stage")
+    parser.add_argument("--max-seconds", type=float, default=10.0, help="Stop repeating a stage after this long")
+    parser.add_argument("--output", default=BASELINE_PATH, help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Baseline JSON to compare against (exit status 1 on regressions)")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        # Read first: the baseline may be the file this run is about to overwrite
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    logging.disable(logging.CRITICAL)
+    cv2.setRNGSeed(0)
+    images = []
+    for megapixels in args.sizes:
+        height, width = megapixel_size(megapixels)
+        images.append((f"{args.kind}_{megapixels:g}mp", synthetic_image(args.kind, height, width, seed=0)))
+    if args.images:
+        images.extend(load_images(args.images))
+
+    report = {
+        "environment": environment(),
+        "settings": {"repeat": args.repeat, "max_seconds": args.max_seconds, "kind": args.kind},
+        "results": run(images, args.stages, args.repeat, args.max_seconds),
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+    if baseline is not None:
+        regressions = compare(report, baseline)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) regressed by more than x{REGRESSION_RATIO}")
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Robustness-versus-cost evaluation harness.
+
+Embeds a payload with every method and strength (alpha), applies a matrix of
+parameterized attacks and runs the matching WatermarkExtractor method on each
+attacked copy. For every (image, method, alpha, attack) it records
+- decode success (the decoded text equals the payload),
+- raw bit-error rate and the number of wrong payload bytes at the embedding
+  positions (a packet decodes while 2 * byte errors <= N_ECC_SYMBOLS), and
+- time per extraction attempt.
+
+The work is spread over a process pool (one task per image x method x alpha) and
+summarised as an attack x method matrix, e.g. to tune alpha, N_ECC_SYMBOLS and the
+order of the fallbacks against both robustness and latency.
+
+    python -m benchmarks.robustness
+    python -m benchmarks.robustness --alphas 0.5 1 2 --methods tiled multi_delta --workers 8
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from benchmarks import attacks
+from benchmarks.corpus import KINDS, synthetic_image
+from src.core.embedding import BASE_DELTA, WatermarkEmbedder
+from src.core.extraction import WatermarkExtractor
+from src.core.layout import LAYOUT_LEGACY, LAYOUT_TILED, PAYLOAD_BITS, SYNC_BITS, TILE_SIZE, haar_ll, tile_slot_positions
+
+OUTPUT_PATH = os.path.join(os.path.dirname(__file__), "robustness.json")
+PAYLOAD = "robustness"
+DEFAULT_ALPHAS = (0.5, 1.0, 2.0, 5.0)
+DEFAULT_SIZE = (384, 512)
+
+ATTACKS = {
+    "none": lambda image: image,
+    **{f"jpeg{q}": partial(attacks.jpeg, quality=q) for q in (95, 90, 80, 70, 50)},
+    **{f"rotate{d:g}": partial(attacks.rotate, degrees=d) for d in (0.5, 2.0, 5.0)},
+    **{f"scale{f:g}": partial(attacks.scale, factor=f) for f in (0.9, 1.1)},
+    **{f"resize{f:g}": partial(attacks.resize, factor=f) for f in (0.5, 0.75, 1.5)},
+    "crop_top_left": partial(attacks.crop, top=17, left=29),
+    "crop_90pct": partial(attacks.crop, top=0, left=0, keep=0.9),
+    **{f"noise{s:g}": partial(attacks.noise, sigma=s) for s in (1.0, 3.0, 8.0)},
+}
+
+# method -> (layout used for embedding, or "dct")
+METHODS = {
+    "dwt_qim": LAYOUT_LEGACY,
+    "tiled": LAYOUT_TILED,
+    "multi_delta": LAYOUT_TILED,
+    "dct": "dct",
+}
+
+_embedder: Optional[WatermarkEmbedder] = None
+_extractor: Optional[WatermarkExtractor] = None
+
+
+def _init_worker():
+    """Per-process engines (created once per worker, not per task)."""
+    global _embedder, _extractor
+    logging.disable(logging.CRITICAL)
+    cv2.setNumThreads(1)  # the pool already provides the parallelism
+    _embedder = WatermarkEmbedder()
+    _extractor = WatermarkExtractor()
+
+
+@lru_cache(maxsize=8)
+def _load(spec: tuple) -> np.ndarray:
+    """Image for a spec: ("synthetic", kind, height, width, seed) or ("file", path)."""
+    if spec[0] == "file":
+        return cv2.imread(spec[1], cv2.IMREAD_COLOR)
+    _, kind, height, width, seed = spec
+    return synthetic_image(kind, height, width, seed)
+
+
+def _extract(method: str, image: np.ndarray, alpha: float) -> str:
+    if method == "dwt_qim":
+        return _extractor.extract_watermark_dwt_qim(image, alpha)
+    if method == "tiled":
+        return _extractor.extract_watermark_tiled(image, alpha)[1]
+    if method == "multi_delta":
+        return _extractor.extract_multi_delta(image)[1]
+    return _extractor.extract_watermark_dct(image)
+
+
+def _raw_bits(method: str, image: np.ndarray, alpha: float) -> Optional[np.ndarray]:
+    """Hard-decision payload bits at the embedding positions (None if the image is too small)."""
+    delta = BASE_DELTA * alpha
+    if method == "dwt_qim":
+        strip = _extractor._legacy_strip(image)
+        return None if strip is None else _extractor._qim_bits(strip, delta)
+    if method == "dct":
+        return np.array(_extractor._dct_bits(image), dtype=np.uint8)
+    # Tiled: the tile the grid locator picks (the top-left tile if the marker is lost)
+    grid = _extractor._locate_tile_grid(image, np.array([delta]))
+    top, left = (grid[0], grid[1]) if grid is not None else (0, 0)
+    span = 2 * TILE_SIZE
+    tile = image[top:top + span, left:left + span]
+    if tile.shape[0] < span or tile.shape[1] < span:
+        return None
+    coeffs = haar_ll(_extractor._luma(tile))[tile_slot_positions(SYNC_BITS + PAYLOAD_BITS)]
+    return _extractor._qim_bits(coeffs, delta)[SYNC_BITS:]
+
+
+def evaluate(task: tuple) -> list[dict]:
+    """Embed once, then run every attack; returns one row per attack."""
+    name, spec, method, alpha = task
+    image = _load(spec)
+    expected = _embedder.text_to_bits(PAYLOAD)
+    layout = METHODS[method]
+    if layout == "dct":
+        watermarked = _embedder.embed_watermark_dct(image, PAYLOAD, alpha)
+    else:
+        watermarked = _embedder.embed_watermark_dwt_qim(image, PAYLOAD, alpha, layout=layout)
+
+    rows = []
+    for attack_name, attack in ATTACKS.items():
+        attacked = attack(watermarked)
+        start = time.perf_counter()
+        text = _extract(method, attacked, alpha)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        bits = _raw_bits(method, attacked, alpha)
+        if bits is None or len(bits) < len(expected):
+            ber, byte_errors = None, None
+        else:
+            wrong = bits[:len(expected)] != expected
+            ber = float(wrong.mean())
+            byte_errors = int(wrong.reshape(-1, 8).any(axis=1).sum())
+        rows.append({
+            "image": name, "method": method, "alpha": alpha, "attack": attack_name,
+            "success": text == PAYLOAD, "ber": ber, "byte_errors": byte_errors,
+            "time_ms": round(elapsed_ms, 3),
+        })
+    return rows
+
+
+def summarize(rows: list[dict], methods) -> dict:
+    """attack -> method -> {success_rate, mean_ber, mean_byte_errors, mean_ms, p99_ms}."""
+    matrix = {}
+    for attack_name in ATTACKS:
+        matrix[attack_name] = {}
+        for method in methods:
+            cell = [r for r in rows if r["attack"] == attack_name and r["method"] == method]
+            if not cell:
+                continue
+            bers = [r["ber"] for r in cell if r["ber"] is not None]
+            byte_errors = [r["byte_errors"] for r in cell if r["byte_errors"] is not None]
+            times = [r["time_ms"] for r in cell]
+            matrix[attack_name][method] = {
+                "success_rate": round(float(np.mean([r["success"] for r in cell])), 3),
+                "mean_ber": round(float(np.mean(bers)), 4) if bers else None,
+                "mean_byte_errors": round(float(np.mean(byte_errors)), 1) if byte_errors else None,
+                "mean_ms": round(float(np.mean(times)), 2),
+                "p99_ms": round(float(np.percentile(times, 99)), 2),
+            }
+    return matrix
+
+
+def print_matrix(matrix: dict, methods):
+    header = f"{'attack':>16} " + " ".join(f"{m:>26}" for m in methods)
+    print(header)
+    print(f"{'':>16} " + " ".join(f"{'success  BER    ms':>26}" for _ in methods))
+    for attack_name, cells in matrix.items():
+        line = f"{attack_name:>16} "
+        for method in methods:
+            cell = cells.get(method)
+            if cell is None:
+                line += f"{'-':>26} "
+                continue
+            ber = f"{cell['mean_ber']:.3f}" if cell["mean_ber"] is not None else "  n/a"
+            line += f"{cell['success_rate'] * 100:>13.0f}% {ber:>6} {cell['mean_ms']:>5.0f} "
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--alphas", type=float, nargs="+", default=DEFAULT_ALPHAS)
+    parser.add_argument("--methods", nargs="+", default=list(METHODS), choices=list(METHODS))
+    parser.add_argument("--kinds", nargs="+", default=list(KINDS), choices=list(KINDS))
+    parser.add_argument("--seeds", type=int, default=2, help="Synthetic images per kind")
+    parser.add_argument("--size", type=int, nargs=2, default=DEFAULT_SIZE, metavar=("HEIGHT", "WIDTH"))
+    parser.add_argument("--images", help="Directory of sample images to evaluate as well")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    args = parser.parse_args()
+
+    specs = [(f"{kind}_s{seed}", ("synthetic", kind, args.size[0], args.size[1], seed))
+             for kind in args.kinds for seed in range(args.seeds)]
+    if args.images:
+        specs += [(f, ("file", os.path.join(args.images, f))) for f in sorted(os.listdir(args.images))
+                  if f.lower().endswith((".png", ".jpg", ".jpeg"))]
+    tasks = [(name, spec, method, alpha) for name, spec in specs for method in args.methods for alpha in args.alphas]
+
+    start = time.perf_counter()
+    rows = []
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool:
+        for task_rows in pool.map(evaluate, tasks):
+            rows.extend(task_rows)
+    print(f"{len(rows)} extraction attempts in {time.perf_counter() - start:.1f}s on {args.workers} workers\n")
+
+    matrix = summarize(rows, args.methods)
+    print_matrix(matrix, args.methods)
+    per_alpha = {alpha: summarize([r for r in rows if r["alpha"] == alpha], args.methods) for alpha in args.alphas}
+    with open(args.output, "w") as f:
+        json.dump({"settings": vars(args), "matrix": matrix, "by_alpha": per_alpha, "rows": rows}, f, indent=1)
+    print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+"""
+Offline bulk watermarking and verification
+
+Processes large image collections directly with WatermarkEmbedder and
+WatermarkExtractor, bypassing the HTTP API (no multipart upload, JSON, copies in
+static/processed or re-downloads):
+
+    python bulk.py embed photos/ --text "(c) ACME" --output watermarked/
+    python bulk.py verify watermarked/ --expect "(c) ACME"
+    find /archive -name '*.jpg' | python bulk.py embed --from-list - --text "(c) ACME" --output out/
+
+Inputs are files, directories (searched recursively for images) and/or a list
+file with one path per line. Images are split into batches across a process
+pool. Within a worker, each batch runs as a pipeline: a reader thread prefetches
+and decodes the next image and a writer thread encodes and writes the previous
+PNG while the worker thread embeds the current one.
+
+Every result is appended to a JSONL manifest: input path, SHA-256 of the input
+bytes, output path, PSNR/SSIM (embed) or decoded text (verify), status and time.
+Outputs are written atomically and recorded only after they are on disk, so an
+interrupted run is resumed by starting the same command again: inputs already in
+the manifest with the same path and SHA-256 are skipped (failed ones too, unless
+--retry-failed is given). A file replaced since its record is processed again.
+
+Directory inputs keep their relative layout under --output (as .png, the only
+format that preserves the watermark). Single files and listed files are written by
+file name plus a short hash of their absolute path, so same-named files from
+different directories never overwrite each other; images in one directory that
+differ only by extension (x.jpg, x.png) are told apart the same way.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Iterable, Iterator, Optional
+
+from src.utils.logger import get_logger, setup_logging
+from src.utils.threads import apply_library_threads, library_thread_env
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+EMBED_MANIFEST = "manifest.jsonl"
+VERIFY_MANIFEST = "verify_manifest.jsonl"
+BATCH_SIZE = 16
+# Batches submitted per worker ahead of time, so no worker idles while results are written
+BATCHES_IN_FLIGHT = 2
+PREFETCH = 2
+PROGRESS_EVERY_S = 10.0
+HASH_CHUNK_BYTES = 1024 * 1024
+PATH_TAG_CHARS = 8
+
+# Terminal statuses: "ok" / "error" (embed), "verified" / "not_verified" / "mismatch" / "error" (verify)
+FAILED_STATUSES = ("error",)
+
+logger = get_logger("bulk")
+
+_job: Optional[dict] = None
+
+
+# --- inputs and manifest ---------------------------------------------------------------------
+
+def _tagged_name(path: str) -> str:
+    """Output file name that no other input path maps to: <stem>-<hash of the absolute path>.png."""
+    tag = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:PATH_TAG_CHARS]
+    return f"{os.path.splitext(os.path.basename(path))[0]}-{tag}.png"
+
+
+def iter_inputs(paths: Iterable[str], list_file: Optional[str] = None) -> Iterator[tuple[str, str]]:
+    """
+    Yield (input path, output path relative to --output) for every image, lazily so that
+    millions of inputs are never held in memory at once. The output path depends only on the
+    input path (and, within a directory, on its siblings), so a resumed run writes the same files.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            root = os.path.normpath(path)
+            for directory, subdirs, files in os.walk(root):
+                subdirs.sort()
+                images = sorted(name for name in files if name.lower().endswith(IMAGE_EXTENSIONS))
+                stems = [os.path.splitext(name)[0] for name in images]
+                counts = Counter(stems)
+                for name, stem in zip(images, stems):
+                    full = os.path.join(directory, name)
+                    # x.jpg and x.png would both become x.png
+                    output = _tagged_name(full) if counts[stem] > 1 else stem + ".png"
+                    relative = os.path.relpath(directory, root)
+                    yield full, os.path.normpath(os.path.join(os.path.basename(root), relative, output))
+        else:
+            yield path, _tagged_name(path)
+    if list_file:
+        stream = sys.stdin if list_file == "-" else open(list_file)
+        try:
+            for line in stream:
+                path = line.strip()
+                if path:
+                    yield path, _tagged_name(path)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+
+def load_manifest(path: str) -> dict[str, tuple[Optional[str], str]]:
+    """
+    Input path -> (SHA-256, status) of its latest record; the hash is None for inputs that could not be read.
+    A line cut off by an interrupted run is ignored.
+    """
+    records = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records[record["input"]] = (record.get("sha256"), record["status"])
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def file_sha256(path: str) -> Optional[str]:
+    """SHA-256 of a file's bytes (as recorded in the manifest), or None if it cannot be read."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def pending(inputs: Iterable[tuple[str, str]], done: dict[str, tuple[Optional[str], str]],
+            retry_failed: bool) -> Iterator[tuple[str, str]]:
+    """Inputs without a record for the same path and content (only recorded paths are hashed here)."""
+    for path, relative in inputs:
+        recorded = done.get(path)
+        if recorded is None:
+            yield path, relative
+            continue
+        digest, status = recorded
+        if retry_failed and status in FAILED_STATUSES:
+            yield path, relative
+        elif digest is not None and file_sha256(path) != digest:
+            yield path, relative
+
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# --- worker processes ------------------------------------------------------------------------
+
+def _init_worker(job: dict):
+    """Per-process engines (created once per worker, not per batch)."""
+    global _job
+    setup_logging(level=job["log_level"])
+    apply_library_threads()
+    from src.core.embedding import WatermarkEmbedder
+    from src.core.extraction import WatermarkExtractor
+    _job = dict(job, embedder=WatermarkEmbedder(), extractor=WatermarkExtractor())
+
+
+def _read(path: str):
+    from src.core.processor import ImageProcessor
+    with open(path, "rb") as f:
+        data = f.read()
+    return hashlib.sha256(data).hexdigest(), ImageProcessor.decode_image(data)
+
+
+def _write(path: str, image) -> str:
+    """Encode as PNG and replace `path` atomically, so a crash never leaves a truncated output."""
+    import cv2
+    ok, encoded = cv2.imencode(".png", image)
+    if not ok:
+        raise ValueError(f"Could not encode {path} as PNG")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(encoded.tobytes())
+    os.replace(temporary, path)
+    return path
+
+
+def _quality(original, watermarked, changed_rows: int) -> tuple[float, float]:
+    """PSNR (dB) and luma SSIM, computed on the rows the watermark changed."""
+    from src.core.quality import measure
+    metrics = measure(original, watermarked, changed_rows)
+    return metrics["psnr"], metrics["ssim"]
+
+
+def _embed_one(path: str, relative: str, read, writer: ThreadPoolExecutor) -> tuple[dict, Optional[object]]:
+    digest, image = read.result()
+    level = _job["level"] or 1
+    embedder = _job["embedder"]
+    watermarked = embedder.embed_watermark_dwt_qim(image, _job["text"], _job["alpha"], layout=_job["layout"], level=level)
+    psnr, ssim = _quality(image, watermarked, embedder.plan_embedding(image.shape, _job["text"], _job["layout"], level).embed_rows)
+    output = os.path.join(_job["output"], relative)
+    record = {"input": path, "sha256": digest, "output": output, "psnr": round(psnr, 2),
+              "ssim": round(ssim, 4), "level": level}
+    return record, writer.submit(_write, output, watermarked)
+
+
+def _verify_one(path: str, relative: str, read, writer: ThreadPoolExecutor) -> tuple[dict, None]:
+    digest, image = read.result()
+    levels = {"levels": (_job["level"],)} if _job["level"] else {}
+    text, metadata = _job["extractor"].extract_with_blind_alignment(image, **levels)
+    record = {"input": path, "sha256": digest}
+    if "error" in metadata:
+        record.update(status="not_verified", detail=metadata["error"])
+    else:
+        expected = _job["expect"]
+        record.update(status="mismatch" if expected is not None and text != expected else "verified", text=text)
+        for key in ("alpha_detected", "dwt_level"):
+            if key in metadata:
+                record[key] = metadata[key]
+    return record, None
+
+
+def process_batch(batch: list[tuple[str, str]]) -> list[dict]:
+    """Run one batch through the read -> embed/verify -> write pipeline and return its manifest records."""
+    step = _embed_one if _job["mode"] == "embed" else _verify_one
+    records = []
+    with ThreadPoolExecutor(1, thread_name_prefix="read") as reader, ThreadPoolExecutor(1, thread_name_prefix="write") as writer:
+        reads = deque()
+        items = iter(batch)
+        for item in items:
+            reads.append((item, reader.submit(_read, item[0])))
+            if len(reads) == PREFETCH:
+                break
+        writes = []
+        while reads:
+            (path, relative), read = reads.popleft()
+            following = next(items, None)
+            if following is not None:
+                reads.append((following, reader.submit(_read, following[0])))
+            start = time.perf_counter()
+            try:
+                record, write = step(path, relative, read, writer)
+            except Exception as e:
+                records.append({"input": path, "status": "error", "error": str(e) or type(e).__name__})
+                continue
+            record["ms"] = round((time.perf_counter() - start) * 1000, 1)
+            writes.append((record, write))
+        for record, write in writes:
+            if write is not None:
+                try:
+                    write.result()
+                    record["status"] = "ok"
+                except Exception as e:
+                    record.update(status="error", error=str(e) or type(e).__name__)
+            records.append(record)
+    return records
+
+
+# --- driver ----------------------------------------------------------------------------------
+
+def _terminate_last_line(path: str):
+    """A run killed mid-write leaves a partial last line; start the next record on a line of its own."""
+    try:
+        with open(path, "rb+") as f:
+            if f.seek(0, os.SEEK_END) == 0:
+                return
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+    except FileNotFoundError:
+        pass
+
+
+def run(job: dict, inputs: Iterable[tuple[str, str]], manifest_path: str, workers: int, batch_size: int) -> dict:
+    """Process `inputs` on a process pool, appending every result to the manifest as it arrives."""
+    counts: dict[str, int] = {}
+    started = last_report = time.monotonic()
+    os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+    _terminate_last_line(manifest_path)
+    batches = batched(inputs, batch_size)
+    with open(manifest_path, "a") as manifest, \
+            ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(job,)) as pool:
+        in_flight = set()
+        try:
+            while True:
+                for batch in batches:
+                    in_flight.add(pool.submit(process_batch, batch))
+                    if len(in_flight) >= workers * BATCHES_IN_FLIGHT:
+                        break
+                if not in_flight:
+                    break
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    for record in future.result():
+                        manifest.write(json.dumps(record, ensure_ascii=False) + "\n")
+                        counts[record["status"]] = counts.get(record["status"], 0) + 1
+                manifest.flush()
+                if time.monotonic() - last_report >= PROGRESS_EVERY_S:
+                    last_report = time.monotonic()
+                    done = sum(counts.values())
+                    logger.info("%d images (%.1f/s): %s", done, done / (last_report - started), counts)
+        except KeyboardInterrupt:
+            logger.warning("Interrupted; finished results are in %s, run the same command to resume", manifest_path)
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            manifest.flush()
+            os.fsync(manifest.fileno())
+    return counts
+
+
+def main():
+    # Single-threaded OpenCV/BLAS in every worker: the process pool already uses all cores.
+    # Set before NumPy is first imported (workers inherit it), or the BLAS limits have no effect.
+    for name, value in library_thread_env(1).items():
+        os.environ.setdefault(name, value)
+    from src.core.layout import LAYOUT_LEGACY, SUPPORTED_LAYOUTS, SUPPORTED_LEVELS
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=("embed", "verify"))
+    parser.add_argument("inputs", nargs="*", help="Image files and directories")
+    parser.add_argument("--from-list", metavar="FILE", help="File with one input path per line ('-' for stdin)")
+    parser.add_argument("--text", help="Watermark text (embed)")
+    parser.add_argument("--alpha", type=float, default=1.0, help="Embedding strength (embed)")
+    parser.add_argument("--layout", type=int, default=LAYOUT_LEGACY, choices=SUPPORTED_LAYOUTS, help="Payload layout version (embed)")
+    parser.add_argument("--level", type=int, choices=SUPPORTED_LEVELS,
+                        help="DWT level (embed: default 1; verify: default tries every level)")
+    parser.add_argument("--output", help="Output directory (embed)")
+    parser.add_argument("--expect", help="Expected text; other decoded texts are recorded as 'mismatch' (verify)")
+    parser.add_argument("--manifest", help=f"Results file (default: OUTPUT/{EMBED_MANIFEST} or ./{VERIFY_MANIFEST})")
+    parser.add_argument("--retry-failed", action="store_true", help="Process inputs again whose last record is an error")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--log-level", default="WARNING", help="Log level of the engines")
+    args = parser.parse_args()
+
+    if not args.inputs and not args.from_list:
+        parser.error("no inputs given")
+    if args.mode == "embed":
+        if not args.text or not args.output:
+            parser.error("embed requires --text and --output")
+        manifest_path = args.manifest or os.path.join(args.output, EMBED_MANIFEST)
+    else:
+        manifest_path = args.manifest or VERIFY_MANIFEST
+
+    setup_logging(level="WARNING")
+    # Engine logs stay at WARNING; the driver's own progress is INFO
+    logger.setLevel(logging.INFO)
+    job = {
+        "mode": args.mode,
+        "text": args.text,
+        "alpha": args.alpha,
+        "layout": args.layout,
+        "level": args.level,
+        "output": args.output,
+        "expect": args.expect,
+        "log_level": args.log_level,
+    }
+    done = load_manifest(manifest_path)
+    if done:
+        logger.info("Resuming: %d inputs already recorded in %s", len(done), manifest_path)
+    inputs = pending(iter_inputs(args.inputs, args.from_list), done, args.retry_failed)
+
+    started = time.monotonic()
+    counts = run(job, inputs, manifest_path, max(1, args.workers), max(1, args.batch_size))
+    total = sum(counts.values())
+    elapsed = time.monotonic() - started
+    print(f"{total} images in {elapsed:.1f} s ({total / max(elapsed, 1e-9):.1f}/s): {counts or 'nothing to do'}")
+    print(f"Manifest: {manifest_path}")
+    return 1 if counts.get("error") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
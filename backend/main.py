@@ -1,19 +1,44 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 import os
-from src.api.routes import router as api_router
+from src.api.routes import router as api_router, job_runner, watermark_service
+from src.services.deadlines import CancellationMiddleware
+from src.services.profiling import PROFILE_ID_HEADER, PROFILE_TOKEN, ProfilingMiddleware
+from src.services.storage import OUTPUT_DIR, STATIC_DIR, OutputFiles
 from src.utils.logger import setup_logging
+from src.utils import metrics
+from src.utils.threads import apply_library_threads
 
-# Setup logging with DEBUG level for detailed diagnostics
-setup_logging("DEBUG")
+# Level, JSON output and per-logger sampling come from INVISIGUARD_LOG_* (see README)
+setup_logging()
+
+# OpenCV/BLAS thread caps set by the production launcher (serve.py); no-op otherwise
+apply_library_threads()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so the worker starts accepting connections immediately;
+    # /v1/ready reports 503 until the warm-up has finished.
+    warm_up = asyncio.create_task(watermark_service.warm_up())
+    # Queued jobs (including those left over from before a restart) are picked up from here on
+    job_runner.start()
+    yield
+    warm_up.cancel()
+    await job_runner.stop()
 
 app = FastAPI(
     title="InvisiGuard API",
     description="Invisible Watermarking & Geometric Correction API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Request deadlines and client disconnects cancel the engine work (see src/services/deadlines.py).
+# Added before CORS so the 504 still carries the CORS headers.
+app.add_middleware(CancellationMiddleware)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -21,12 +46,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[PROFILE_ID_HEADER, "Retry-After"],
 )
 
-# Static files for processed images
-os.makedirs("static/processed", exist_ok=True)
-os.makedirs("static/debug", exist_ok=True)
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Opt-in per-request profiling (see src/services/profiling.py); not installed without a token
+if PROFILE_TOKEN:
+    app.add_middleware(ProfilingMiddleware)
+
+# Static files for processed images: content-hashed outputs are served as immutable, and
+# with INVISIGUARD_STATIC_MODE=accel nginx sends the bytes (see src/services/storage.py)
+os.makedirs(OUTPUT_DIR, exist_ok=True)
+os.makedirs(os.path.join(STATIC_DIR, "debug"), exist_ok=True)
+app.mount("/static", OutputFiles(directory=STATIC_DIR), name="static")
 
 app.include_router(api_router, prefix="/v1")
 
@@ -34,6 +65,11 @@ app.include_router(api_router, prefix="/v1")
 async def root():
     return {"message": "InvisiGuard API is running"}
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Stage latencies, fallback and Reed-Solomon counters, executor and admission state."""
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
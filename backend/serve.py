@@ -0,0 +1,159 @@
+"""
+Production launcher for the InvisiGuard API
+
+Runs several uvicorn worker processes on one listening socket and sizes their
+thread pools so that, together, they do not use more threads than there are
+usable cores (see src/utils/threads.py):
+
+    python serve.py
+    INVISIGUARD_WORKERS=4 INVISIGUARD_CPU_AFFINITY=1 python serve.py
+
+Settings (environment variables):
+    INVISIGUARD_HOST / INVISIGUARD_PORT   listen address (0.0.0.0:8000)
+    INVISIGUARD_WORKERS                   worker processes (default: usable cores)
+    INVISIGUARD_MAX_JOBS                  concurrent jobs per worker (default: cores / workers)
+    INVISIGUARD_LIBRARY_THREADS           OpenCV/BLAS threads per job (default: what is left of the share)
+    INVISIGUARD_JOB_THREADS               parallel decoder threads per job (default: the job's share of the cores)
+    INVISIGUARD_ADMISSION_BUDGET_MB       admission budget of the whole server (1024), split evenly between workers
+    INVISIGUARD_CPU_AFFINITY              1 pins each worker to its own share of the cores (Linux)
+
+Every worker has its own admission controller and its own metrics registry.
+GET /metrics therefore reports only the worker that accepted the scrape, and
+successive scrapes may reach different workers. Run a single worker when exact
+server-wide counters matter.
+
+Crashed workers are restarted; SIGINT/SIGTERM shut all workers down gracefully.
+`python main.py` remains the single-process development server with auto-reload.
+"""
+
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Optional
+
+from src.utils.threads import ThreadPlan, library_thread_env, plan, usable_cpus
+
+HOST = os.environ.get("INVISIGUARD_HOST", "0.0.0.0")
+PORT = int(os.environ.get("INVISIGUARD_PORT", "8000"))
+SHUTDOWN_TIMEOUT_S = 30
+RESTART_BACKOFF_S = 1.0
+ADMISSION_BUDGET_MB = int(os.environ.get("INVISIGUARD_ADMISSION_BUDGET_MB", "1024"))
+
+logger = logging.getLogger("invisiguard.serve")
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+def _run_worker(index: int, sock: socket.socket, env: dict, cpus: Optional[list[int]]):
+    """Worker process: apply the thread budget, then serve the app on the shared socket."""
+    os.environ.update(env)
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    import uvicorn
+    config = uvicorn.Config("main:app", log_level="info", timeout_graceful_shutdown=SHUTDOWN_TIMEOUT_S)
+    try:
+        uvicorn.Server(config).run(sockets=[sock])
+    except KeyboardInterrupt:
+        # Ctrl-C reaches the whole process group; uvicorn re-raises it after its graceful shutdown
+        pass
+
+
+class Supervisor:
+    def __init__(self, thread_plan: ThreadPlan, cpus: list[int], pin: bool):
+        self.plan = thread_plan
+        self.cpus = cpus
+        self.pin = pin
+        self.context = multiprocessing.get_context("spawn")
+        self.processes: dict[int, multiprocessing.Process] = {}
+        self.stopping = False
+        self.sock = socket.socket(socket.AF_INET6 if ":" in HOST else socket.AF_INET)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((HOST, PORT))
+        self.sock.listen(2048)
+        self.sock.set_inheritable(True)
+
+    def worker_env(self) -> dict:
+        # The caller's own settings win over the computed defaults
+        env = library_thread_env(self.plan.library_threads)
+        env["INVISIGUARD_MAX_JOBS"] = str(self.plan.jobs_per_worker)
+        env["INVISIGUARD_JOB_THREADS"] = str(self.plan.job_threads)
+        env = {key: os.environ.get(key, value) for key, value in env.items()}
+        # The admission budget is the server's memory, so the caller's value is the total, not per worker
+        env["INVISIGUARD_ADMISSION_BUDGET_MB"] = str(max(1, ADMISSION_BUDGET_MB // self.plan.workers))
+        return env
+
+    def start(self, index: int):
+        cpus = self.plan.worker_cores(index, self.cpus) if self.pin else None
+        process = self.context.Process(
+            target=_run_worker, args=(index, self.sock, self.worker_env(), cpus), name=f"invisiguard-worker-{index}"
+        )
+        process.start()
+        self.processes[index] = process
+        logger.info("Started worker %d (pid %d%s)", index, process.pid, f", cpus {cpus}" if cpus else "")
+
+    def run(self):
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, self.stop)
+        for index in range(self.plan.workers):
+            self.start(index)
+        while not self.stopping:
+            for index, process in list(self.processes.items()):
+                if not process.is_alive() and not self.stopping:
+                    logger.warning("Worker %d (pid %d) exited with code %s; restarting", index, process.pid, process.exitcode)
+                    time.sleep(RESTART_BACKOFF_S)
+                    self.start(index)
+            time.sleep(0.5)
+        self.shutdown()
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def shutdown(self):
+        logger.info("Stopping %d workers", len(self.processes))
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()  # SIGTERM: uvicorn finishes in-flight requests
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT_S + 5
+        for process in self.processes.values():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+        self.sock.close()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    cpus = usable_cpus()
+    thread_plan = plan(
+        len(cpus),
+        workers=_env_int("INVISIGUARD_WORKERS"),
+        jobs_per_worker=_env_int("INVISIGUARD_MAX_JOBS"),
+        library_threads=_env_int("INVISIGUARD_LIBRARY_THREADS"),
+    )
+    pin = os.environ.get("INVISIGUARD_CPU_AFFINITY", "0").lower() in ("1", "true", "yes")
+    if pin and not hasattr(os, "sched_setaffinity"):
+        logger.warning("CPU affinity is not supported on this platform; ignoring INVISIGUARD_CPU_AFFINITY")
+        pin = False
+    # A job keeps either its library threads or its parallel decoders busy
+    job_threads = _env_int("INVISIGUARD_JOB_THREADS") or thread_plan.job_threads
+    total = thread_plan.workers * thread_plan.jobs_per_worker * max(thread_plan.library_threads, job_threads)
+    logger.info(
+        "Serving on %s:%d with %d workers x %d jobs x %d library threads, %d decoder threads per job, "
+        "%d MB admission budget per worker (%d threads on %d cores)",
+        HOST, PORT, thread_plan.workers, thread_plan.jobs_per_worker, thread_plan.library_threads, job_threads,
+        max(1, ADMISSION_BUDGET_MB // thread_plan.workers), total, len(cpus),
+    )
+    if total > len(cpus):
+        logger.warning("Configured threads exceed the %d usable cores; expect contention", len(cpus))
+    Supervisor(thread_plan, cpus, pin).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
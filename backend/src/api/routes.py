@@ -1,34 +1,315 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request
+from fastapi.responses import JSONResponse, Response
+from contextlib import asynccontextmanager
+from typing import Optional
 from src.api.schemas import (
     WatermarkResponse, ExtractionResponse, WatermarkResponseData, 
     ExtractionResponseData, VerificationResponse, VerificationResponseData,
-    ErrorResponse, ValidationError, ProcessingError
+    ErrorResponse, ValidationError, ProcessingError, JobResponse, JobStatusData
 )
 from src.core.processor import ImageProcessor
+from src.core.embedding import LEVEL
+from src.core.layout import LAYOUT_LEGACY, SUPPORTED_LAYOUTS, SUPPORTED_LEVELS
+from src.core.quality import METRICS
+from src.services.admission import AdmissionController, AdmissionRejected
+from src.services.jobs import Job, JobFailed, JobRetry, JobRunner, JobStore
+from src.services.renditions import DEFAULT_RENDITION_FORMAT, DEFAULT_RENDITION_SIZE, RENDITION_FORMATS, RENDITION_SIZES, RENDITIONS
+from src.services.storage import IMMUTABLE, file_response
 from src.services.watermark import WatermarkService
 from src.utils.logger import get_logger, log_request_context, log_error_with_context, log_validation_error, log_success_with_metrics
+from src.utils.metrics import Gauge, stage_timer
+import asyncio
 import time
 
 router = APIRouter()
-watermark_service = WatermarkService()
+admission = AdmissionController()
+watermark_service = WatermarkService(max_workers=admission.max_jobs)
+# Asynchronous jobs share the admission budget and engine pool with synchronous requests
+job_runner = JobRunner(JobStore())
 logger = get_logger(__name__)
 
+# Admission state, read from the controller whenever /metrics is scraped
+ADMISSION_GAUGES = {
+    "running_jobs": "Jobs holding an admission slot",
+    "queued_small": "Small jobs waiting for admission",
+    "queued_large": "Large jobs waiting for admission",
+    "bytes_in_use": "Estimated bytes held by admitted jobs",
+    "budget_bytes": "Admission memory budget in bytes",
+}
+for _key, _documentation in ADMISSION_GAUGES.items():
+    Gauge(f"invisiguard_admission_{_key}", _documentation, function=lambda key=_key: admission.snapshot()[key])
+
 # Allowed file types
 ALLOWED_CONTENT_TYPES = ["image/png", "image/jpeg", "image/jpg"]
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 ALPHA_MIN = 0.1
 ALPHA_MAX = 5.0
+# Quality targets accepted by the embed search (target_psnr / target_ssim)
+TARGET_PSNR_MIN = 20.0
+TARGET_PSNR_MAX = 100.0
+MAX_JOB_WAIT_S = 60.0  # Longest long-poll of GET /jobs/{id}; stays below common proxy read timeouts
+
+def _job_cost(operation: str, *uploads: bytes) -> int:
+    """Admission cost of a request, from the image dimensions in each upload's header."""
+    cost = 0
+    for contents in uploads:
+        dims = ImageProcessor.peek_dimensions(contents)
+        if dims is None:
+            # Size unknown until decoded: charge it as the largest job
+            return admission.large_limit
+        cost += admission.estimate(operation, *dims, upload_bytes=len(contents))
+    return cost
+
+def _overloaded_response(e: AdmissionRejected) -> JSONResponse:
+    error = ErrorResponse(
+        error_code="SERVER_OVERLOADED",
+        message="The server is busy processing other images",
+        details={"reason": e.reason, "retry_after_seconds": e.retry_after},
+        suggestion=f"Please retry in {e.retry_after} seconds"
+    )
+    return JSONResponse(status_code=503, content=error.dict(), headers={"Retry-After": str(e.retry_after)})
+
+def _decode_error(file_name: Optional[str], content_type: Optional[str]) -> ProcessingError:
+    return ProcessingError(
+        error_code="IMAGE_DECODE_ERROR",
+        message="Could not decode the uploaded image",
+        stage="image_loading",
+        recoverable=False,
+        details={
+            "file_name": file_name,
+            "content_type": content_type
+        },
+        suggestion="The image file may be corrupted. Try uploading a different image"
+    )
+
+def _embedding_error(e: Exception) -> ProcessingError:
+    return ProcessingError(
+        error_code="WATERMARK_EMBEDDING_FAILED",
+        message="Failed to embed watermark into image",
+        stage="watermark_embedding",
+        recoverable=True,
+        details={"error_message": str(e)},
+        suggestion="Try adjusting the alpha (strength) value or using a different image"
+    )
+
+def _verification_error(e: Exception) -> ProcessingError:
+    return ProcessingError(
+        error_code="WATERMARK_VERIFICATION_FAILED",
+        message="Failed to verify watermark in image",
+        stage="watermark_verification",
+        recoverable=True,
+        details={"error_message": str(e)},
+        suggestion="The image may not contain a watermark, or it may be too damaged to extract"
+    )
+
+def _extraction_data(result: dict) -> ExtractionResponseData:
+    return ExtractionResponseData(
+        decoded_text=result["extracted_text"],
+        confidence=0.0 if not result["extracted"] else 1.0 if result["status"] == "aligned" else 0.5,
+        is_match=result["extracted"],
+        debug_info=None
+    )
+
+def _validate_embed_form(file: UploadFile, text: str, alpha: float, layout: int, level: int,
+                         target_psnr: Optional[float] = None, target_ssim: Optional[float] = None) -> Optional[JSONResponse]:
+    """400 response for an invalid embed request (/embed and /jobs/embed), or None when it is valid."""
+    # T007: Validate file type
+    if file.content_type not in ALLOWED_CONTENT_TYPES:
+        log_validation_error(logger, "file", file.content_type, f"One of {ALLOWED_CONTENT_TYPES}")
+        error = ValidationError(
+            error_code="INVALID_FILE_FORMAT",
+            message="Only PNG and JPG images are supported",
+            field="file",
+            value_provided=file.content_type,
+            expected=f"One of: {', '.join(ALLOWED_CONTENT_TYPES)}",
+            suggestion="Please convert your image to PNG or JPG format and try again"
+        )
+        return JSONResponse(status_code=400, content=error.dict())
+
+    # T008: Validate text field (non-empty, trimmed)
+    if not text or text.strip() == "":
+        log_validation_error(logger, "text", text, "Non-empty string")
+        error = ValidationError(
+            error_code="EMPTY_WATERMARK_TEXT",
+            message="Watermark text cannot be empty",
+            field="text",
+            value_provided=text,
+            expected="Non-empty string",
+            suggestion="Please enter the text you want to embed as a watermark"
+        )
+        return JSONResponse(status_code=400, content=error.dict())
+
+    # T009: Validate alpha range (0.1-5.0)
+    if alpha < ALPHA_MIN or alpha > ALPHA_MAX:
+        log_validation_error(logger, "alpha", alpha, f"Float between {ALPHA_MIN} and {ALPHA_MAX}")
+        error = ValidationError(
+            error_code="INVALID_ALPHA_RANGE",
+            message=f"Alpha value must be between {ALPHA_MIN} and {ALPHA_MAX}",
+            field="alpha",
+            value_provided=alpha,
+            expected=f"Float between {ALPHA_MIN} and {ALPHA_MAX}",
+            suggestion=f"Adjust the strength slider to a value between {ALPHA_MIN} and {ALPHA_MAX}"
+        )
+        return JSONResponse(status_code=400, content=error.dict())
+
+    if layout not in SUPPORTED_LAYOUTS:
+        log_validation_error(logger, "layout", layout, f"One of {SUPPORTED_LAYOUTS}")
+        error = ValidationError(
+            error_code="INVALID_LAYOUT",
+            message="Unsupported payload layout version",
+            field="layout",
+            value_provided=layout,
+            expected=f"One of: {', '.join(map(str, SUPPORTED_LAYOUTS))}",
+            suggestion="Omit the layout field to use the default legacy layout"
+        )
+        return JSONResponse(status_code=400, content=error.dict())
+
+    if target_psnr is not None and not TARGET_PSNR_MIN <= target_psnr <= TARGET_PSNR_MAX:
+        log_validation_error(logger, "target_psnr", target_psnr, f"Float between {TARGET_PSNR_MIN} and {TARGET_PSNR_MAX}")
+        error = ValidationError(
+            error_code="INVALID_TARGET_PSNR",
+            message=f"Target PSNR must be between {TARGET_PSNR_MIN} and {TARGET_PSNR_MAX} dB",
+            field="target_psnr",
+            value_provided=target_psnr,
+            expected=f"Float between {TARGET_PSNR_MIN} and {TARGET_PSNR_MAX}",
+            suggestion="Typical targets are 40-50 dB; omit the field to embed at the given alpha"
+        )
+        return JSONResponse(status_code=400, content=error.dict())
+
+    if target_ssim is not None and not 0.0 < target_ssim <= 1.0:
+        log_validation_error(logger, "target_ssim", target_ssim, "Float in (0, 1]")
+        error = ValidationError(
+            error_code="INVALID_TARGET_SSIM",
+            message="Target SSIM must be greater than 0 and at most 1",
+            field="target_ssim",
+            value_provided=target_ssim,
+            expected="Float in (0, 1]",
+            suggestion="Typical targets are 0.98-0.999; omit the field to embed at the given alpha"
+        )
+        return JSONResponse(status_code=400, content=error.dict())
+
+    return _validate_level(level, f"Omit the level field to use the default level ({LEVEL})")
+
+def _parse_metrics(value: Optional[str]) -> tuple[Optional[JSONResponse], tuple[str, ...]]:
+    """
+    Quality metrics requested by the `metrics` form field: a comma-separated subset of METRICS,
+    or "none" to skip them. Unset means all of them.
+    """
+    if value is None:
+        return None, METRICS
+    names = tuple(dict.fromkeys(name.strip().lower() for name in value.split(",") if name.strip()))
+    if names == ("none",):
+        return None, ()
+    unknown = [name for name in names if name not in METRICS]
+    if not names or unknown:
+        log_validation_error(logger, "metrics", value, f"Comma-separated subset of {METRICS} or 'none'")
+        error = ValidationError(
+            error_code="INVALID_METRICS",
+            message="Unsupported quality metric" + (f": {', '.join(unknown)}" if unknown else "s"),
+            field="metrics",
+            value_provided=value,
+            expected=f"Comma-separated subset of: {', '.join(METRICS)}, or 'none'",
+            suggestion="Omit the metrics field to compute every metric"
+        )
+        return JSONResponse(status_code=400, content=error.dict()), ()
+    return None, names
+
+def _embed_operation(target_psnr: Optional[float], target_ssim: Optional[float]) -> str:
+    """Admission cost class of an embed: the quality-target search holds more memory than a plain embed."""
+    return "embed" if target_psnr is None and target_ssim is None else "embed_search"
+
+def _validate_level(level: Optional[int], suggestion: str) -> Optional[JSONResponse]:
+    """400 response for a DWT level outside SUPPORTED_LEVELS (None means unset and is valid)."""
+    if level is not None and level not in SUPPORTED_LEVELS:
+        log_validation_error(logger, "level", level, f"One of {SUPPORTED_LEVELS}")
+        error = ValidationError(
+            error_code="INVALID_LEVEL",
+            message="Unsupported DWT level",
+            field="level",
+            value_provided=level,
+            expected=f"One of: {', '.join(map(str, SUPPORTED_LEVELS))}",
+            suggestion=suggestion
+        )
+        return JSONResponse(status_code=400, content=error.dict())
+    return None
+
+def _validate_verify_form(image: UploadFile, region_fields: tuple, level: Optional[int] = None) -> tuple[Optional[JSONResponse], Optional[tuple[int, int, int, int]]]:
+    """(400 response, None) for an invalid verify request (/verify and /jobs/verify), else (None, region)."""
+    invalid = _validate_level(level, "Omit the level field to try every supported level")
+    if invalid is not None:
+        return invalid, None
+    
+    # Optional decode region: all four fields must be given together
+    region = None
+    if any(v is not None for v in region_fields):
+        if any(v is None for v in region_fields) or region_fields[0] < 0 or region_fields[1] < 0 or region_fields[2] <= 0 or region_fields[3] <= 0:
+            log_validation_error(logger, "region", region_fields, "Non-negative x/y and positive width/height")
+            error = ValidationError(
+                error_code="INVALID_REGION",
+                message="Region must provide region_x, region_y, region_width and region_height",
+                field="region",
+                value_provided=list(region_fields),
+                expected="Non-negative region_x/region_y and positive region_width/region_height",
+                suggestion="Omit all region fields to search the whole image"
+            )
+            return JSONResponse(status_code=400, content=error.dict()), None
+        region = region_fields
+    
+    # T043: Validate image file
+    if image.content_type not in ALLOWED_CONTENT_TYPES:
+        log_validation_error(logger, "image", image.content_type, f"One of {ALLOWED_CONTENT_TYPES}")
+        error = ValidationError(
+            error_code="INVALID_FILE_FORMAT",
+            message="Only PNG and JPG images are supported",
+            field="image",
+            value_provided=image.content_type,
+            expected=f"One of: {', '.join(ALLOWED_CONTENT_TYPES)}",
+            suggestion="Please convert your image to PNG or JPG format and try again"
+        )
+        return JSONResponse(status_code=400, content=error.dict()), None
+    return None, region
+
+def _clip_region(region: Optional[tuple[int, int, int, int]], shape: tuple) -> tuple[Optional[ValidationError], Optional[tuple[int, int, int, int]]]:
+    """Clip a verify region to the decoded image: (error, None) when no pixel of it is inside the image, else (None, region)."""
+    if region is None:
+        return None, None
+    x, y, width, height = region
+    image_height, image_width = shape[:2]
+    clipped = (x, y, min(width, image_width - x), min(height, image_height - y))
+    if clipped[2] <= 0 or clipped[3] <= 0:
+        log_validation_error(logger, "region", list(region), f"Inside the {image_width}x{image_height} image")
+        return ValidationError(
+            error_code="INVALID_REGION",
+            message="Region lies outside the image",
+            field="region",
+            value_provided=list(region),
+            expected=f"region_x < {image_width} and region_y < {image_height}",
+            suggestion="Give a region inside the image, or omit all region fields to search the whole image"
+        ), None
+    return None, clipped
 
 @router.get("/health")
 async def health_check():
     return {"status": "ok", "service": "InvisiGuard API"}
 
+@router.get("/ready")
+async def readiness_check():
+    """Readiness (unlike /health, which is liveness): ok only once the startup warm-up has completed."""
+    if watermark_service.ready:
+        return {"status": "ready", "service": "InvisiGuard API"}
+    status = "warm_up_failed" if watermark_service.warm_up_error else "warming_up"
+    return JSONResponse(status_code=503, content={"status": status, "error": watermark_service.warm_up_error})
+
 @router.post("/embed", response_model=WatermarkResponse)
 async def embed_watermark(
     file: UploadFile = File(...),
     text: str = Form(...),
-    alpha: float = Form(1.0)
+    alpha: float = Form(1.0),
+    layout: int = Form(LAYOUT_LEGACY),
+    level: int = Form(LEVEL),
+    target_psnr: Optional[float] = Form(None),
+    target_ssim: Optional[float] = Form(None),
+    metrics: Optional[str] = Form(None)
 ):
     start_time = time.time()
     
@@ -39,115 +320,79 @@ async def embed_watermark(
         file_name=file.filename,
         file_type=file.content_type,
         text_length=len(text),
-        alpha=alpha
+        alpha=alpha,
+        layout=layout,
+        level=level,
+        target_psnr=target_psnr,
+        target_ssim=target_ssim,
+        metrics=metrics
     )
     
     try:
-        # T007: Validate file type
-        if file.content_type not in ALLOWED_CONTENT_TYPES:
-            log_validation_error(logger, "file", file.content_type, f"One of {ALLOWED_CONTENT_TYPES}")
-            error = ValidationError(
-                error_code="INVALID_FILE_FORMAT",
-                message="Only PNG and JPG images are supported",
-                field="file",
-                value_provided=file.content_type,
-                expected=f"One of: {', '.join(ALLOWED_CONTENT_TYPES)}",
-                suggestion="Please convert your image to PNG or JPG format and try again"
-            )
-            return JSONResponse(status_code=400, content=error.dict())
+        invalid = _validate_embed_form(file, text, alpha, layout, level, target_psnr, target_ssim)
+        if invalid is None:
+            invalid, requested_metrics = _parse_metrics(metrics)
+        if invalid is not None:
+            return invalid
         
-        # T008: Validate text field (non-empty, trimmed)
-        if not text or text.strip() == "":
-            log_validation_error(logger, "text", text, "Non-empty string")
-            error = ValidationError(
-                error_code="EMPTY_WATERMARK_TEXT",
-                message="Watermark text cannot be empty",
-                field="text",
-                value_provided=text,
-                expected="Non-empty string",
-                suggestion="Please enter the text you want to embed as a watermark"
-            )
-            return JSONResponse(status_code=400, content=error.dict())
-        
-        # T009: Validate alpha range (0.1-5.0)
-        if alpha < ALPHA_MIN or alpha > ALPHA_MAX:
-            log_validation_error(logger, "alpha", alpha, f"Float between {ALPHA_MIN} and {ALPHA_MAX}")
-            error = ValidationError(
-                error_code="INVALID_ALPHA_RANGE",
-                message=f"Alpha value must be between {ALPHA_MIN} and {ALPHA_MAX}",
-                field="alpha",
-                value_provided=alpha,
-                expected=f"Float between {ALPHA_MIN} and {ALPHA_MAX}",
-                suggestion=f"Adjust the strength slider to a value between {ALPHA_MIN} and {ALPHA_MAX}"
-            )
-            return JSONResponse(status_code=400, content=error.dict())
-        
-        # T006: Load image (Content-Type handling is automatic via FastAPI/Starlette)
+        # Admission: the job is charged by the decoded size read from the image header
+        # and waits (or is turned away with 503) while the server is at capacity.
+        with stage_timer("upload"):
+            contents = await file.read()
         try:
-            image = await ImageProcessor.load_image(file)
-        except Exception as e:
-            log_error_with_context(
-                logger,
-                "IMAGE_DECODE_ERROR",
-                "Could not decode the uploaded image",
-                e,
-                file_name=file.filename,
-                file_type=file.content_type
-            )
-            # T010: Structured error response
-            error = ProcessingError(
-                error_code="IMAGE_DECODE_ERROR",
-                message="Could not decode the uploaded image",
-                stage="image_loading",
-                recoverable=False,
-                details={
-                    "file_name": file.filename,
-                    "content_type": file.content_type
-                },
-                suggestion="The image file may be corrupted. Try uploading a different image"
-            )
-            return JSONResponse(status_code=400, content=error.dict())
+            async with admission.admit(_job_cost(_embed_operation(target_psnr, target_ssim), contents)):
+                # T006: Load image (Content-Type handling is automatic via FastAPI/Starlette)
+                try:
+                    image = await watermark_service.decode(contents)
+                except Exception as e:
+                    log_error_with_context(
+                        logger,
+                        "IMAGE_DECODE_ERROR",
+                        "Could not decode the uploaded image",
+                        e,
+                        file_name=file.filename,
+                        file_type=file.content_type
+                    )
+                    # T010: Structured error response
+                    error = _decode_error(file.filename, file.content_type)
+                    return JSONResponse(status_code=400, content=error.dict())
         
-        # Process watermark embedding
-        try:
-            result = await watermark_service.embed(image, text.strip(), alpha)
-        except ValueError as e:
-            # T011: Error logging with context
-            log_error_with_context(
-                logger,
-                "WATERMARK_EMBEDDING_FAILED",
-                "Watermark embedding failed",
-                e,
-                text_length=len(text),
-                alpha=alpha
-            )
-            error = ProcessingError(
-                error_code="WATERMARK_EMBEDDING_FAILED",
-                message="Failed to embed watermark into image",
-                stage="watermark_embedding",
-                recoverable=True,
-                details={"error_message": str(e)},
-                suggestion="Try adjusting the alpha (strength) value or using a different image"
-            )
-            return JSONResponse(status_code=500, content=error.dict())
-        except Exception as e:
-            log_error_with_context(
-                logger,
-                "INTERNAL_SERVER_ERROR",
-                "Unexpected error during watermark embedding",
-                e,
-                text_length=len(text),
-                alpha=alpha
-            )
-            error = ProcessingError(
-                error_code="INTERNAL_SERVER_ERROR",
-                message="An unexpected error occurred while embedding the watermark",
-                stage="watermark_embedding",
-                recoverable=True,
-                technical_details=str(e),
-                suggestion="Please try again. If the problem persists, contact support"
-            )
-            return JSONResponse(status_code=500, content=error.dict())
+                # Process watermark embedding
+                try:
+                    result = await watermark_service.embed(image, text.strip(), alpha, layout=layout, level=level,
+                                                           target_psnr=target_psnr, target_ssim=target_ssim, metrics=requested_metrics)
+                except ValueError as e:
+                    # T011: Error logging with context
+                    log_error_with_context(
+                        logger,
+                        "WATERMARK_EMBEDDING_FAILED",
+                        "Watermark embedding failed",
+                        e,
+                        text_length=len(text),
+                        alpha=alpha
+                    )
+                    error = _embedding_error(e)
+                    return JSONResponse(status_code=500, content=error.dict())
+                except Exception as e:
+                    log_error_with_context(
+                        logger,
+                        "INTERNAL_SERVER_ERROR",
+                        "Unexpected error during watermark embedding",
+                        e,
+                        text_length=len(text),
+                        alpha=alpha
+                    )
+                    error = ProcessingError(
+                        error_code="INTERNAL_SERVER_ERROR",
+                        message="An unexpected error occurred while embedding the watermark",
+                        stage="watermark_embedding",
+                        recoverable=True,
+                        technical_details=str(e),
+                        suggestion="Please try again. If the problem persists, contact support"
+                    )
+                    return JSONResponse(status_code=500, content=error.dict())
+        except AdmissionRejected as e:
+            return _overloaded_response(e)
         
         # Log success
         duration_ms = (time.time() - start_time) * 1000
@@ -157,6 +402,7 @@ async def embed_watermark(
             {
                 "psnr": result.get("psnr"),
                 "ssim": result.get("ssim"),
+                "alpha": result.get("alpha"),
                 "duration_ms": duration_ms
             }
         )
@@ -182,22 +428,23 @@ async def extract_watermark(
     suspect_file: UploadFile = File(...)
 ):
     try:
-        # Load images
-        original = await ImageProcessor.load_image(original_file)
-        suspect = await ImageProcessor.load_image(suspect_file)
-        
-        # Process
-        result = await watermark_service.extract(original, suspect)
+        with stage_timer("upload"):
+            original_contents = await original_file.read()
+            suspect_contents = await suspect_file.read()
+        async with admission.admit(_job_cost("extract", original_contents, suspect_contents)):
+            # Load images
+            original = await watermark_service.decode(original_contents)
+            suspect = await watermark_service.decode(suspect_contents)
+            
+            # Process
+            result = await watermark_service.extract(original, suspect)
         
         return ExtractionResponse(
             status="success",
-            data=ExtractionResponseData(
-                decoded_text=result["extracted_text"],
-                confidence=1.0 if result["status"] == "aligned" else 0.5,
-                is_match=True,
-                debug_info=None
-            )
+            data=_extraction_data(result)
         )
+    except AdmissionRejected as e:
+        return _overloaded_response(e)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -205,7 +452,12 @@ async def extract_watermark(
 
 @router.post("/verify", response_model=VerificationResponse)
 async def verify_watermark(
-    image: UploadFile = File(...)
+    image: UploadFile = File(...),
+    region_x: Optional[int] = Form(None),
+    region_y: Optional[int] = Form(None),
+    region_width: Optional[int] = Form(None),
+    region_height: Optional[int] = Form(None),
+    level: Optional[int] = Form(None)
 ):
     start_time = time.time()
     
@@ -218,83 +470,67 @@ async def verify_watermark(
     )
     
     try:
-        # T043: Validate image file
-        if image.content_type not in ALLOWED_CONTENT_TYPES:
-            log_validation_error(logger, "image", image.content_type, f"One of {ALLOWED_CONTENT_TYPES}")
-            error = ValidationError(
-                error_code="INVALID_FILE_FORMAT",
-                message="Only PNG and JPG images are supported",
-                field="image",
-                value_provided=image.content_type,
-                expected=f"One of: {', '.join(ALLOWED_CONTENT_TYPES)}",
-                suggestion="Please convert your image to PNG or JPG format and try again"
-            )
-            return JSONResponse(status_code=400, content=error.dict())
+        invalid, region = _validate_verify_form(image, (region_x, region_y, region_width, region_height), level)
+        if invalid is not None:
+            return invalid
         
-        # Load image
+        with stage_timer("upload"):
+            contents = await image.read()
         try:
-            suspect = await ImageProcessor.load_image(image)
-        except Exception as e:
-            log_error_with_context(
-                logger,
-                "IMAGE_DECODE_ERROR",
-                "Could not decode the uploaded image",
-                e,
-                file_name=image.filename,
-                file_type=image.content_type
-            )
-            # T042: Structured error response
-            error = ProcessingError(
-                error_code="IMAGE_DECODE_ERROR",
-                message="Could not decode the uploaded image",
-                stage="image_loading",
-                recoverable=False,
-                details={
-                    "file_name": image.filename,
-                    "content_type": image.content_type
-                },
-                suggestion="The image file may be corrupted. Try uploading a different image"
-            )
-            return JSONResponse(status_code=400, content=error.dict())
+            async with admission.admit(_job_cost("verify", contents)):
+                # Load image
+                try:
+                    suspect = await watermark_service.decode(contents)
+                except Exception as e:
+                    log_error_with_context(
+                        logger,
+                        "IMAGE_DECODE_ERROR",
+                        "Could not decode the uploaded image",
+                        e,
+                        file_name=image.filename,
+                        file_type=image.content_type
+                    )
+                    # T042: Structured error response
+                    error = _decode_error(image.filename, image.content_type)
+                    return JSONResponse(status_code=400, content=error.dict())
+                
+                invalid_region, region = _clip_region(region, suspect.shape)
+                if invalid_region is not None:
+                    return JSONResponse(status_code=400, content=invalid_region.dict())
         
-        # Process verification
-        try:
-            result = await watermark_service.verify(suspect)
-        except ValueError as e:
-            log_error_with_context(
-                logger,
-                "WATERMARK_VERIFICATION_FAILED",
-                "Watermark verification failed",
-                e,
-                file_name=image.filename
-            )
-            # T042: Structured error response
-            error = ProcessingError(
-                error_code="WATERMARK_VERIFICATION_FAILED",
-                message="Failed to verify watermark in image",
-                stage="watermark_verification",
-                recoverable=True,
-                details={"error_message": str(e)},
-                suggestion="The image may not contain a watermark, or it may be too damaged to extract"
-            )
-            return JSONResponse(status_code=500, content=error.dict())
-        except Exception as e:
-            log_error_with_context(
-                logger,
-                "INTERNAL_SERVER_ERROR",
-                "Unexpected error during watermark verification",
-                e,
-                file_name=image.filename
-            )
-            error = ProcessingError(
-                error_code="INTERNAL_SERVER_ERROR",
-                message="An unexpected error occurred during verification",
-                stage="watermark_verification",
-                recoverable=True,
-                technical_details=str(e),
-                suggestion="Please try again. If the problem persists, contact support"
-            )
-            return JSONResponse(status_code=500, content=error.dict())
+                # Process verification
+                try:
+                    result = await watermark_service.verify(suspect, region=region, level=level)
+                except ValueError as e:
+                    log_error_with_context(
+                        logger,
+                        "WATERMARK_VERIFICATION_FAILED",
+                        "Watermark verification failed",
+                        e,
+                        file_name=image.filename
+                    )
+                    # T042: Structured error response
+                    error = _verification_error(e)
+                    return JSONResponse(status_code=500, content=error.dict())
+                except Exception as e:
+                    log_error_with_context(
+                        logger,
+                        "INTERNAL_SERVER_ERROR",
+                        "Unexpected error during watermark verification",
+                        e,
+                        file_name=image.filename
+                    )
+                    error = ProcessingError(
+                        error_code="INTERNAL_SERVER_ERROR",
+                        message="An unexpected error occurred during verification",
+                        stage="watermark_verification",
+                        recoverable=True,
+                        technical_details=str(e),
+                        suggestion="Please try again. If the problem persists, contact support"
+                    )
+                    return JSONResponse(status_code=500, content=error.dict())
+        except AdmissionRejected as e:
+            return _overloaded_response(e)
         
         # Log success
         duration_ms = (time.time() - start_time) * 1000
@@ -322,3 +558,247 @@ async def verify_watermark(
             suggestion="Please try again or contact support if the problem persists"
         )
         return JSONResponse(status_code=500, content=error.dict())
+
+# Asynchronous jobs: the upload is spooled and queued, the response only carries the job id.
+# Each handler runs a job like the synchronous endpoint would and returns its response data.
+
+@asynccontextmanager
+async def _admit_job(operation: str, *uploads: bytes):
+    """Admission for a queued job: when the server is at capacity, requeue the job instead of failing it."""
+    try:
+        async with admission.admit(_job_cost(operation, *uploads)):
+            yield
+    except AdmissionRejected as e:
+        raise JobRetry(e.retry_after)
+
+def _read_spooled(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+async def _decode_job_input(job: Job, contents: bytes):
+    try:
+        return await watermark_service.decode(contents)
+    except Exception:
+        raise JobFailed(_decode_error(job.params.get("file_name"), job.params.get("content_type")).dict())
+
+async def _run_embed_job(job: Job, report) -> dict:
+    contents = await asyncio.to_thread(_read_spooled, job.inputs[0])
+    await report(0.05, "waiting_for_capacity")
+    target_psnr, target_ssim = job.params.get("target_psnr"), job.params.get("target_ssim")
+    async with _admit_job(_embed_operation(target_psnr, target_ssim), contents):
+        await report(0.1, "decoding")
+        image = await _decode_job_input(job, contents)
+        await report(0.3, "embedding")
+        try:
+            result = await watermark_service.embed(image, job.params["text"], job.params["alpha"], layout=job.params["layout"],
+                                                   level=job.params.get("level", LEVEL), target_psnr=target_psnr, target_ssim=target_ssim,
+                                                   metrics=tuple(job.params.get("metrics", METRICS)))
+        except ValueError as e:
+            raise JobFailed(_embedding_error(e).dict())
+    return WatermarkResponseData(**result).dict()
+
+async def _run_verify_job(job: Job, report) -> dict:
+    contents = await asyncio.to_thread(_read_spooled, job.inputs[0])
+    await report(0.05, "waiting_for_capacity")
+    async with _admit_job("verify", contents):
+        await report(0.1, "decoding")
+        suspect = await _decode_job_input(job, contents)
+        await report(0.3, "verifying")
+        invalid_region, region = _clip_region(tuple(job.params["region"]) if job.params["region"] else None, suspect.shape)
+        if invalid_region is not None:
+            raise JobFailed(invalid_region.dict())
+        try:
+            result = await watermark_service.verify(suspect, region=region, level=job.params.get("level"))
+        except ValueError as e:
+            raise JobFailed(_verification_error(e).dict())
+    return VerificationResponseData(**result).dict()
+
+async def _run_extract_job(job: Job, report) -> dict:
+    original_contents, suspect_contents = [await asyncio.to_thread(_read_spooled, path) for path in job.inputs]
+    await report(0.05, "waiting_for_capacity")
+    async with _admit_job("extract", original_contents, suspect_contents):
+        await report(0.1, "decoding")
+        original = await _decode_job_input(job, original_contents)
+        suspect = await _decode_job_input(job, suspect_contents)
+        await report(0.3, "aligning_and_extracting")
+        try:
+            result = await watermark_service.extract(original, suspect)
+        except ValueError as e:
+            raise JobFailed(ProcessingError(
+                error_code="WATERMARK_EXTRACTION_FAILED",
+                message="Failed to extract watermark from image",
+                stage="watermark_extraction",
+                recoverable=True,
+                details={"error_message": str(e)},
+                suggestion="Check that the original image matches the watermarked one"
+            ).dict())
+    return _extraction_data(result).dict()
+
+JOB_RESULT_MODELS = {
+    "embed": WatermarkResponseData,
+    "verify": VerificationResponseData,
+    "extract": ExtractionResponseData,
+}
+job_runner.register("embed", _run_embed_job)
+job_runner.register("verify", _run_verify_job)
+job_runner.register("extract", _run_extract_job)
+
+def _job_status(job: Job) -> JobStatusData:
+    return JobStatusData(
+        job_id=job.id,
+        kind=job.kind,
+        status=job.status,
+        progress=job.progress,
+        stage=job.stage,
+        attempts=job.attempts,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        result=JOB_RESULT_MODELS[job.kind](**job.result) if job.result else None,
+        error=job.error
+    )
+
+def _job_accepted(job: Job) -> JSONResponse:
+    return JSONResponse(
+        status_code=202,
+        content=JobResponse(data=_job_status(job)).dict(),
+        headers={"Location": f"/v1/jobs/{job.id}"}
+    )
+
+@router.post("/jobs/embed", status_code=202, response_model=JobResponse)
+async def submit_embed_job(
+    file: UploadFile = File(...),
+    text: str = Form(...),
+    alpha: float = Form(1.0),
+    layout: int = Form(LAYOUT_LEGACY),
+    level: int = Form(LEVEL),
+    target_psnr: Optional[float] = Form(None),
+    target_ssim: Optional[float] = Form(None),
+    metrics: Optional[str] = Form(None)
+):
+    """Queue an embed; poll GET /v1/jobs/{job_id} for the WatermarkResponse data."""
+    log_request_context(logger, "/v1/jobs/embed", file_name=file.filename, file_type=file.content_type, text_length=len(text), alpha=alpha, layout=layout, level=level,
+                        target_psnr=target_psnr, target_ssim=target_ssim, metrics=metrics)
+    invalid = _validate_embed_form(file, text, alpha, layout, level, target_psnr, target_ssim)
+    if invalid is None:
+        invalid, requested_metrics = _parse_metrics(metrics)
+    if invalid is not None:
+        return invalid
+    with stage_timer("upload"):
+        contents = await file.read()
+    params = {"text": text.strip(), "alpha": alpha, "layout": layout, "level": level, "target_psnr": target_psnr, "target_ssim": target_ssim,
+              "metrics": list(requested_metrics), "file_name": file.filename, "content_type": file.content_type}
+    return _job_accepted(await job_runner.submit("embed", params, [contents]))
+
+@router.post("/jobs/verify", status_code=202, response_model=JobResponse)
+async def submit_verify_job(
+    image: UploadFile = File(...),
+    region_x: Optional[int] = Form(None),
+    region_y: Optional[int] = Form(None),
+    region_width: Optional[int] = Form(None),
+    region_height: Optional[int] = Form(None),
+    level: Optional[int] = Form(None)
+):
+    """Queue a blind verification; poll GET /v1/jobs/{job_id} for the VerificationResponse data."""
+    log_request_context(logger, "/v1/jobs/verify", file_name=image.filename, file_type=image.content_type)
+    invalid, region = _validate_verify_form(image, (region_x, region_y, region_width, region_height), level)
+    if invalid is not None:
+        return invalid
+    with stage_timer("upload"):
+        contents = await image.read()
+    params = {"region": region, "level": level, "file_name": image.filename, "content_type": image.content_type}
+    return _job_accepted(await job_runner.submit("verify", params, [contents]))
+
+@router.post("/jobs/extract", status_code=202, response_model=JobResponse)
+async def submit_extract_job(
+    original_file: UploadFile = File(...),
+    suspect_file: UploadFile = File(...)
+):
+    """Queue an extraction against the original; poll GET /v1/jobs/{job_id} for the ExtractionResponse data."""
+    log_request_context(logger, "/v1/jobs/extract", file_name=suspect_file.filename, file_type=suspect_file.content_type)
+    with stage_timer("upload"):
+        original_contents = await original_file.read()
+        suspect_contents = await suspect_file.read()
+    params = {"file_name": suspect_file.filename, "content_type": suspect_file.content_type}
+    return _job_accepted(await job_runner.submit("extract", params, [original_contents, suspect_contents]))
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, wait: float = 0.0):
+    """
+    Status, progress and (once finished) result or error of a job.
+    `wait` long-polls: the response is held for up to that many seconds (max 60) until the job finishes.
+    """
+    wait = min(max(wait, 0.0), MAX_JOB_WAIT_S)
+    job = await (job_runner.wait(job_id, wait) if wait else job_runner.get(job_id))
+    if job is None:
+        error = ErrorResponse(
+            error_code="JOB_NOT_FOUND",
+            message="No job with this id exists",
+            details={"job_id": job_id},
+            suggestion="Finished jobs are deleted after the retention period; submit the job again"
+        )
+        return JSONResponse(status_code=404, content=error.dict())
+    return JobResponse(data=_job_status(job))
+
+
+@router.get("/renditions/{filename}")
+async def get_rendition(request: Request, filename: str, max_dim: int = DEFAULT_RENDITION_SIZE, format: str = DEFAULT_RENDITION_FORMAT):
+    """
+    Bounded-size JPEG/WebP preview of a processed output (the last path segment of an
+    image_url or signal_map_url). Generated on first request and cached on disk.
+    """
+    format = format.lower()
+    if max_dim not in RENDITION_SIZES or format not in RENDITION_FORMATS:
+        field, value, expected = (("max_dim", max_dim, f"One of: {', '.join(map(str, RENDITION_SIZES))}")
+                                  if max_dim not in RENDITION_SIZES else
+                                  ("format", format, f"One of: {', '.join(RENDITION_FORMATS)}"))
+        log_validation_error(logger, field, value, expected)
+        error = ValidationError(
+            error_code="INVALID_RENDITION",
+            message="Unsupported rendition size or format",
+            field=field,
+            value_provided=value,
+            expected=expected,
+            suggestion=f"Omit the field to get a {DEFAULT_RENDITION_SIZE}px {DEFAULT_RENDITION_FORMAT} preview"
+        )
+        return JSONResponse(status_code=400, content=error.dict())
+
+    try:
+        rendition = watermark_service.renditions.lookup(filename, max_dim, format)
+    except FileNotFoundError:
+        error = ErrorResponse(
+            error_code="RENDITION_SOURCE_NOT_FOUND",
+            message="No processed image with this name exists",
+            details={"filename": filename},
+            suggestion="Use the file name from an image_url or signal_map_url returned by /embed"
+        )
+        return JSONResponse(status_code=404, content=error.dict())
+
+    headers = {"ETag": rendition.etag, "Cache-Control": IMMUTABLE}
+    if rendition.etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        RENDITIONS.inc(result="not_modified")
+        return Response(status_code=304, headers=headers)
+
+    if rendition.is_cached():
+        RENDITIONS.inc(result="hit")
+    else:
+        dims = watermark_service.renditions.source_dimensions(rendition)
+        cost = admission.estimate("rendition", *dims) if dims else admission.large_limit
+        try:
+            async with admission.admit(cost):
+                await watermark_service.render(rendition)
+        except AdmissionRejected as e:
+            return _overloaded_response(e)
+        except ValueError as e:
+            log_error_with_context(logger, "RENDITION_FAILED", "Could not generate a preview rendition", e, filename=filename)
+            error = ProcessingError(
+                error_code="RENDITION_FAILED",
+                message="Could not generate a preview of this image",
+                stage="rendition",
+                recoverable=False,
+                technical_details=str(e),
+                suggestion="Download the full-size image instead"
+            )
+            return JSONResponse(status_code=500, content=error.dict())
+        RENDITIONS.inc(result="generated")
+    return file_response(rendition.path, media_type=rendition.media_type, headers=headers)
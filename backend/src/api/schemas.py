@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Union
 
 # Error Response Models
 class ErrorResponse(BaseModel):
@@ -25,8 +25,12 @@ class ProcessingError(ErrorResponse):
 class WatermarkResponseData(BaseModel):
     image_url: str
     signal_map_url: Optional[str] = None
-    psnr: float
-    ssim: float
+    psnr: Optional[float] = Field(None, description="PSNR in dB (omitted when not requested in `metrics`)")
+    ssim: Optional[float] = Field(None, description="SSIM of the luma channel (omitted when not requested in `metrics`)")
+    level: Optional[int] = Field(None, description="DWT level the watermark was embedded at")
+    alpha: Optional[float] = Field(None, description="Embedding strength used (chosen by the search when a quality target was given)")
+    target_met: Optional[bool] = Field(None, description="Whether the quality targets were met (false: the weakest alpha still misses them)")
+    search_evaluations: Optional[int] = Field(None, description="Candidate alphas evaluated by the quality-target search")
 
 class WatermarkResponse(BaseModel):
     status: str = "success"
@@ -50,6 +54,11 @@ class VerificationMetadata(BaseModel):
     rotation_detected: float
     scale_detected: float
     geometry_corrected: bool
+    layout_version: Optional[int] = Field(None, description="Payload layout the watermark was decoded from (1=legacy, 2=tiled)")
+    tiles_tried: Optional[int] = Field(None, description="Number of tiles decoded before a result was found")
+    alpha_detected: Optional[float] = Field(None, description="Embedding strength (alpha) the watermark was decoded with")
+    dwt_level: Optional[int] = Field(None, description="DWT level the watermark was decoded from")
+    screened_out: Optional[bool] = Field(None, description="True when the negative screen rejected the image before decoding")
 
 class VerificationResponseData(BaseModel):
     verified: bool
@@ -60,3 +69,21 @@ class VerificationResponseData(BaseModel):
 class VerificationResponse(BaseModel):
     status: str = "success"
     data: VerificationResponseData
+
+class JobStatusData(BaseModel):
+    job_id: str
+    kind: str = Field(..., description="Operation: embed, verify or extract")
+    status: str = Field(..., description="queued, running, succeeded or failed")
+    progress: float = Field(..., description="Completed fraction of the job (0-1)")
+    stage: Optional[str] = Field(None, description="Step the job is currently in")
+    attempts: int = Field(..., description="Times the job has been started (jobs interrupted by a restart run again)")
+    created_at: float = Field(..., description="Unix time the job was submitted")
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Union[WatermarkResponseData, VerificationResponseData, ExtractionResponseData]] = Field(
+        None, description="The data of the matching synchronous endpoint's response, once succeeded")
+    error: Optional[Dict[str, Any]] = Field(None, description="ErrorResponse payload, once failed")
+
+class JobResponse(BaseModel):
+    status: str = "success"
+    data: JobStatusData
@@ -0,0 +1,3 @@
+from src.client.client import InvisiGuardClient, InvisiGuardError
+
+__all__ = ["InvisiGuardClient", "InvisiGuardError"]
@@ -0,0 +1,222 @@
+"""
+Async Python client for the InvisiGuard API
+
+All requests go through one httpx.AsyncClient, so connections are pooled and
+kept alive, and at most `max_concurrency` requests are in flight at a time.
+Images given as paths are streamed from disk in chunks rather than read into
+memory. Responses are parsed into the API's own schemas (src/api/schemas.py).
+
+Failures the server marks as retryable are retried with exponential backoff and
+jitter: 503 SERVER_OVERLOADED (honouring Retry-After), ProcessingError with
+recoverable=true, and connection errors or timeouts. All other errors are raised
+immediately as InvisiGuardError.
+
+    async with InvisiGuardClient("http://localhost:8000") as client:
+        result = await client.embed("photo.jpg", "(c) ACME")
+        results = await client.verify_many(["a.png", "b.png"])
+"""
+
+import asyncio
+import mimetypes
+import os
+import random
+from typing import Any, Awaitable, Callable, Iterable, Optional, Sequence, Union
+
+import httpx
+
+from src.api.schemas import (
+    ErrorResponse, ProcessingError, ValidationError,
+    VerificationResponse, VerificationResponseData, WatermarkResponse, WatermarkResponseData,
+)
+
+ImageSource = Union[str, os.PathLike, bytes]
+
+DEFAULT_TIMEOUT_S = 120.0
+DEFAULT_CONCURRENCY = 8
+DEFAULT_MAX_RETRIES = 4
+BACKOFF_BASE_S = 0.5
+BACKOFF_MAX_S = 30.0
+
+
+class InvisiGuardError(Exception):
+    """An error response from the API (or a retryable failure that ran out of attempts)."""
+
+    def __init__(self, status_code: Optional[int], error: Optional[ErrorResponse], message: Optional[str] = None):
+        self.status_code = status_code
+        self.error = error
+        super().__init__(message or (f"{error.error_code}: {error.message}" if error else f"HTTP {status_code}"))
+
+    @property
+    def error_code(self) -> Optional[str]:
+        return self.error.error_code if self.error else None
+
+    @property
+    def retryable(self) -> bool:
+        if self.status_code == 503:
+            return True
+        return isinstance(self.error, ProcessingError) and self.error.recoverable
+
+
+def _parse_error(response: httpx.Response) -> InvisiGuardError:
+    try:
+        body = response.json()
+    except ValueError:
+        return InvisiGuardError(response.status_code, None, f"HTTP {response.status_code}: {response.text[:200]}")
+    if not isinstance(body, dict) or "error_code" not in body:
+        # e.g. FastAPI's {"detail": ...} for HTTPException and request validation
+        return InvisiGuardError(response.status_code, None, f"HTTP {response.status_code}: {body}")
+    if "stage" in body:
+        model = ProcessingError
+    elif "field" in body:
+        model = ValidationError
+    else:
+        model = ErrorResponse
+    return InvisiGuardError(response.status_code, model(**body))
+
+
+def _retry_after(response: Optional[httpx.Response]) -> Optional[float]:
+    if response is None:
+        return None
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+class InvisiGuardClient:
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8000",
+        *,
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        timeout: float = DEFAULT_TIMEOUT_S,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        api_prefix: str = "/v1",
+    ):
+        self.max_retries = max_retries
+        self.api_prefix = api_prefix
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # Keep as many idle connections as requests may run at once, so none are reopened
+        limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+        self._http = httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits, transport=transport)
+
+    async def __aenter__(self) -> "InvisiGuardClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._http.aclose()
+
+    # --- single requests ---------------------------------------------------------------------
+
+    async def embed(self, image: ImageSource, text: str, alpha: float = 1.0, layout: Optional[int] = None,
+                    level: Optional[int] = None, target_psnr: Optional[float] = None,
+                    target_ssim: Optional[float] = None, metrics: Optional[Sequence[str]] = None) -> WatermarkResponseData:
+        """
+        Embed `text` into an image (path or encoded bytes); `layout` selects the payload layout (server default 1,
+        legacy; 2 is the tiled layout) and `level` the DWT level (server default 1).
+        With `target_psnr` and/or `target_ssim` the server picks the strongest alpha that meets them
+        (`alpha` is ignored; see WatermarkResponseData.alpha and .target_met).
+        `metrics` selects the quality metrics to compute ("psnr", "ssim"; an empty sequence skips them).
+        """
+        data = {"text": text, "alpha": str(alpha)}
+        if layout is not None:
+            data["layout"] = str(layout)
+        if level is not None:
+            data["level"] = str(level)
+        if target_psnr is not None:
+            data["target_psnr"] = str(target_psnr)
+        if target_ssim is not None:
+            data["target_ssim"] = str(target_ssim)
+        if metrics is not None:
+            data["metrics"] = ",".join(metrics) or "none"
+        body = await self._post_image("/embed", "file", image, data)
+        return WatermarkResponse(**body).data
+
+    async def verify(self, image: ImageSource, region: Optional[tuple[int, int, int, int]] = None,
+                     level: Optional[int] = None) -> VerificationResponseData:
+        """
+        Blind verification; `region` optionally restricts decoding to an (x, y, width, height) window
+        and `level` to the DWT level the image was embedded at (default: every level is tried).
+        """
+        data = {}
+        if region is not None:
+            data = dict(zip(("region_x", "region_y", "region_width", "region_height"), map(str, region)))
+        if level is not None:
+            data["level"] = str(level)
+        body = await self._post_image("/verify", "image", image, data)
+        return VerificationResponse(**body).data
+
+    async def download(self, url: str, destination: Union[str, os.PathLike]) -> str:
+        """Stream a result image (e.g. WatermarkResponseData.image_url) to a file."""
+        async with self._semaphore:
+            async with self._http.stream("GET", url) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                    raise _parse_error(response)
+                with open(destination, "wb") as f:
+                    async for chunk in response.aiter_bytes():
+                        f.write(chunk)
+        return os.fspath(destination)
+
+    # --- bulk --------------------------------------------------------------------------------
+
+    async def embed_many(self, images: Iterable[ImageSource], text: str, alpha: float = 1.0,
+                         layout: Optional[int] = None, level: Optional[int] = None) -> list[Union[WatermarkResponseData, InvisiGuardError]]:
+        """Embed the same text into many images concurrently; results (or errors) are in input order."""
+        return await self._gather(lambda image: self.embed(image, text, alpha, layout, level), images)
+
+    async def verify_many(self, images: Iterable[ImageSource]) -> list[Union[VerificationResponseData, InvisiGuardError]]:
+        """Verify many images concurrently; results (or errors) are in input order."""
+        return await self._gather(self.verify, images)
+
+    async def _gather(self, call: Callable[[Any], Awaitable[Any]], images: Iterable[ImageSource]) -> list:
+        # The semaphore bounds the requests in flight; a failure is returned in place, not raised
+        async def run(image):
+            try:
+                return await call(image)
+            except InvisiGuardError as e:
+                return e
+        return await asyncio.gather(*(run(image) for image in images))
+
+    # --- transport ---------------------------------------------------------------------------
+
+    async def _post_image(self, endpoint: str, field: str, image: ImageSource, data: dict) -> dict:
+        url = self.api_prefix + endpoint
+        attempt = 0
+        while True:
+            response = None
+            try:
+                async with self._semaphore:
+                    response = await self._send(url, field, image, data)
+                if response.status_code < 400:
+                    return response.json()
+                error = _parse_error(response)
+            except httpx.TransportError as e:
+                error = InvisiGuardError(None, None, f"{type(e).__name__}: {e}")
+                retryable = True
+            else:
+                retryable = error.retryable
+            if not retryable or attempt >= self.max_retries:
+                raise error
+            delay = _retry_after(response)
+            if delay is None:
+                delay = random.uniform(0, min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** attempt))
+            attempt += 1
+            await asyncio.sleep(min(delay, BACKOFF_MAX_S))
+
+    async def _send(self, url: str, field: str, image: ImageSource, data: dict) -> httpx.Response:
+        if isinstance(image, bytes):
+            return await self._http.post(url, data=data, files={field: ("image", image, _content_type(image))})
+        # Re-opened on every attempt; httpx streams the multipart body from the file in chunks
+        with open(image, "rb") as f:
+            name = os.path.basename(os.fspath(image))
+            content_type = mimetypes.guess_type(name)[0] or _content_type(f.read(16))
+            return await self._http.post(url, data=data, files={field: (name, f, content_type)})
+
+
+def _content_type(head: bytes) -> str:
+    return "image/png" if head.startswith(b"\x89PNG") else "image/jpeg"
@@ -1,14 +1,21 @@
 """
 Core watermarking algorithms package
 
-T029: Parameter validation check on module import
-Ensures embedding and extraction use consistent parameters
+T029: Parameter validation check
+Ensures embedding and extraction use consistent parameters. It runs during the
+service warm-up (WatermarkService.warm_up) rather than on import, so importing
+the package stays cheap.
 """
 
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
 def validate_algorithm_parameters():
     """Validate that embedding and extraction parameters match"""
-    from .embedding import WAVELET as EMBED_WAVELET, BASE_DELTA as EMBED_BASE_DELTA, N_ECC_SYMBOLS as EMBED_ECC
+    from .embedding import WAVELET as EMBED_WAVELET, BASE_DELTA as EMBED_BASE_DELTA, N_ECC_SYMBOLS as EMBED_ECC, LEVEL as EMBED_LEVEL
     from .extraction import WAVELET as EXTRACT_WAVELET, BASE_DELTA as EXTRACT_BASE_DELTA, N_ECC_SYMBOLS as EXTRACT_ECC
+    from .layout import SUPPORTED_LEVELS
     
     errors = []
     
@@ -21,11 +28,11 @@ def validate_algorithm_parameters():
     if EMBED_ECC != EXTRACT_ECC:
         errors.append(f"N_ECC_SYMBOLS mismatch: embed={EMBED_ECC}, extract={EXTRACT_ECC}")
     
+    if EMBED_LEVEL not in SUPPORTED_LEVELS:
+        errors.append(f"Default LEVEL {EMBED_LEVEL} is not one of the supported levels {SUPPORTED_LEVELS}")
+    
     if errors:
         error_msg = "Algorithm parameter mismatch detected:\n" + "\n".join(errors)
         raise ValueError(error_msg)
     
-    print(f"✓ Algorithm parameters validated: WAVELET={EMBED_WAVELET}, BASE_DELTA={EMBED_BASE_DELTA}, ECC={EMBED_ECC}")
-
-# Run validation on import
-validate_algorithm_parameters()
+    logger.info("Algorithm parameters validated: WAVELET=%s, BASE_DELTA=%s, ECC=%s", EMBED_WAVELET, EMBED_BASE_DELTA, EMBED_ECC)
@@ -0,0 +1,155 @@
+"""
+Reed-Solomon 負載編解碼層
+
+包裝 reedsolo 的 RSCodec，提供:
+- 先計算校正子 (syndrome)：未受損的數據包校正子全為 0，可直接跳過錯誤定位與校正。
+- 若安裝了編譯版的 creedsolo，自動使用它作為後端 (介面與 reedsolo 相同)。
+- 記憶最近編碼過的負載文本，重複嵌入相同文本時不需重新編碼。
+- 可以被多個執行緒同時使用：Reed-Solomon 後端每組參數只建立一次並共用 (見 _rs_backend)，
+  其餘狀態 (查表、編碼快取) 為唯讀或本身執行緒安全。
+"""
+
+import threading
+import weakref
+from functools import lru_cache
+
+import numpy as np
+from reedsolo import RSCodec, ReedSolomonError
+
+try:
+    # creedsolo 是 reedsolo 的 Cython 編譯版本 (選用)
+    from creedsolo import RSCodec as FastRSCodec, ReedSolomonError as FastReedSolomonError
+except ImportError:
+    FastRSCodec = None
+    FastReedSolomonError = ReedSolomonError
+
+from src.utils.logger import get_logger
+from src.utils.metrics import Counter, RS_CORRECTIONS, RS_DECODES, stage_timer
+
+RS_BLOCK_SIZE = 255  # GF(2^8) 的最大塊大小
+PAYLOAD_HEADER = "INV"  # 負載標頭，用於識別我們的浮水印
+GF_PRIMITIVE = 0x11d  # 與 RSCodec 預設值相同的本原多項式
+ENCODE_CACHE_SIZE = 256  # 記憶的負載文本數量
+
+logger = get_logger(__name__)
+
+# 所有編解碼器實例 (弱參照)，讓編碼快取的命中數在抓取 /metrics 時才彙總
+_codecs = weakref.WeakSet()
+ENCODE_CACHE_HITS = Counter(
+    "invisiguard_rs_encode_cache_hits_total",
+    "Payload encodes served from the Reed-Solomon encode cache",
+    function=lambda: sum(codec._encode_cached.cache_info().hits for codec in list(_codecs)),
+)
+ENCODE_CACHE_MISSES = Counter(
+    "invisiguard_rs_encode_cache_misses_total",
+    "Payload encodes that ran the Reed-Solomon encoder",
+    function=lambda: sum(codec._encode_cached.cache_info().misses for codec in list(_codecs)),
+)
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def _rs_backend(nsym: int, fcr: int):
+    """
+    共用的 RSCodec 後端 (每組參數一個)。reedsolo/creedsolo 建構時 (init_tables) 會先把模組層級的
+    GF 指數/對數表換成全 0 的新表再逐一填入，此時其他執行緒的編解碼會讀到不完整的表；
+    因此後端只在鎖內建立一次。之後的編解碼只讀取這些表，可以並行。
+    """
+    with _backends_lock:
+        backend = _backends.get((nsym, fcr))
+        if backend is None:
+            backend = _backends[(nsym, fcr)] = (FastRSCodec or RSCodec)(nsym, fcr=fcr)
+        return backend
+
+
+def _gf_tables(prim: int = GF_PRIMITIVE) -> tuple[np.ndarray, np.ndarray]:
+    """建立 GF(2^8) 的指數/對數表 (生成元 2)。"""
+    exp = np.zeros(512, dtype=np.int64)
+    log = np.zeros(256, dtype=np.int64)
+    x = 1
+    for i in range(255):
+        exp[i] = x
+        log[x] = i
+        x <<= 1
+        if x & 0x100:
+            x ^= prim
+    exp[255:510] = exp[:255]
+    return exp, log
+
+
+class PayloadCodec:
+    def __init__(self, nsym: int, fcr: int = 0):
+        self.nsym = nsym
+        self.fcr = fcr
+        self.max_data_len = RS_BLOCK_SIZE - nsym
+        # 3 Byte 放標頭(INV); 1 Byte 放長度。
+        self.max_text_len = self.max_data_len - 1 - len(PAYLOAD_HEADER)
+
+        self.backend = "creedsolo" if FastRSCodec is not None else "reedsolo"
+        self.rsc = _rs_backend(nsym, fcr)
+        logger.debug("[Codec] Reed-Solomon 後端: %s, nsym=%s", self.backend, nsym)
+
+        # 校正子計算用的指數矩陣: S_i = XOR_j msg[j] * a^((i + fcr) * (n - 1 - j))
+        self._gf_exp, self._gf_log = _gf_tables()
+        i = np.arange(nsym)[:, None] + fcr
+        j = np.arange(RS_BLOCK_SIZE)[None, :]
+        self._syndrome_powers = (i * (RS_BLOCK_SIZE - 1 - j)) % 255
+
+        self._encode_cached = lru_cache(maxsize=ENCODE_CACHE_SIZE)(self._encode_text)
+        _codecs.add(self)
+
+    def _encode_text(self, text: str) -> np.ndarray:
+        length = len(text)
+        if length > self.max_text_len:
+            raise ValueError(f"文本太長 (當前Reed-Solomon配置最大支持 {self.max_text_len} 個字符)")
+
+        # 組合負載：標頭 + 長度 + 文本，並用空字節填充到固定大小
+        data = bytearray(PAYLOAD_HEADER + chr(length) + text, 'utf-8')
+        if len(data) > self.max_data_len:
+            raise ValueError(f"文本太長 (UTF-8 編碼後超過 {self.max_data_len} 字節)")
+        padded_data = data + b'\0' * (self.max_data_len - len(data))
+
+        # 附加 nsym 個 ECC 字節，總共產生 255 字節的數據包，再展開為位元
+        with stage_timer("rs_encode"):
+            packet = self.rsc.encode(padded_data)
+        bits = np.unpackbits(np.frombuffer(bytes(packet), dtype=np.uint8))
+        bits.flags.writeable = False
+        return bits
+
+    def encode_text(self, text: str) -> np.ndarray:
+        """將文本編碼為 255*8 個位元 (唯讀陣列；最近編碼過的文本直接取自快取)。"""
+        return self._encode_cached(text)
+
+    @staticmethod
+    def bits_to_packet(bits) -> bytearray:
+        """將位元 (MSB 在前) 打包為字節。"""
+        return bytearray(np.packbits(np.asarray(bits, dtype=np.uint8)).tobytes())
+
+    def syndromes(self, packet) -> np.ndarray:
+        """以查表向量化計算數據包的校正子；全為 0 代表數據包沒有錯誤。"""
+        msg = np.frombuffer(bytes(packet), dtype=np.uint8)
+        nonzero = msg != 0
+        exponents = self._gf_log[msg[nonzero]] + self._syndrome_powers[:, nonzero]
+        return np.bitwise_xor.reduce(self._gf_exp[exponents % 255], axis=1)
+
+    def decode(self, packet: bytearray, erase_pos=None) -> tuple[bytearray, int]:
+        """
+        解碼數據包，返回 (數據部分, 校正的字節數)。
+        校正子全為 0 時直接返回數據部分，不進行錯誤定位。
+        錯誤過多時引發 ReedSolomonError。
+        """
+        with stage_timer("rs_decode"):
+            if not erase_pos and not self.syndromes(packet).any():
+                RS_DECODES.inc(result="clean")
+                return bytearray(packet[:-self.nsym]), 0
+            try:
+                decoded, _, errata = self.rsc.decode(bytearray(packet), erase_pos=erase_pos)
+            except FastReedSolomonError as e:
+                RS_DECODES.inc(result="failed")
+                # 統一為 reedsolo 的例外類型
+                raise ReedSolomonError(str(e)) from e
+        RS_DECODES.inc(result="corrected")
+        RS_CORRECTIONS.inc(len(errata))
+        return decoded, len(errata)
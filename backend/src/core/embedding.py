@@ -1,29 +1,66 @@
 import cv2
 import numpy as np
-import pywt
-from scipy.fftpack import dct, idct
+from typing import NamedTuple, Optional
 from .geometry import embed_synch_template, SynchTemplate
-from reedsolo import RSCodec
-from src.utils.logger import get_logger
+from .layout import LAYOUT_LEGACY, LAYOUT_TILED, SUPPORTED_LAYOUTS, SUPPORTED_LEVELS, PAYLOAD_BITS, SYNC_BITS, TILE_CAPACITY, TILE_SIZE, haar_reduce, sync_marker
+from .codec import PayloadCodec
+from .processor import ImageProcessor
+from src.utils.imports import lazy_module
+from src.utils.logger import get_logger, lazy
+from src.utils.cancellation import checkpoint
+from src.utils.metrics import StageClock
 
 # T027: 演算法參數常數 - 必須與 extraction.py 中的參數一致
 WAVELET = 'haar'  # DWT使用的小波類型
-LEVEL = 1  # DWT分解層級
+LEVEL = 1  # 預設的 DWT 分解層級 (可選 SUPPORTED_LEVELS，每次嵌入指定)
 BASE_DELTA = 10.0  # QIM量化步長基準 - 最終步長 delta = BASE_DELTA * alpha
 
 # Reed-Solomon 參數 - 為抗裁切而增強
 N_ECC_SYMBOLS = 30  # ECC（錯誤校正碼）符號的數量（可校正 N_ECC_SYMBOLS / 2 = 15 個錯誤）
 # 權衡：更多的ECC意味著更好的錯誤校正能力，但訊息容量會減少
 
+# 條帶處理時每個像素的工作記憶體估計 (YUV 副本、float32 亮度與位移量、輸出條帶等)
+BAND_BYTES_PER_PIXEL = 40
+
 logger = get_logger(__name__)
 
+# scipy.fftpack 只有 DCT 方法需要，延遲到第一次使用時才載入 (匯入約需 0.2 秒)
+_fftpack = lazy_module("scipy.fftpack")
+
+
+def _bayer_matrix(size: int) -> np.ndarray:
+    """size x size (2 的次方) 的 Bayer 抖動矩陣，值為 0, 1/size², ..., (size²-1)/size² 各一次。"""
+    matrix = np.zeros((1, 1), dtype=np.float32)
+    while matrix.shape[0] < size:
+        matrix = np.block([[4 * matrix, 4 * matrix + 2], [4 * matrix + 3, 4 * matrix + 1]])
+    return matrix / (size * size)
+
+
+class BandAnalysis(NamedTuple):
+    """_analyze_band 的結果：與強度無關，可對不同步長重複使用。"""
+    yuv: Optional[np.ndarray]  # 彩色條帶的 YUV (灰階為 None)
+    y_channel: np.ndarray
+    LL: np.ndarray  # 第 level 層的 LL (float32)
+    mask: np.ndarray  # 要嵌入的係數
+    bits: np.ndarray  # mask 位置上要嵌入的位元
+    level: int
+
+
+class EmbedPlan(NamedTuple):
+    """plan_embedding 的結果。"""
+    bits: np.ndarray
+    layout: int  # 實際使用的佈局
+    grid: tuple[int, int]  # 區塊網格 (區塊列數, 區塊行數)
+    level: int
+    embed_rows: int  # 會被修改的像素列數 (從第 0 列起)
+
 
 class WatermarkEmbedder:
     def __init__(self, block_size: int = 8):
         self.block_size = block_size
         
-        # 初始化Reed-Solomon編碼器
-        self.rsc = RSCodec(N_ECC_SYMBOLS)
+        # 初始化Reed-Solomon編碼器 (含最近文本的編碼快取)
+        self.codec = PayloadCodec(N_ECC_SYMBOLS)
 
     def generate_log_mask(self, image_gray: np.ndarray, base_alpha: float = 1.0) -> np.ndarray:
         # (原始方法未變)
@@ -36,143 +73,191 @@ class WatermarkEmbedder:
         return alpha_map
 
     def _dct2(self, block):
+        dct = _fftpack().dct
         return dct(dct(block.T, norm='ortho').T, norm='ortho')
 
     def _idct2(self, block):
+        idct = _fftpack().idct
         return idct(idct(block.T, norm='ortho').T, norm='ortho')
 
-    def text_to_bits(self, text: str) -> list[int]:
-        """將字串轉換為位元列表，包含標頭、長度、和Reed-Solomon錯誤校正碼。"""
-        # --- 1. 構建負載 ---
-        # 負載是用戶訊息和一些額外資訊的組合，以確保可以正確提取它。
-
-        # "INV" 是一個標頭，用於識別我們的浮水印。
-        header = "INV"
-        length = len(text)
+    def text_to_bits(self, text: str) -> np.ndarray:
+        """將字串轉換為位元陣列，包含標頭、長度、和Reed-Solomon錯誤校正碼。"""
+        # 負載結構 (共 255 字節，見 codec.py)：
+        #   "INV" 標頭 (3) + 長度 (1) + 文本 + 空字節填充 + 30 個 ECC 字節
+        # 255 字節的數據包展開為 255 * 8 = 2040 位元，每個位元都將嵌入到圖像的一個係數中。
+        # 編碼結果會被快取，重複嵌入相同的文本時不需重新進行 Reed-Solomon 編碼。
+        bits = self.codec.encode_text(text)
         
-        # Reed-Solomon編碼器處理固定大小的數據塊。我們的是255字節。
-        # 一部分塊用於錯誤校正，剩下的是數據。
-        max_data_len = 255 - N_ECC_SYMBOLS
+        logger.debug("[Embed] 原始文本: '%s', 長度: %s", text, len(text))
+        logger.debug("[Embed] 負載 (前20字節): %s", lazy(lambda: list(self.codec.bits_to_packet(bits[:160]))))
+        return bits
+
+    def _qim_embed(self, coeffs: np.ndarray, bits, delta: float) -> np.ndarray:
+        """對一組係數做 QIM 嵌入 (向量化)，回傳量化後的係數。"""
+        bits = np.asarray(bits)
+        # 將係數除以delta並四捨五入，得到量化索引q。
+        q = np.round(coeffs / delta)
+        # 根據要嵌入的位元調整q的奇偶性：位元0 -> 偶數，位元1 -> 奇數。
+        mismatch = np.mod(q, 2) != bits
+        q[mismatch & (bits == 0)] -= 1
+        q[mismatch & (bits == 1)] += 1
+        # 用新的q重新計算係數，從而嵌入位元。
+        return q * delta
+
+    def _bit_plane(self, ll_top: int, ll_rows: int, ll_width: int, bits: np.ndarray, layout: int, grid: tuple[int, int], level: int = LEVEL) -> np.ndarray:
+        """
+        LL 子帶中第 ll_top 列起 ll_rows 列要嵌入的位元 (int8)，-1 表示該係數不嵌入。
+        只依座標計算，因此每個條帶可以獨立產生自己的部分。
+        """
+        i = np.arange(ll_top, ll_top + ll_rows)[:, None]
+        j = np.arange(ll_width)[None, :]
+        if layout == LAYOUT_LEGACY:
+            # 舊版佈局：依序放在展平 LL 的最前面
+            flat = i * ll_width + j
+            plane = np.where(flat < len(bits), bits[np.minimum(flat, len(bits) - 1)], -1)
+        else:
+            # 區塊佈局：每個完整區塊的前 SYNC_BITS + PAYLOAD_BITS 個位置放「同步標記 + 負載」
+            slot_bits = np.full(TILE_CAPACITY, -1, dtype=np.int8)
+            slot_bits[:SYNC_BITS + PAYLOAD_BITS] = np.concatenate([sync_marker(LAYOUT_TILED, level), bits])
+            plane = slot_bits[(i % TILE_SIZE) * TILE_SIZE + j % TILE_SIZE]
+            plane[(i >= grid[0] * TILE_SIZE) | (j >= grid[1] * TILE_SIZE)] = -1
+        return plane.astype(np.int8)
+
+    def _analyze_band(self, band: np.ndarray, ll_top: int, bits: np.ndarray, layout: int, grid: tuple[int, int], level: int = LEVEL) -> Optional[BandAnalysis]:
+        """
+        嵌入前與強度無關的部分：條帶的 YUV、第 level 層的 LL 與要嵌入的位元。
+        條帶中沒有要嵌入的係數時返回 None。alpha 搜尋 (見 tuning.py) 對同一條帶以不同步長重複使用。
+        """
+        color = len(band.shape) == 3
+        yuv = cv2.cvtColor(band, cv2.COLOR_BGR2YUV) if color else None
+        y_channel = yuv[:, :, 0] if color else band
+        LL = haar_reduce(y_channel.astype(np.float32), level)
+        plane = self._bit_plane(ll_top, LL.shape[0], LL.shape[1], bits, layout, grid, level)
+        mask = plane >= 0
+        if not mask.any():
+            return None
+        return BandAnalysis(yuv, y_channel, LL, mask, plane[mask], level)
+
+    def _synthesize_band(self, band: np.ndarray, analysis: BandAnalysis, delta: float, clock: Optional[StageClock] = None) -> np.ndarray:
+        """以步長 delta 量化分析結果中的係數，並把變化量加回條帶的像素，返回新的條帶 (不修改輸入)。"""
+        clock = clock or StageClock()
+        LL, mask, level = analysis.LL, analysis.mask, analysis.level
+        scale = 2 ** level
+        with clock("qim"):
+            # --- 量化索引調變 (QIM) ---
+            # QIM 是一種通過修改係數的量化值來嵌入數據的技術，使用係數的奇偶性來代表0或1。
+            shift = np.zeros_like(LL)
+            shift[mask] = self._qim_embed(LL[mask], analysis.bits, delta) - LL[mask]
         
-        # 3 Byte 放標頭(INV); 1 Byte 放長度。
-        max_text_len = max_data_len - 4
-        if length > max_text_len:
-            raise ValueError(f"文本太長 (當前Reed-Solomon配置最大支持 {max_text_len} 個字符)")
+        with clock("reconstruct"):
+            # --- 重建條帶 ---
+            # 每個係數的變化量平均分到它的 2^level x 2^level 像素 (捨棄對稱延伸的部分)。
+            shift = np.repeat(np.repeat(shift / scale, scale, axis=0), scale, axis=1)[:band.shape[0], :band.shape[1]]
+            dither = 0.0
+            if level > 1:
+                # 區塊內的像素變化量相同，直接截斷會一起捨去，係數最多偏差 2^level (與步長同一量級)。
+                # 加上 Bayer 抖動 (區塊內的值為 k / 4^level) 後，區塊內截斷的總和恰為總變化量的 floor，
+                # 係數誤差小於 1 / 2^level。第 1 層維持原本的截斷，輸出與之前的版本逐位元相同。
+                dither = np.tile(_bayer_matrix(scale), (-(-band.shape[0] // scale), -(-band.shape[1] // scale)))[:band.shape[0], :band.shape[1]]
+            # 將 Y 通道的值裁剪到 0-255 範圍並轉換為 8 位無符號整數。
+            processed_y = np.clip(analysis.y_channel + shift + dither, 0, 255).astype(np.uint8)
+            if analysis.yuv is None:
+                return processed_y
             
-        # 組合負載：標頭 + 長度 + 文本
-        payload_str = header + chr(length) + text
-        data = bytearray(payload_str, 'utf-8')
-        
-        # --- 2. 填充和編碼 ---
-        # 用空字節填充數據，使其達到固定大小 (225 bits)。
-        # 這確保了即使訊息很短，整個數據塊的大小也是一致的。
-        padded_data = data + b'\0' * (max_data_len - len(data))
-
-        # 使用 Reed-Solomon 對數據進行編碼。
-        # 這會將 30 個 ECC 字節附加到數據的末尾，總共產生 255 字節的數據包。
-        # 這些 ECC 字節可以修復在提取過程中可能發生的錯誤。
-        packet = self.rsc.encode(padded_data)
-        
-        logger.debug(f"[Embed] 原始文本: '{text}', 長度: {length}")
-        logger.debug(f"[Embed] 負載 (前20字節): {list(packet[:20])}")
-        
-        # --- 轉換為位元 ---
-        # 將 255 bit 的數據包轉換為 Byte (255 * 8 = 2040 位元)。
-        # 每個位元都將嵌入到圖像的一個係數中。
-        encoded_bits = []
-        for byte in packet:
-            binval = bin(byte)[2:].rjust(8, '0')
-            encoded_bits.extend([int(b) for b in binval])
-        return encoded_bits
-
-    def embed_watermark_dwt_qim(self, image: np.ndarray, text: str, alpha: float = 1.0) -> np.ndarray:
-        """使用DWT和QIM嵌入浮水印。"""
-        
-        # 計算實際的量化步長
-        delta = BASE_DELTA * alpha
-        logger.debug(f"[Embed] 參數: WAVELET={WAVELET}, LEVEL={LEVEL}, BASE_DELTA={BASE_DELTA}, alpha={alpha}, delta={delta}")
-        
-        # --- 1. 圖像預處理 ---
-        # 如果圖像有顏色，我們將其轉換為 YUV 色彩空間。
-        # Y 通道代表亮度（黑白），U和V代表色度，只在 Y 通道中嵌入浮水印，避免影響顏色。
-        if len(image.shape) == 3:
-            yuv = cv2.cvtColor(image, cv2.COLOR_BGR2YUV)
-            y_channel = yuv[:, :, 0].astype(float)
-        else: # 如果圖像已經是灰階
-            y_channel = image.astype(float)
-        
-        original_y_shape = y_channel.shape
+            # 與原始 U, V 通道合併；亮度沒有改變的像素保留原值 (避免 YUV 來回轉換的捨入誤差)
+            yuv = analysis.yuv.copy()
+            yuv[:, :, 0] = processed_y
+            return np.where((shift != 0)[:, :, None], cv2.cvtColor(yuv, cv2.COLOR_YUV2BGR), band)
+
+    def _embed_band(self, band: np.ndarray, ll_top: int, bits: np.ndarray, layout: int, grid: tuple[int, int], delta: float, clock: Optional[StageClock] = None, level: int = LEVEL) -> np.ndarray:
+        """
+        對一個條帶 (起始列為 2^level 的倍數的連續像素列) 嵌入浮水印。
+
+        第 level 層 Haar 的 LL 係數只依賴自己的 2^level x 2^level 像素區塊：係數改變 d (其他子帶不變)，
+        逆轉換後區塊內每個像素各改變 d / 2^level。因此不需要對整張圖像做 DWT/IDWT，只要算出條帶的 LL、
+        量化後把差值加回像素即可，工作記憶體與條帶大小成正比 (float32)。
+        clock 累計各階段 (dwt/qim/reconstruct) 的耗時。
+        """
+        clock = clock or StageClock()
+        with clock("dwt"):
+            analysis = self._analyze_band(band, ll_top, bits, layout, grid, level)
+        if analysis is None:
+            return band
+        return self._synthesize_band(band, analysis, delta, clock)
+
+    def plan_embedding(self, image_shape: tuple, text: str, layout: int = LAYOUT_LEGACY, level: int = LEVEL) -> EmbedPlan:
+        """
+        檢查參數並決定負載的佈局：位元流、實際使用的佈局 (圖像太小時退回舊版)、區塊網格，
+        以及需要修改的像素列數 (其下方的列保持不變)。與強度 alpha 無關。
+        """
+        if layout not in SUPPORTED_LAYOUTS:
+            raise ValueError(f"不支援的佈局版本: {layout}")
+        if level not in SUPPORTED_LEVELS:
+            raise ValueError(f"不支援的 DWT 層級: {level}")
         
         # 準備位元流，將要嵌入的文本轉換為包含錯誤校正碼的位元流。
         bits = self.text_to_bits(text)
         
         # --- 離散小波變換 (DWT) ---
-        # DWT 將圖像分解為不同的頻率分量。
-        # 我們使用 'haar' 小波，因為它簡單且高效。
-        # 分解產生四個子帶：
-            # LL: 低頻（圖像的主要結構）
-            # LH, HL, HH: 高頻（邊緣和紋理）
+        # 每層 'haar' DWT 將圖像分解為 LL (低頻，圖像的主要結構) 與 LH, HL, HH (高頻，邊緣和紋理)。
         # 我們將浮水印嵌入到LL子帶中，因為它對圖像質量的影響最小，並且對壓縮等攻擊最不敏感。
-        coeffs = pywt.dwt2(y_channel, WAVELET)
-        LL, (LH, HL, HH) = coeffs
-        
-        logger.debug(f"[Embed] LL子帶形狀: {LL.shape}, 總容量: {LL.shape[0] * LL.shape[1]} 位元")
-        logger.debug(f"[Embed] QIM前LL子帶的最小/最大值: {LL.min():.2f}/{LL.max():.2f}")
-        logger.debug(f"[Embed] 嵌入 {len(bits)} 位元, 前50位: {bits[:50]}")
-        
-        ll_flat = LL.flatten()
-        
-        if len(bits) > len(ll_flat):
-            raise ValueError("圖像空間不足以嵌入浮水印。")
-        
-        # --- 量化索引調變 (QIM) ---
-        # QIM 是一種通過修改係數的量化值來嵌入數據的技術。
-        # 使用係數的奇偶性來代表0或1。
-        # 我們將浮水印順序嵌入到圖像的左上角區域，這種策略有助於抵抗從圖像底部或右側的裁切。
-        logger.debug(f"[Embed] 使用順序嵌入 (位置 0-{len(bits)-1})")
-        for i in range(len(bits)):
-            c = ll_flat[i]  # 獲取一個LL係數
-            b = bits[i]     # 獲取要嵌入的位元 (0 或 1)
-            
-            # 將係數除以delta並四捨五入，得到量化索引q。
-            q = round(c / delta)
-            
-            # 根據要嵌入的位元調整q的奇偶性。
-            # 如果位元是0，q必須是偶數。
-            # 如果位元是1，q必須是奇數。
-            if b == 0 and q % 2 != 0:
-                q -= 1
-            elif b == 1 and q % 2 == 0:
-                q += 1
-            
-            # 用新的q重新計算係數，從而嵌入位元。
-            ll_flat[i] = q * delta
-            
-        LL_w = ll_flat.reshape(LL.shape)
-        
-        logger.debug(f"[Embed] QIM後LL_w的最小/最大值: {LL_w.min():.2f}/{LL_w.max():.2f}")
+        # 只有 LL 會被修改，高頻子帶保持不變，所以逐條帶直接在像素上套用 LL 的變化即可。
+        height, width = image_shape[:2]
+        scale = 2 ** level
+        ll_shape = (-(-height // scale), -(-width // scale))
+        logger.debug("[Embed] LL子帶形狀: %s, 總容量: %s 位元", ll_shape, ll_shape[0] * ll_shape[1])
+        logger.debug("[Embed] 嵌入 %s 位元, 前50位: %s", len(bits), lazy(lambda: bits[:50].tolist()))
         
-        # --- 重建圖像 ---
-        # 使用修改後的LL子帶和原始的LH, HL, HH子帶進行逆 DWT，重建帶有浮水印的Y通道。
-        coeffs_w = (LL_w, (LH, HL, HH))
-        y_channel_w = pywt.idwt2(coeffs_w, WAVELET)
+        # 圖像小於一個區塊時無法使用區塊佈局，退回舊版佈局。
+        grid = (ll_shape[0] // TILE_SIZE, ll_shape[1] // TILE_SIZE)
+        if layout == LAYOUT_TILED and not (grid[0] and grid[1]):
+            logger.warning("[Embed] LL子帶 %s 小於一個區塊，改用舊版佈局", ll_shape)
+            layout = LAYOUT_LEGACY
         
-        # 有時 IDWT 後的尺寸會因舍入而有1個像素的差異 -> 需要確保其尺寸與原始 Y 通道完全相同。
-        if y_channel_w.shape != original_y_shape:
-            logger.warning(f"[Embed] IDWT尺寸不匹配！得到 {y_channel_w.shape}, 期望 {original_y_shape}")
-            y_channel_w = y_channel_w[:original_y_shape[0], :original_y_shape[1]]
+        if layout == LAYOUT_LEGACY:
+            # 我們將浮水印順序嵌入到圖像的左上角區域，這種策略有助於抵抗從圖像底部或右側的裁切。
+            if len(bits) > ll_shape[0] * ll_shape[1]:
+                raise ValueError("圖像空間不足以嵌入浮水印。")
+            embed_rows = scale * -(-len(bits) // ll_shape[1])
+            logger.debug("[Embed] 使用順序嵌入 (位置 0-%s)", len(bits)-1)
+        else:
+            # 每個區塊都放一份「同步標記 + 負載」，任何一個區塊都能單獨解碼。
+            embed_rows = scale * grid[0] * TILE_SIZE
+            logger.debug("[Embed] 使用區塊嵌入 (%s 個區塊)", grid[0] * grid[1])
+        return EmbedPlan(bits, layout, grid, level, min(embed_rows, height))
+
+    def embed_watermark_dwt_qim(self, image: np.ndarray, text: str, alpha: float = 1.0, layout: int = LAYOUT_LEGACY, memory_budget: Optional[int] = None, level: int = LEVEL) -> np.ndarray:
+        """
+        使用DWT和QIM嵌入浮水印。layout 決定負載在 LL 子帶中的佈局，level 決定使用第幾層 Haar 分解的
+        LL 子帶 (見 layout.py)。
+
+        圖像依 memory_budget (預設見 processor.MEMORY_BUDGET_BYTES) 分成多個條帶逐一處理，
+        輸出超過預算時以 np.memmap 存放，因此工作記憶體與圖像大小無關。
+        """
+        # 計算實際的量化步長
+        delta = BASE_DELTA * alpha
+        logger.debug("[Embed] 參數: WAVELET=%s, LEVEL=%s, BASE_DELTA=%s, alpha=%s, delta=%s, layout=%s", WAVELET, level, BASE_DELTA, alpha, delta, layout)
         
-        # 將 Y 通道的值裁剪到 0-255 範圍並轉換為 8 位無符號整數。
-        processed_y = np.clip(y_channel_w, 0, 255).astype(np.uint8)
+        plan = self.plan_embedding(image.shape, text, layout, level)
+        bits, layout, grid, embed_rows = plan.bits, plan.layout, plan.grid, plan.embed_rows
+        height, width = image.shape[:2]
+        scale = 2 ** level
         
-        # 如果原始圖像是彩色的，將修改後的 Y 通道與原始 U, V 通道合併。
-        if len(image.shape) == 3:
-            yuv[:, :, 0] = processed_y
-            watermarked = cv2.cvtColor(yuv, cv2.COLOR_YUV2BGR)
-        else: # 否則，直接使用修改後的Y通道。
-            watermarked = processed_y
+        # --- 逐條帶處理 ---
+        # 條帶起始列為 2^level 的倍數，與 Haar 的像素區塊對齊；沒有嵌入位元的條帶直接複製。
+        # 各階段的耗時跨條帶累計，每次嵌入只記錄一次 (見 src/utils/metrics.py)。
+        watermarked = ImageProcessor.allocate(image.shape, image.dtype, memory_budget)
+        rows = ImageProcessor.band_rows(height, width * BAND_BYTES_PER_PIXEL, memory_budget, align=scale)
+        with StageClock() as clock:
+            for top, bottom in ImageProcessor.iter_bands(height, rows):
+                checkpoint()
+                band = image[top:bottom]
+                if top < embed_rows:
+                    band = self._embed_band(band, top // scale, bits, layout, grid, delta, clock, level)
+                with clock("reconstruct"):
+                    watermarked[top:bottom] = band
         
-        logger.info(f"[Embed] 成功嵌入 {len(bits)} 位元到圖像中")
+        logger.info("[Embed] 成功嵌入 %s 位元到圖像中 (第 %s 層, 條帶高度 %s 列)", len(bits), level, rows)
             
         return watermarked
 
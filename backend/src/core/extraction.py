@@ -1,209 +1,715 @@
 import cv2
 import numpy as np
-import pywt
-from scipy.fftpack import dct
 from .geometry import detect_rotation_scale, correct_geometry, SynchTemplate
-from reedsolo import RSCodec, ReedSolomonError
-from src.utils.logger import get_logger
+from .layout import LAYOUT_LEGACY, LAYOUT_TILED, SUPPORTED_LEVELS, TILE_SIZE, SYNC_BITS, SYNC_MAX_MISMATCH, PAYLOAD_BITS, sync_marker, tile_slot_positions, haar_ll, haar_reduce
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional
+from .codec import PayloadCodec
+from reedsolo import ReedSolomonError
+from src.utils.cancellation import checkpoint
+from src.utils.logger import get_logger, lazy
+from src.utils.threads import job_threads
+from src.utils.metrics import EXTRACTIONS, FALLBACKS, SCREENED_OUT, stage_timer
 
 # T028: 演算法參數常數 - 必須與 embedding.py 中的參數一致
 WAVELET = 'haar'  # DWT使用的小波類型
-LEVEL = 1  # DWT分解層級
+LEVEL = 1  # 預設的 DWT 分解層級 (盲提取時依序嘗試 SUPPORTED_LEVELS)
 BASE_DELTA = 10.0  # QIM量化步長基準 - 最終步長 delta = BASE_DELTA * alpha
 
 # Reed-Solomon 參數 (必須與嵌入器匹配) - 為抗裁切而增強
 N_ECC_SYMBOLS = 30  # 可校正最多 15 個字節的錯誤
 RS_BLOCK_SIZE = 255  # GF(2^8) 的最大塊大小
 
+# 區塊佈局 (LAYOUT_TILED) 解碼參數
+MAX_TILE_ATTEMPTS = 16  # 最多嘗試解碼的區塊數 (與圖像大小無關)
+TILE_DECODE_WORKERS = 4  # 第一個區塊失敗後，並行解碼其餘區塊的執行緒數 (不超過工作分到的核心數)
+
+# 多步長盲驗證：嵌入時 alpha 可選 0.1-5.0 (步進 0.1)，另加上舊版驗證固定使用的 10.0
+ALPHA_CANDIDATES = tuple(round(0.1 * i, 1) for i in range(1, 51)) + (10.0,)
+MAX_DELTA_CANDIDATES = 4  # 依合理性排序後，最多進行 RS 解碼的步長數
+MAX_GRID_CANDIDATES = 4  # 區塊網格搜尋時，最多搜尋的 (像素奇偶偏移, 步長) 組合數
+ODD_MULTIPLE_MAX_MISMATCH = 0.25  # 解碼步長的奇數倍得到的 1 位元，與原本不同的比例不超過此值即視為嵌入時的步長
+ODD_MULTIPLE_MAX_RESIDUAL = 0.1  # 且以該奇數倍為單位的平均量化殘差不超過此值 (隨機係數約 0.25)
+PAYLOAD_HEADER_BITS = np.unpackbits(np.frombuffer(b"INV", dtype=np.uint8))  # 負載開頭的已知位元
+
+# 軟判決抹除解碼：硬判決 RS 解碼失敗後，依序把最不可靠的字節標記為抹除 (erasure) 再解碼。
+# e 個抹除加 t 個錯誤只要 e + 2t <= N_ECC_SYMBOLS 即可校正；不用滿 30 個，
+# 保留至少 6 個冗餘符號，否則任何雜訊都會被「校正」成一個合法碼字。
+ERASURE_STEPS = (8, 16, 24)
+
+# 負篩選 (未嵌入浮水印的圖像提早返回)：格點一致性統計量的門檻與取樣數
+# 門檻由 benchmarks/calibrate_screening.py 在基準語料上校準 (見 benchmarks/screening_calibration.json)
+SCREEN_SAMPLE_SIZE = 512  # 每個候選區域取樣的 LL 係數數量
+SCREEN_MIN_COHERENCE = 0.403  # 可解碼嵌入圖像的 0.1% 分位數；未嵌入的圖像最高約 0.04
+SCREEN_HEADER_MAX_MISMATCH = 4  # 舊版佈局 "INV" 標頭 (24 位元) 允許的錯誤位元數
+
 logger = get_logger(__name__)
 
+
+def _dct_basis(n: int) -> np.ndarray:
+    """正交 DCT-II 矩陣 D (與 scipy.fftpack.dct(norm='ortho') 相同)：2-D DCT 為 D · block · Dᵀ。"""
+    k = np.arange(n)
+    basis = np.sqrt(2.0 / n) * np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n))
+    basis[0] /= np.sqrt(2.0)
+    return basis
+
 class WatermarkExtractor:
     def __init__(self, block_size: int = 8):
         self.block_size = block_size
         
-        # 初始化Reed-Solomon解碼器
-        self.rsc = RSCodec(N_ECC_SYMBOLS)
-
-    def _dct2(self, block):
-        return dct(dct(block.T, norm='ortho').T, norm='ortho')
+        # 初始化Reed-Solomon解碼器 (校正子為 0 時跳過錯誤定位)
+        self.codec = PayloadCodec(N_ECC_SYMBOLS)
 
     def _parse_payload(self, payload: bytearray) -> str:
         """解析解碼後的負載以提取訊息。"""
+        return self._parse_payload_checked(payload)[1]
+
+    def _parse_payload_checked(self, payload: bytearray) -> tuple[bool, str]:
+        """解析解碼後的負載，回傳 (是否成功, 訊息或錯誤描述)。"""
         try:
             # --- 1. 驗證標頭 ---
             # 這是健全性檢查，以確保我們正在處理一個有效的浮水印。
             if len(payload) < 4:
-                logger.error(f"[Parse] 負載太短: {len(payload)} 字節 (至少需要 4 字節)")
-                return "負載太短 (浮水印已損壞)"
+                logger.error("[Parse] 負載太短: %s 字節 (至少需要 4 字節)", len(payload))
+                return False, "負載太短 (浮水印已損壞)"
             
             # 檢查是否存在 "INV" 標頭。
             header = payload[:3].decode('utf-8', errors='ignore')
             if header != "INV":
-                logger.error(f"[Parse] 無效的標頭: '{header}' (應為 'INV')")
-                return f"無效的浮水印標頭 (得到 '{header}', 應為 'INV')"
+                logger.error("[Parse] 無效的標頭: '%s' (應為 'INV')", header)
+                return False, f"無效的浮水印標頭 (得到 '{header}', 應為 'INV')"
 
             # --- 2. 提取長度並驗證 ---
             # 第4個字節儲存了原始訊息的長度。
             length_val = payload[3]
-            logger.debug(f"[Parse] 標頭正確, 訊息長度: {length_val}")
+            logger.debug("[Parse] 標頭正確, 訊息長度: %s", length_val)
             
             # 再次檢查長度是否在有效範圍內。
             max_text_len = 255 - N_ECC_SYMBOLS - 4
             if length_val > max_text_len:
-                logger.error(f"[Parse] 無效的長度: {length_val} (最大為 {max_text_len})")
-                return f"無效的訊息長度: {length_val} (浮水印已損壞)"
+                logger.error("[Parse] 無效的長度: %s (最大為 %s)", length_val, max_text_len)
+                return False, f"無效的訊息長度: {length_val} (浮水印已損壞)"
 
             if length_val == 0:
                 logger.warning("[Parse] 空訊息 (長度=0)")
-                return ""
+                return True, ""
             
             # --- 提取並解碼訊息 ---
             end_index = 4 + length_val
             if end_index > len(payload):
-                logger.error(f"[Parse] 長度 {length_val} 超出負載大小 {len(payload)}")
-                return "訊息長度超出負載大小 (浮水印已損壞)"
+                logger.error("[Parse] 長度 %s 超出負載大小 %s", length_val, len(payload))
+                return False, "訊息長度超出負載大小 (浮水印已損壞)"
             
             message_bytes = payload[4:end_index]
             try:
                 # 嘗試使用UTF-8解碼訊息。'strict'模式下，任何錯誤都會引發異常。
                 message = message_bytes.decode('utf-8', errors='strict')
                 message = message.rstrip('\x00')  # 移除填充的空字節
-                logger.info(f"[Parse] 成功提取訊息: '{message}' ({len(message)} 個字符)")
-                return message
+                logger.info("[Parse] 成功提取訊息: '%s' (%s 個字符)", message, len(message))
+                return True, message
             except UnicodeDecodeError as e:
                 # 如果嚴格解碼失敗，可能是因為一些位元錯誤。
                 # 我們嘗試使用 'ignore' 模式進行寬鬆解碼作為備份。
-                logger.error(f"[Parse] UTF-8 解碼錯誤: {e}")
+                logger.error("[Parse] UTF-8 解碼錯誤: %s", e)
                 message = message_bytes.decode('utf-8', errors='ignore').rstrip('\x00')
-                logger.warning(f"[Parse] 備份解碼 (可能丟失字符): '{message}'")
-                return message
+                logger.warning("[Parse] 備份解碼 (可能丟失字符): '%s'", message)
+                return True, message
             
         except Exception as e:
-            logger.error(f"[Parse] 未預期的錯誤: {type(e).__name__}: {str(e)}")
-            return f"負載解析錯誤: {type(e).__name__} - {str(e)}"
+            logger.error("[Parse] 未預期的錯誤: %s: %s", type(e).__name__, e)
+            return False, f"負載解析錯誤: {type(e).__name__} - {str(e)}"
 
     def _decode_rs_stream(self, bits: list[int]) -> str:
         """使用Reed-Solomon解碼位元列表並解析負載。"""
+        return self._decode_rs_checked(bits)[1]
+
+    def _decode_rs_checked(self, bits, reliability: Optional[np.ndarray] = None) -> tuple[bool, str]:
+        """
+        使用Reed-Solomon解碼位元列表並解析負載，回傳 (是否成功, 訊息或錯誤描述)。
+        提供每個位元的可靠度時，硬判決解碼失敗後會改用抹除解碼重試 (見 _decode_with_erasures)。
+        """
         # 確保我們有足夠的位元來構成一個完整的255字節數據包。
         if len(bits) < RS_BLOCK_SIZE * 8:
-            logger.error(f"[RS] 位元不足: {len(bits)} (需要 {RS_BLOCK_SIZE * 8})")
-            return f"沒有足夠的數據提取浮水印 (找到 {len(bits)} 位元, 需要 {RS_BLOCK_SIZE * 8})"
+            logger.error("[RS] 位元不足: %s (需要 %s)", len(bits), RS_BLOCK_SIZE * 8)
+            return False, f"沒有足夠的數據提取浮水印 (找到 {len(bits)} 位元, 需要 {RS_BLOCK_SIZE * 8})"
 
         # --- 將位元轉換為字節 ---
-        packet = bytearray()
-        num_bytes = RS_BLOCK_SIZE
-        bits_to_decode = bits[:num_bytes*8]
-        for i in range(num_bytes):
-            byte_str = "".join(map(str, bits_to_decode[i*8:(i+1)*8]))
-            packet.append(int(byte_str, 2))
+        packet = self.codec.bits_to_packet(bits[:RS_BLOCK_SIZE * 8])
         
-        logger.debug(f"[RS] 輸入數據包 (前20字節): {list(packet[:20])}")
+        logger.debug("[RS] 輸入數據包 (前20字節): %s", lazy(lambda: list(packet[:20])))
         
         # --- Reed-Solomon 解碼 ---
         # 解碼器會嘗試修復數據包中的錯誤，由於我們使用了 30 個 ECC 符號，最多可以修復 15 個字節的錯誤。
+        # 未受損的數據包校正子全為 0，會直接跳過錯誤定位。
         try:
-            decoded_data, _, errata = self.rsc.decode(packet)
-            logger.info(f"[RS] 解碼成功, 校正了 {len(errata)} 個錯誤")
-            logger.debug(f"[RS] 解碼後的數據 (前20字節): {list(decoded_data[:20])}")
+            decoded_data, corrections = self.codec.decode(packet)
+            logger.info("[RS] 解碼成功, 校正了 %s 個錯誤", corrections)
+            logger.debug("[RS] 解碼後的數據 (前20字節): %s", lazy(lambda: list(decoded_data[:20])))
             # 如果解碼成功，解析負載以獲取最終的訊息。
-            return self._parse_payload(decoded_data)
+            return self._parse_payload_checked(decoded_data)
         except ReedSolomonError as e:
             # 如果錯誤太多，解碼器會放棄並引發錯誤。
-            logger.error(f"[RS] 解碼失敗: {str(e)}")
-            return "未檢測到浮水印 (Reed-Solomon解碼失敗: 錯誤過多)"
+            if reliability is not None:
+                ok, text = self._decode_with_erasures(packet, reliability[:RS_BLOCK_SIZE * 8])
+                if ok:
+                    return True, text
+            logger.error("[RS] 解碼失敗: %s", e)
+            return False, "未檢測到浮水印 (Reed-Solomon解碼失敗: 錯誤過多)"
         except Exception as e:
-            logger.error(f"[RS] 未預期的錯誤: {type(e).__name__}: {str(e)}")
-            return f"Reed-Solomon解碼錯誤: {type(e).__name__} - {str(e)}"
+            logger.error("[RS] 未預期的錯誤: %s: %s", type(e).__name__, e)
+            return False, f"Reed-Solomon解碼錯誤: {type(e).__name__} - {str(e)}"
+
+    def _decode_with_erasures(self, packet: bytearray, reliability: np.ndarray) -> tuple[bool, str]:
+        """
+        軟判決重試：字節的可靠度取其 8 個位元中最低者，依 ERASURE_STEPS 逐步把最不可靠的字節
+        標記為抹除後解碼。抹除的位置已知，每個只佔用 1 個 ECC 符號 (未知錯誤要 2 個)，
+        因此輕微 JPEG 壓縮造成的邊界附近的位元錯誤，可以超過硬判決 15 個字節的上限。
+        抹除越多，剩下能校正的未知錯誤越少，錯誤過多時也越容易解出另一個合法但錯誤的碼字；
+        訊息之後的填充字節必須全為 0 (見 _padding_intact)，否則視為誤校正。
+        """
+        byte_reliability = reliability.reshape(-1, 8).min(axis=1)
+        order = np.argsort(byte_reliability, kind='stable')
+        for count in ERASURE_STEPS:
+            erase_pos = sorted(order[:count].tolist())
+            try:
+                decoded_data, corrections = self.codec.decode(packet, erase_pos=erase_pos)
+            except ReedSolomonError:
+                continue
+            if not self._padding_intact(decoded_data):
+                logger.debug("[RS] 抹除解碼 (%s 個抹除) 的填充字節不為 0，視為誤校正", count)
+                continue
+            ok, text = self._parse_payload_checked(decoded_data)
+            if ok:
+                logger.info("[RS] 抹除解碼成功 (%s 個抹除), 校正了 %s 個字節", count, corrections)
+                return True, text
+        return False, "未檢測到浮水印 (Reed-Solomon抹除解碼失敗)"
 
-    def extract_watermark_dwt_qim(self, image: np.ndarray, alpha: float = 1.0) -> str:
-        """使用 DWT 和 QIM 提取浮水印。"""
+    def _padding_intact(self, payload: bytearray) -> bool:
+        """訊息之後的填充字節是否全為 0 (長度欄位為字元數，訊息最多佔 4 倍的 UTF-8 字節)。"""
+        if len(payload) < 4:
+            return False
+        return len(bytes(payload[4:]).rstrip(b"\0")) <= 4 * payload[3]
+
+    def extract_watermark_dwt_qim(self, image: np.ndarray, alpha: float = 1.0, level: int = LEVEL) -> str:
+        """使用 DWT 和 QIM 提取浮水印 (舊版佈局)。"""
+        EXTRACTIONS.inc(method="dwt_qim")
+        return self._extract_dwt_qim_checked(image, alpha, level)[1]
+
+    def _extract_dwt_qim_checked(self, image: np.ndarray, alpha: float = 1.0, level: int = LEVEL) -> tuple[bool, str]:
+        """使用 DWT 和 QIM 提取浮水印 (舊版佈局)，回傳 (是否成功, 訊息或錯誤描述)。"""
         
         # 計算實際的量化步長
         delta = BASE_DELTA * alpha
-        logger.debug(f"[Extract] 參數: WAVELET={WAVELET}, LEVEL={LEVEL}, BASE_DELTA={BASE_DELTA}, delta={delta}")
-        
-        # --- 圖像預處理 ---
-        # 與嵌入過程相同，只處理Y通道。
-        if len(image.shape) == 3:
-            yuv = cv2.cvtColor(image, cv2.COLOR_BGR2YUV)
-            y_channel = yuv[:, :, 0].astype(float)
-        else:
-            y_channel = image.astype(float)
+        logger.debug("[Extract] 參數: WAVELET=%s, LEVEL=%s, BASE_DELTA=%s, delta=%s", WAVELET, level, BASE_DELTA, delta)
         
         # --- 離散小波變換 (DWT) ---
-        # 應用與嵌入時相同的DWT分解。
-        coeffs = pywt.dwt2(y_channel, WAVELET)
-        LL, _ = coeffs
-        
-        logger.debug(f"[Extract] LL子帶形狀: {LL.shape}, 位元數: {LL.shape[0] * LL.shape[1]}")
-        
-        ll_flat = LL.flatten()
+        # 負載只佔展平 LL 的前 2040 個係數，只需對圖像最上方的幾列像素計算 LL (與 pywt.wavedec2 逐位元一致)，
+        # 不必轉換整張圖像，記憶體用量與圖像高度無關。
+        ll_flat = self._legacy_strip(image, level)
         num_bits_to_extract = RS_BLOCK_SIZE * 8
         
-        if num_bits_to_extract > len(ll_flat):
-            return "圖像中的數據不足以提取浮水印。"
+        if ll_flat is None:
+            return False, "圖像中的數據不足以提取浮水印。"
         
         # --- 量化索引調變 (QIM) 提取 ---
         # 嵌入過程的逆運算。
-        logger.debug(f"[Extract] 使用順序提取 (位置 0-{num_bits_to_extract-1})")
-        extracted_bits = []
+        logger.debug("[Extract] 使用順序提取 (位置 0-%s)", num_bits_to_extract-1)
+        extracted_bits = self._qim_bits(ll_flat[:num_bits_to_extract], delta)
+        reliability = self._qim_reliability(ll_flat[:num_bits_to_extract], delta)
         
-        for i in range(num_bits_to_extract):
-            c = ll_flat[i]  # 獲取LL係數
-            q = round(c / delta)  # 計算量化索引
-            
-            # 檢查 q 的奇偶性來確定嵌入的位元是0還是1。
-            if q % 2 == 0:
-                extracted_bits.append(0)
-            else:
-                extracted_bits.append(1)
-        
-        logger.debug(f"[Extract] 提取到位元數: {len(extracted_bits)}, 前50位: {extracted_bits[:50]}")
+        logger.debug("[Extract] 提取到位元數: %s, 前50位: %s", len(extracted_bits), lazy(lambda: extracted_bits[:50].tolist()))
                 
         # --- 解碼位元流 ---
         # 使用 Reed-Solomon 解碼器處理提取出的位元流，修復錯誤並獲取原始訊息。
-        return self._decode_rs_stream(extracted_bits)
+        return self._decode_rs_checked(extracted_bits, reliability)
+
+    def _qim_bits(self, coeffs: np.ndarray, delta) -> np.ndarray:
+        """
+        QIM 提取 (向量化)：量化索引 q = round(c / delta) 的奇偶性即為嵌入的位元。
+        delta 可以是形狀 (K, 1) 的陣列，一次得到 K 個候選步長的位元 (K, N)。
+        """
+        return np.mod(np.round(coeffs / delta), 2).astype(np.uint8)
+
+    def _qim_reliability(self, coeffs: np.ndarray, delta: float) -> np.ndarray:
+        """
+        每個係數硬判決的可靠度：到量化決策邊界 (兩個格點的中點) 的距離，以步長為單位，範圍 [0, 0.5]。
+
+        嵌入後的 uint8 截斷會讓所有係數往同一方向偏移一小段，因此距離是相對於偏移後的格點計算
+        (偏移量由格點一致性的相位估計)；偏移後會落到另一個格點的係數，可靠度為 0。
+        """
+        ratio = coeffs / delta
+        bias = np.angle(np.mean(np.exp(2j * np.pi * ratio))) / (2 * np.pi)
+        return np.clip(0.5 - np.abs(ratio - bias - np.round(ratio)), 0.0, 0.5)
+
+    def _lattice_coherence(self, coeffs: np.ndarray, deltas: np.ndarray) -> np.ndarray:
+        """
+        每個候選步長的格點一致性 |mean(exp(2*pi*i * c / delta))| (沿最後一軸平均)。
+        以正確步長嵌入的係數集中在格點附近 (接近 1)；隨機係數約為 1/sqrt(係數數量)。
+        嵌入時的 uint8 截斷會讓係數整體偏移，但不影響一致性。
+        coeffs 形狀 (..., N)，deltas 形狀 (K,)，返回形狀 (..., K)。
+        """
+        phase = (2 * np.pi) * (coeffs[..., None, :] / deltas[:, None]).astype(np.float32)
+        return np.hypot(np.cos(phase).mean(axis=-1), np.sin(phase).mean(axis=-1))
+
+    def _delta_plausibility(self, coeffs: np.ndarray, deltas: np.ndarray) -> np.ndarray:
+        """
+        每個候選步長的平均量化殘差 |c/delta - round(c/delta)|。
+        以正確步長嵌入的係數落在格點上 (接近 0)；隨機係數約為 0.25。
+
+        步長的奇數分之一 (delta/3, delta/5...) 也會得到相同的奇偶性；以它們為單位的殘差較大，
+        只有係數恰好落在嵌入格點上時 (第 2 層以上的抖動嵌入) 才會相同，此時應取較大的步長。
+        結果捨入到 1e-9，恰好落在格點上時不會因浮點誤差而分出高下。
+        """
+        r = coeffs.reshape(1, -1) / deltas.reshape(-1, 1)
+        return np.round(np.abs(r - np.round(r)).mean(axis=1), 9)
+
+    def _coarsest_step(self, coeffs: np.ndarray, delta: float, deltas: np.ndarray) -> float:
+        """
+        解碼成功後確認嵌入時的步長：候選中 delta 的奇數倍 (3*delta, 5*delta...) 若得到幾乎相同的位元，
+        嵌入時用的就是較大的步長。少數被 uint8 截斷推離格點的係數可能讓殘差偏向奇數分之一的步長，
+        但以嵌入步長的奇數分之一解碼的位元，與以嵌入步長解碼的位元只差在這些係數上。
+        負載的填充位元大多為 0，而步長很大時量化索引多半捨入為 0，因此只比較任一方為 1 的位置；
+        其他步長的奇數倍在這些位置上約有一半不同，係數也不在它的格點附近 (平坦的圖像可能偶然位元吻合)。
+        返回兩者都符合的最大奇數倍步長 (沒有時為 delta)。
+        """
+        bits = self._qim_bits(coeffs, delta).astype(bool)
+        best = delta
+        for candidate in sorted(deltas):
+            multiple = candidate / delta
+            if candidate <= best or abs(multiple - round(multiple)) > 1e-6 or round(multiple) % 2 == 0:
+                continue
+            other = self._qim_bits(coeffs, candidate).astype(bool)
+            ones = np.count_nonzero(bits | other)
+            if not ones or np.count_nonzero(bits ^ other) > ODD_MULTIPLE_MAX_MISMATCH * ones:
+                continue
+            if self._delta_plausibility(coeffs, np.array([candidate]))[0] <= ODD_MULTIPLE_MAX_RESIDUAL:
+                best = float(candidate)
+        return best
+
+    def _luma(self, image: np.ndarray) -> np.ndarray:
+        """取出圖像 (或其中一塊區域) 的 Y 通道。"""
+        if len(image.shape) == 3:
+            return cv2.cvtColor(image, cv2.COLOR_BGR2YUV)[:, :, 0].astype(float)
+        return image.astype(float)
+
+    def _level_plane(self, image: np.ndarray, level: int) -> np.ndarray:
+        """
+        第 level 層搜尋用的平面：Y 通道先做 level-1 次 Haar 縮減，對它再做一次 haar_ll 即為第 level 層的 LL。
+        平面上的 1 個像素對應圖像中 2^(level-1) 個像素，因此網格搜尋的程式碼可以不分層級共用。
+        """
+        return haar_reduce(self._luma(image), level - 1)
+
+    def _locate_tile_grid(self, image: np.ndarray, deltas: np.ndarray, level: int = LEVEL) -> Optional[tuple[int, int, int, float]]:
+        """
+        在圖像左上角尋找第 level 層區塊網格的位置與量化步長。
+
+        圖像被裁切後，區塊網格的起點會偏移 (像素層級的奇偶偏移 + LL 層級的偏移)，
+        因此在一個區塊大小的範圍內搜尋同步標記最吻合的位置。第 2 層以上在 _level_plane 上搜尋，
+        只能找到以 2^(level-1) 像素為單位的偏移。
+        返回 (像素列偏移, 像素行偏移, 同步標記錯誤位元數, 步長)，找不到時返回 None。
+        """
+        marker = sync_marker(LAYOUT_TILED, level)
+        rows, cols = tile_slot_positions(SYNC_BITS)
+        scale = 2 ** (level - 1)
+        
+        # 三個區塊大小的視窗：涵蓋所有可能的偏移，且每個偏移都有 2x2 份區塊可比對 (容許部分區塊受損)
+        size = (6 * TILE_SIZE + 1) * scale
+        window = self._level_plane(image[:size, :size], level)
+        
+        # 快速路徑：未裁切的圖像，網格從 (0, 0) 開始；所有候選步長一次比對
+        lls = {(0, 0): haar_ll(window)}
+        ll = lls[(0, 0)]
+        if ll.shape[0] >= TILE_SIZE and ll.shape[1] >= TILE_SIZE:
+            candidates = self._qim_bits(ll[rows, cols], deltas[:, None])
+            mismatches = np.count_nonzero(candidates != marker, axis=-1)
+            passing = np.flatnonzero(mismatches <= SYNC_MAX_MISMATCH)
+            if len(passing):
+                # 同步標記吻合的步長中，取第一個區塊負載位置上殘差最小者 (相同時取較大者) 為嵌入時的步長
+                payload_rows, payload_cols = tile_slot_positions(SYNC_BITS + PAYLOAD_BITS)
+                residual = self._delta_plausibility(ll[payload_rows, payload_cols], deltas[passing])
+                k = int(passing[np.lexsort((-deltas[passing], residual))[0]])
+                return 0, 0, int(mismatches[k]), float(deltas[k])
+        
+        # 以量化殘差預選最可能的 (奇偶偏移, 步長) 組合；殘差與 LL 層級的偏移無關
+        ranked = []
+        for py in (0, 1):
+            for px in (0, 1):
+                if (py, px) not in lls:
+                    lls[(py, px)] = haar_ll(window[py:, px:])
+                ll = lls[(py, px)]
+                if ll.size == 0:
+                    continue
+                scores = self._delta_plausibility(ll[:TILE_SIZE, :2 * TILE_SIZE], deltas)
+                ranked.extend((float(scores[k]), -float(deltas[k]), py, px, k) for k in range(len(deltas)))
+        ranked.sort()
+        
+        best = None
+        for _, _, py, px, k in ranked[:MAX_GRID_CANDIDATES]:
+            checkpoint()
+            mismatches = self._marker_mismatches(lls[(py, px)], deltas[k], copies=((0, 0), (0, TILE_SIZE), (TILE_SIZE, 0), (TILE_SIZE, TILE_SIZE)), level=level)
+            if mismatches is None:
+                continue
+            iy, ix = np.unravel_index(np.argmin(mismatches), mismatches.shape)
+            score = int(mismatches[iy, ix])
+            if best is None or score < best[2]:
+                best = (py + 2 * int(iy), px + 2 * int(ix), score, float(deltas[k]))
+        
+        if best is None or best[2] > SYNC_MAX_MISMATCH:
+            return None
+        top, left, score, delta = best
+        return top * scale, left * scale, score, delta
+
+    def _marker_mismatches(self, ll: np.ndarray, delta: float, copies=((0, 0),), level: int = LEVEL) -> Optional[np.ndarray]:
+        """
+        對 LL 視窗中每個候選網格偏移 (oy, ox 皆在 [0, TILE_SIZE) 內) 計算第 level 層同步標記的錯誤位元數。
+        copies 為相隔整數個區塊的比對位置，取各份中最小者 (容許部分區塊受損)。
+        返回形狀 (偏移列數, 偏移行數) 的陣列；視窗小於一個區塊時返回 None。
+        """
+        marker = sync_marker(LAYOUT_TILED, level)
+        rows, cols = tile_slot_positions(SYNC_BITS)
+        max_oy = min(TILE_SIZE, ll.shape[0] - TILE_SIZE + 1)
+        max_ox = min(TILE_SIZE, ll.shape[1] - TILE_SIZE + 1)
+        if max_oy <= 0 or max_ox <= 0:
+            return None
+        
+        # 先對整個視窗做一次 QIM，再一次取出所有候選偏移的同步標記位元: 形狀 (max_oy, max_ox, SYNC_BITS)
+        bits = self._qim_bits(ll, delta)
+        oy = np.arange(max_oy)[:, None, None]
+        ox = np.arange(max_ox)[None, :, None]
+        mismatches = np.full((max_oy, max_ox), SYNC_BITS)
+        for ty, tx in copies:
+            if ty + max_oy + TILE_SIZE - 1 > ll.shape[0] or tx + max_ox + TILE_SIZE - 1 > ll.shape[1]:
+                continue
+            candidates = bits[oy + ty + rows, ox + tx + cols]
+            mismatches = np.minimum(mismatches, np.count_nonzero(candidates != marker, axis=-1))
+        return mismatches
+
+    def _tile_coeffs(self, tile: np.ndarray, level: int = LEVEL) -> np.ndarray:
+        """單一區塊中同步標記與負載所在的 LL 係數 (依嵌入順序)。"""
+        return haar_reduce(self._luma(tile), level)[tile_slot_positions(SYNC_BITS + PAYLOAD_BITS)]
+
+    def _decode_tile(self, tile: np.ndarray, delta: float, level: int = LEVEL) -> tuple[bool, str]:
+        """解碼單一區塊 (第 level 層為 2^level*TILE_SIZE x 2^level*TILE_SIZE 像素)。"""
+        coeffs = self._tile_coeffs(tile, level)
+        bits = self._qim_bits(coeffs, delta)
+        
+        mismatches = int(np.count_nonzero(bits[:SYNC_BITS] != sync_marker(LAYOUT_TILED, level)))
+        if mismatches > SYNC_MAX_MISMATCH:
+            return False, f"區塊同步標記不符 ({mismatches}/{SYNC_BITS} 位元錯誤)"
+        return self._decode_rs_checked(bits[SYNC_BITS:], self._qim_reliability(coeffs[SYNC_BITS:], delta))
+
+    def _crop_region(self, image: np.ndarray, region: Optional[tuple[int, int, int, int]]) -> np.ndarray:
+        if region is None:
+            return image
+        x, y, w, h = region
+        return image[y:y + h, x:x + w]
+
+    def extract_watermark_tiled(self, image: np.ndarray, alpha: float = 1.0, region: Optional[tuple[int, int, int, int]] = None,
+                                levels=SUPPORTED_LEVELS) -> tuple[bool, str, dict]:
+        """
+        從區塊佈局 (LAYOUT_TILED) 提取浮水印。
+
+        只讀取需要的區塊，因此耗時與圖像大小無關。第一個區塊解碼失敗時，
+        其餘候選區塊會並行解碼，取第一個成功的結果。
+        region: 可選的 (x, y, 寬, 高) 像素區域，只在該區域內尋找區塊。
+        levels: 依序嘗試的 DWT 層級。
+        返回 (是否成功, 訊息或錯誤描述, 資訊)。
+        """
+        image = self._crop_region(image, region)
+        if image.size == 0:
+            return False, "指定區域不在圖像範圍內", {}
+        return self._extract_tiled(image, np.array([BASE_DELTA * alpha]), levels)
+
+    def _extract_tiled(self, image: np.ndarray, deltas: np.ndarray, levels=SUPPORTED_LEVELS) -> tuple[bool, str, dict]:
+        """
+        依序在每個層級尋找區塊網格。同步標記隨層級不同，錯誤層級的網格搜尋很快就會失敗。
+        全部失敗時回報第一個找到網格的層級的錯誤 (都找不到時回報第一個層級)。
+        """
+        result = None
+        tiles_tried = 0
+        for level in levels:
+            checkpoint()
+            ok, text, info = self._extract_tiled_at(image, deltas, level)
+            tiles_tried += info["tiles_tried"]
+            if ok:
+                info["tiles_tried"] = tiles_tried
+                return ok, text, info
+            if result is None or ("alpha_detected" in info and "alpha_detected" not in result[2]):
+                result = (ok, text, info)
+        result[2]["tiles_tried"] = tiles_tried
+        return result
+
+    def _extract_tiled_at(self, image: np.ndarray, deltas: np.ndarray, level: int) -> tuple[bool, str, dict]:
+        info = {"layout_version": LAYOUT_TILED, "dwt_level": level, "tiles_tried": 0}
+        
+        with stage_timer("sync_search"):
+            grid = self._locate_tile_grid(image, deltas, level)
+        if grid is None:
+            logger.debug("[Tiled] 未找到區塊同步標記")
+            return False, "未檢測到浮水印 (找不到區塊同步標記)", info
+        
+        top0, left0, mismatches, delta = grid
+        info["alpha_detected"] = round(delta / BASE_DELTA, 2)
+        logger.debug("[Tiled] 區塊網格起點: (%s, %s), 同步標記錯誤位元: %s, delta=%s", top0, left0, mismatches, delta)
+        
+        # 依列優先順序列出完整落在圖像內的區塊 (像素座標)，數量有上限
+        span = TILE_SIZE * 2 ** level
+        tops = range(top0, image.shape[0] - span + 1, span)
+        lefts = range(left0, image.shape[1] - span + 1, span)
+        origins = [(t, l) for t in tops for l in lefts][:MAX_TILE_ATTEMPTS]
+        if not origins:
+            return False, "圖像中沒有完整的浮水印區塊", info
+        
+        def decode_at(origin):
+            t, l = origin
+            return self._decode_tile(image[t:t + span, l:l + span], delta, level)
+        
+        def decoded(origin, text):
+            t, l = origin
+            coeffs = self._tile_coeffs(image[t:t + span, l:l + span], level)
+            info["alpha_detected"] = round(self._coarsest_step(coeffs, delta, deltas) / BASE_DELTA, 2)
+            info["tile_origin"] = origin
+            return True, text, info
+        
+        # 先嘗試第一個區塊；大部分未受損的圖像在此即可完成
+        info["tiles_tried"] = 1
+        ok, text = decode_at(origins[0])
+        if ok:
+            return decoded(origins[0], text)
+        
+        last_error = text
+        rest = origins[1:]
+        if rest:
+            logger.debug("[Tiled] 第一個區塊失敗 (%s)，並行嘗試其餘 %s 個區塊", text, len(rest))
+            pool = ThreadPoolExecutor(max_workers=min(TILE_DECODE_WORKERS, job_threads()))
+            try:
+                futures = {pool.submit(decode_at, origin): origin for origin in rest}
+                for future in as_completed(futures):
+                    checkpoint()
+                    info["tiles_tried"] += 1
+                    ok, text = future.result()
+                    if ok:
+                        return decoded(futures[future], text)
+                    last_error = text
+            finally:
+                # 已找到結果時取消尚未開始的區塊
+                pool.shutdown(wait=False, cancel_futures=True)
+        
+        return False, last_error, info
+
+    def _legacy_strip(self, image: np.ndarray, level: int = LEVEL) -> Optional[np.ndarray]:
+        """舊版佈局的負載條帶：展平第 level 層 LL 的前 2040 個係數，只需轉換圖像最上方的幾列像素。"""
+        if image.shape[0] == 0 or image.shape[1] == 0:
+            return None
+        num_bits = RS_BLOCK_SIZE * 8
+        scale = 2 ** level
+        ll_width = -(-image.shape[1] // scale)
+        strip_rows = scale * (-(-num_bits // ll_width))
+        strip = haar_reduce(self._luma(image[:strip_rows]), level).ravel()
+        if len(strip) < num_bits:
+            return None
+        return strip[:num_bits]
+
+    def screen_watermark(self, image: np.ndarray, alphas=ALPHA_CANDIDATES, levels=SUPPORTED_LEVELS) -> tuple[bool, float]:
+        """
+        負篩選：以極低成本判斷圖像是否可能含有浮水印。
+
+        1. 格點一致性：含浮水印的 LL 係數在嵌入步長下集中在量化格點附近
+           (嵌入時的 uint8 截斷會讓所有係數往同一方向偏移，但不影響集中程度)，
+           以 |mean(exp(2*pi*i * c / delta))| 衡量；一般圖像約為 1/sqrt(取樣數)。
+        2. 結構檢查 (排除剛好集中在格點附近的平坦圖像)：平坦區域在任何步長下的一致性都接近 1，
+           因此先對所有一致性夠高的步長做便宜的向量化檢查 (舊版負載開頭的 "INV" 標頭位元、
+           區塊佈局在原點的同步標記)；都不符合時 (例如裁切過)，才在有區域通過一致性門檻的層級，
+           以提取時相同的網格搜尋 (_locate_tile_grid，只搜尋通過門檻的步長) 尋找同步標記。
+           一致性只用來排除候選，不用來排序。
+        所有層級的取樣區域一起評估一致性；未嵌入浮水印的圖像幾乎都在門檻處排除，不會進行網格搜尋。
+        返回 (是否可能含有浮水印, 統計量)；統計量為通過結構檢查的候選的格點一致性。
+        """
+        deltas = BASE_DELTA * np.asarray(alphas, dtype=float)
+        # (取樣係數, 原點檢查 [所有步長一次], 區塊佈局的層級 [舊版條帶為 None])
+        regions = [region for level in levels for region in self._screen_regions(image, level)]
+        
+        if not regions:
+            # 圖像太小無法篩選，交給完整的提取流程判斷
+            return True, 0.0
+        
+        # (區域, 步長) 的格點一致性一次計算
+        coherence = self._lattice_coherence(np.stack([sample for sample, _, _ in regions]), deltas)
+        candidates = coherence >= SCREEN_MIN_COHERENCE
+        
+        for region, (_, quick_check, _) in enumerate(regions):
+            passed = candidates[region] & quick_check(deltas)
+            if passed.any():
+                return True, float(coherence[region][passed].max())
+        
+        # 原點都不符合：在所有網格偏移上搜尋同步標記，只搜尋通過一致性門檻的層級與步長
+        for level in levels:
+            tiled = [index for index, (_, _, tiled_level) in enumerate(regions) if tiled_level == level]
+            eligible = candidates[tiled].any(axis=0) if tiled else np.zeros(len(deltas), dtype=bool)
+            if not eligible.any():
+                continue
+            checkpoint()
+            grid = self._locate_tile_grid(image, deltas[eligible], level)
+            if grid is not None:
+                k = int(np.flatnonzero(deltas == grid[3])[0])
+                return True, float(coherence[tiled, k].max())
+        return False, 0.0
+
+    def _screen_regions(self, image: np.ndarray, level: int) -> list:
+        """第 level 層的負篩選取樣區域：舊版佈局的條帶，以及區塊佈局左上角的 LL 視窗。"""
+        marker = sync_marker(LAYOUT_TILED, level)
+        rows, cols = tile_slot_positions(SYNC_BITS)
+        regions = []
+        
+        strip = self._legacy_strip(image, level)
+        if strip is not None:
+            def header_fits(deltas, strip=strip):
+                bits = self._qim_bits(strip[:len(PAYLOAD_HEADER_BITS)], deltas[:, None])
+                return np.count_nonzero(bits != PAYLOAD_HEADER_BITS, axis=1) <= SCREEN_HEADER_MAX_MISMATCH
+            regions.append((strip[:SCREEN_SAMPLE_SIZE], header_fits, None))
+        
+        # 區塊佈局：左上角兩個區塊大小的 LL 視窗 (四種奇偶偏移)
+        size = (4 * TILE_SIZE + 1) * 2 ** (level - 1)
+        window = self._level_plane(image[:size, :size], level)
+        for py in (0, 1):
+            for px in (0, 1):
+                ll = haar_ll(window[py:, px:])
+                if ll.shape[0] < TILE_SIZE or ll.shape[1] < TILE_SIZE:
+                    continue
+                def marker_at_origin(deltas, ll=ll):
+                    bits = self._qim_bits(ll[rows, cols], deltas[:, None])
+                    return np.count_nonzero(bits != marker, axis=1) <= SYNC_MAX_MISMATCH
+                regions.append((ll[:TILE_SIZE, :TILE_SIZE].ravel()[:SCREEN_SAMPLE_SIZE], marker_at_origin, level))
+        return regions
+
+    def _extract_legacy_multi_delta(self, image: np.ndarray, deltas: np.ndarray, levels=SUPPORTED_LEVELS) -> tuple[bool, str, dict]:
+        """
+        舊版佈局的多步長提取：只計算一次負載所在的 LL 條帶，以一次 2-D 陣列運算得到所有候選步長的位元，
+        再依合理性 (標頭 "INV" 位元吻合數、量化殘差) 排序，只對最可能的幾個步長做 RS 解碼。
+        舊版佈局沒有同步標記，因此依序嘗試每個層級；全部失敗時回報第一個層級的錯誤。
+        """
+        result = None
+        for level in levels:
+            checkpoint()
+            ok, text, info = self._extract_legacy_at(image, deltas, level)
+            if ok:
+                return ok, text, info
+            result = result or (ok, text, info)
+        return result
+
+    def _extract_legacy_at(self, image: np.ndarray, deltas: np.ndarray, level: int) -> tuple[bool, str, dict]:
+        info = {"layout_version": LAYOUT_LEGACY, "dwt_level": level}
+        strip = self._legacy_strip(image, level)
+        if strip is None:
+            return False, "圖像中的數據不足以提取浮水印。", info
+        
+        bits = self._qim_bits(strip[None, :], deltas[:, None])  # (K, num_bits)
+        header_mismatch = np.count_nonzero(bits[:, :len(PAYLOAD_HEADER_BITS)] != PAYLOAD_HEADER_BITS, axis=1)
+        # 標頭吻合數相同時殘差最小者 (再相同時較大的步長) 優先：嵌入步長的奇數分之一也能解碼，
+        # 成功後再以 _coarsest_step 確認 alpha_detected
+        residual = self._delta_plausibility(strip, deltas)
+        order = np.lexsort((-deltas, residual, header_mismatch))[:MAX_DELTA_CANDIDATES]
+        
+        last_error = "未檢測到浮水印"
+        for k in order:
+            checkpoint()
+            logger.debug("[MultiDelta] 嘗試 delta=%s (標頭錯誤位元: %s, 殘差: %.3f)", deltas[k], header_mismatch[k], residual[k])
+            ok, text = self._decode_rs_checked(bits[k], self._qim_reliability(strip, deltas[k]))
+            if ok:
+                info["alpha_detected"] = round(self._coarsest_step(strip, float(deltas[k]), deltas) / BASE_DELTA, 2)
+                return True, text, info
+            last_error = text
+        return False, last_error, info
+
+    def extract_multi_delta(self, image: np.ndarray, alphas=ALPHA_CANDIDATES, region: Optional[tuple[int, int, int, int]] = None, screen: bool = True,
+                            levels=SUPPORTED_LEVELS) -> tuple[bool, str, dict]:
+        """
+        在不知道嵌入強度 alpha 與 DWT 層級的情況下提取浮水印。
+
+        screen=True 時先做負篩選 (screen_watermark)，明顯未嵌入浮水印的圖像直接返回失敗。
+        依序嘗試區塊佈局與舊版佈局 (各自依序嘗試 levels 中的層級)；每種佈局都只計算一次 LL，
+        再同時評估所有候選步長。成功時資訊中的 alpha_detected 與 dwt_level 為偵測到的嵌入強度與層級。
+        返回 (是否成功, 訊息或錯誤描述, 資訊)。
+        """
+        image = self._crop_region(image, region)
+        if image.size == 0:
+            return False, "指定區域不在圖像範圍內", {}
+        deltas = BASE_DELTA * np.asarray(alphas, dtype=float)
+        
+        EXTRACTIONS.inc(method="multi_delta")
+        
+        # 大部分被驗證的圖像沒有浮水印：先以量化殘差統計量提早排除
+        if screen:
+            with stage_timer("screen"):
+                likely, score = self.screen_watermark(image, alphas, levels)
+            if not likely:
+                SCREENED_OUT.inc()
+                logger.debug("[MultiDelta] 負篩選排除 (格點一致性不足)")
+                return False, "未檢測到浮水印 (量化格點不符)", {"screened_out": True}
+        
+        with stage_timer("tiled_decode"):
+            ok, text, info = self._extract_tiled(image, deltas, levels)
+        if ok:
+            return ok, text, info
+        logger.debug("[MultiDelta] 區塊佈局未解碼 (%s)，改用舊版佈局", text)
+        checkpoint()
+        FALLBACKS.inc(fallback="tiled_to_legacy")
+        tiled_info = info
+        with stage_timer("legacy_fallback"):
+            ok, text, info = self._extract_legacy_multi_delta(image, deltas, levels)
+        info["tiles_tried"] = tiled_info["tiles_tried"]
+        return ok, text, info
 
     def extract_watermark_dct(self, image: np.ndarray) -> str:
         """Extract watermark from image using DCT."""
+        EXTRACTIONS.inc(method="dct")
+        return self._decode_rs_stream(self._dct_bits(image))
+
+    def _extract_dct_checked(self, image: np.ndarray) -> tuple[bool, str]:
+        """使用 DCT 提取浮水印，回傳 (是否成功, 訊息或錯誤描述)。"""
+        EXTRACTIONS.inc(method="dct")
+        return self._decode_rs_checked(self._dct_bits(image))
+
+    def _dct_bits(self, image: np.ndarray) -> np.ndarray:
+        """
+        DCT 方法的原始位元：依序 (列優先) 比較每個 8x8 區塊中兩個中頻係數 (3,1) 與 (1,3) 的大小。
+        只需要這兩個係數，因此不逐塊做完整的 2-D DCT，而是把負載所在的最上方幾列區塊一次
+        與對應的 DCT 基底向量做內積 (D[u] · block · D[v])，只轉換這些列的色彩空間。
+        """
+        bs = self.block_size
+        packet_len_bits = RS_BLOCK_SIZE * 8
         h, w = image.shape[:2]
+        cols = w // bs
+        if cols == 0 or h < bs:
+            return np.zeros(0, dtype=np.uint8)
+        rows = min(h // bs, -(-packet_len_bits // cols))
         
-        if len(image.shape) == 3:
-            yuv = cv2.cvtColor(image, cv2.COLOR_BGR2YUV)
-            y_channel = yuv[:, :, 0].astype(float)
+        top = np.ascontiguousarray(image[:rows * bs, :cols * bs])
+        if top.ndim == 3:
+            y_channel = cv2.cvtColor(top, cv2.COLOR_BGR2YUV)[:, :, 0].astype(float)
         else:
-            y_channel = image.astype(float)
-            
-        raw_extracted_bits = []
-        packet_len_bits = RS_BLOCK_SIZE * 8
-        
-        for i in range(0, h - self.block_size + 1, self.block_size):
-            for j in range(0, w - self.block_size + 1, self.block_size):
-                if len(raw_extracted_bits) >= packet_len_bits: break
-                block = y_channel[i:i+self.block_size, j:j+self.block_size]
-                dct_block = self._dct2(block)
-                c1_idx, c2_idx = (3, 1), (1, 3)
-                c1, c2 = dct_block[c1_idx], dct_block[c2_idx]
-                if c1 > c2:
-                    raw_extracted_bits.append(1)
-                else:
-                    raw_extracted_bits.append(0)
-            if len(raw_extracted_bits) >= packet_len_bits: break
+            y_channel = top.astype(float)
+        checkpoint()
         
-        return self._decode_rs_stream(raw_extracted_bits)
+        blocks = y_channel.reshape(rows, bs, cols, bs).swapaxes(1, 2).reshape(-1, bs, bs)[:packet_len_bits]
+        basis = _dct_basis(bs)
+        c1 = np.einsum('i,nij,j->n', basis[3], blocks, basis[1], optimize=True)
+        c2 = np.einsum('i,nij,j->n', basis[1], blocks, basis[3], optimize=True)
+        return (c1 > c2).astype(np.uint8)
 
-    def extract_with_blind_alignment(self, image: np.ndarray) -> tuple[str, dict]:
+    def extract_with_blind_alignment(self, image: np.ndarray, region: Optional[tuple[int, int, int, int]] = None,
+                                     levels=SUPPORTED_LEVELS) -> tuple[str, dict]:
         """
         Extract watermark with blind geometric correction.
         NOTE: Sync template is disabled, so this method assumes no geometric transformation.
+        The embed alpha is not known here, so all candidate alphas are evaluated at once;
+        the tiled layout is tried first (it only reads one tile), then the legacy layout.
+        `levels` are the DWT levels to try (pass the embed level, if known, to skip the others).
         """
         # SIMPLIFIED: Skip geometry detection since sync template is disabled
         # This is a trade-off: Extract works perfectly, but Verify won't handle rotated/scaled images
-        logger.info("[Blind] Sync template disabled - extracting without geometry correction")
-        logger.warning("[Blind] Limitation: Cannot detect/correct rotation or scaling")
-        
-        # Direct extraction assuming no geometric transformation
-        text = self.extract_watermark_dwt_qim(image, alpha=10.0)
+        logger.debug("[Blind] Sync template disabled - extracting without geometry correction")
+        logger.debug("[Blind] Limitation: Cannot detect/correct rotation or scaling")
         
         metadata = {
             "rotation_detected": 0.0,
@@ -213,12 +719,17 @@ class WatermarkExtractor:
             "note": "Sync template disabled to preserve DWT coefficients"
         }
         
+        # Unknown embed strength: evaluate every candidate alpha on one LL computation.
+        # The tiled layout is decoded from the first good tile (independent of image size).
+        ok, text, info = self.extract_multi_delta(image, region=region, levels=levels)
+        metadata.update(info)
+        
         # Check if extraction was successful
-        if "failed" in text.lower() or "invalid" in text.lower() or "not enough" in text.lower() or "no watermark" in text.lower():
-            logger.warning(f"[Blind] DWT+QIM extraction failed: {text}")
+        if not ok:
+            logger.warning("[Blind] DWT+QIM extraction failed: %s", text)
             metadata["error"] = text
         else:
-            logger.info(f"[Blind] Extraction successful: {text}")
+            logger.info("[Blind] Extraction successful: %s", text)
         
         return text, metadata
         
@@ -231,18 +742,18 @@ class WatermarkExtractor:
         
         # Check if extraction was successful
         if "failed" in text.lower() or "invalid" in text.lower() or "not enough" in text.lower() or "no watermark" in text.lower():
-            logger.warning(f"[Blind] DWT+QIM extraction failed: {text}")
+            logger.warning("[Blind] DWT+QIM extraction failed: %s", text)
             # Fallback to DCT
             logger.info("[Blind] Trying fallback DCT method")
             text_dct = self.extract_watermark_dct(corrected_image)
             if not ("failed" in text_dct.lower() or "invalid" in text_dct.lower() or "not enough" in text_dct.lower()):
-                logger.info(f"[Blind] DCT method successful: {text_dct}")
+                logger.info("[Blind] DCT method successful: %s", text_dct)
                 text = text_dct
                 metadata["method"] = "DCT (fallback)"
             else:
-                logger.error(f"[Blind] Both methods failed. DWT: {text}, DCT: {text_dct}")
+                logger.error("[Blind] Both methods failed. DWT: %s, DCT: %s", text, text_dct)
                 metadata["error"] = "Both DWT and DCT methods failed"
         else:
-            logger.info(f"[Blind] Extraction successful: {text}")
+            logger.info("[Blind] Extraction successful: %s", text)
 
         return text, metadata
@@ -1,13 +1,21 @@
 import cv2
 import numpy as np
 from typing import Tuple, Optional, List
+from src.utils.cancellation import checkpoint
+from src.utils.logger import get_logger
+from src.utils.pools import PerThread
+
+logger = get_logger(__name__)
+
+IDENTITY_TOLERANCE_PX = 0.5  # 單應性矩陣使四個角點移動都小於此距離時視為未變形，不重新取樣
 
 class GeometryProcessor:
     def __init__(self, nfeatures: int = 5000, scaleFactor: float = 1.2, nlevels: int = 8):
         # 初始化 ORB 偵測器，並調整參數以提高穩健性。
         # ORB (Oriented FAST and Rotated BRIEF) 是一種用於偵測影像中特徵點的演算法，
         # 它對於旋轉和縮放等影像變化具有良好的抵抗能力。
-        self.orb = cv2.ORB_create(
+        # OpenCV 的偵測器與匹配器不能安全地被多個執行緒同時使用，因此每個工作執行緒各自建立一份。
+        self._orb = PerThread(lambda: cv2.ORB_create(
             nfeatures=nfeatures,
             scaleFactor=scaleFactor,
             nlevels=nlevels,
@@ -17,11 +25,21 @@ class GeometryProcessor:
             scoreType=cv2.ORB_HARRIS_SCORE,
             patchSize=31,
             fastThreshold=20
-        )
+        ))
         # 初始化 BFMatcher (Brute-Force Matcher)，用於特徵點匹配。
         # cv2.NORM_HAMMING 適用於 ORB 等二進位描述符。
         # crossCheck=True 表示只有當兩張影像中的特徵點互相匹配時，才視為一個有效的匹配。
-        self.matcher = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
+        self._matcher = PerThread(lambda: cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True))
+
+    @property
+    def orb(self):
+        """目前執行緒的 ORB 偵測器。"""
+        return self._orb.get()
+
+    @property
+    def matcher(self):
+        """目前執行緒的 BFMatcher。"""
+        return self._matcher.get()
 
     def extract_features(self, image: np.ndarray) -> Tuple[Tuple[cv2.KeyPoint], np.ndarray]:
         """
@@ -44,13 +62,15 @@ class GeometryProcessor:
         # 1. 提取特徵點和描述符
         kp1, des1 = self.extract_features(original)
         kp2, des2 = self.extract_features(suspect)
+        checkpoint()
 
         if des1 is None or des2 is None:
-            print("找不到描述符。")
+            logger.debug("[Align] 找不到描述符。")
             return None
 
         # 2. 匹配特徵點
         matches = self.matcher.match(des1, des2)
+        checkpoint()
         
         # 根據距離對匹配結果進行排序
         matches = sorted(matches, key=lambda x: x.distance)
@@ -65,7 +85,7 @@ class GeometryProcessor:
             good_matches = matches[:num_good_matches]
 
         if len(good_matches) < 4:
-            print("沒有足夠的匹配來計算單應性矩陣。")
+            logger.debug("[Align] 沒有足夠的匹配來計算單應性矩陣。")
             return None
 
         # 3. 提取良好匹配的位置
@@ -79,12 +99,19 @@ class GeometryProcessor:
         M, mask = cv2.findHomography(src_pts, dst_pts, cv2.RANSAC, 5.0)
 
         if M is None:
-            print("單應性矩陣計算失敗。")
+            logger.debug("[Align] 單應性矩陣計算失敗。")
             return None
 
         # 5. 透視變換
         # 使用計算出的單應性矩陣 M，將可疑影像進行透視變換，使其與原始影像對齊。
+        # 幾乎是恆等變換時直接返回可疑影像：重新取樣 (內插) 會抹去 QIM 量化格點，使浮水印無法提取。
         h, w = original.shape[:2]
+        if suspect.shape[:2] == (h, w):
+            corners = np.float32([[0, 0], [w, 0], [0, h], [w, h]]).reshape(-1, 1, 2)
+            shift = np.abs(cv2.perspectiveTransform(corners, M) - corners).max()
+            if shift < IDENTITY_TOLERANCE_PX:
+                logger.debug("[Align] 單應性矩陣接近恆等 (角點最大位移 %.3f 像素)，不重新取樣", shift)
+                return suspect
         aligned_img = cv2.warpPerspective(suspect, M, (w, h))
 
         return aligned_img
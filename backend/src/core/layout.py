@@ -0,0 +1,90 @@
+"""
+浮水印負載佈局 (Payload Layout)
+
+定義負載位元在 LL 子帶中的擺放方式，嵌入與提取共用同一份定義以保證一致。
+
+- LAYOUT_LEGACY (v1): 單一 2040 位元負載，依序放在展平 LL 的最前面 (左上角)。
+- LAYOUT_TILED  (v2): 將 LL 切成 TILE_SIZE x TILE_SIZE 的區塊 (tile)，每個區塊都放一份
+  「同步標記 + 完整負載」。任何一個區塊都能獨立解碼，因此驗證只需讀取一小塊影像，
+  且裁切後只要還留有一個完整區塊即可解碼。
+
+兩種佈局都可以放在第 1-3 層 Haar 分解的 LL 子帶 (SUPPORTED_LEVELS)。每多一層，LL 係數的
+數量縮小 4 倍，每個係數涵蓋 2^level x 2^level 個像素，位於較粗的尺度，重新縮放後較不易被破壞。
+區塊佈局的同步標記隨層級不同，因此偵測到標記即可確定嵌入的層級。
+"""
+
+import hashlib
+
+import numpy as np
+
+LAYOUT_LEGACY = 1
+LAYOUT_TILED = 2
+SUPPORTED_LAYOUTS = (LAYOUT_LEGACY, LAYOUT_TILED)
+SUPPORTED_LEVELS = (1, 2, 3)
+
+# 區塊大小 (以 LL 係數為單位)，第 level 層對應影像中 2^level * TILE_SIZE 像素
+TILE_SIZE = 48
+# 區塊內同步標記的位元數 (放在區塊的前 SYNC_BITS 個位置)
+SYNC_BITS = 64
+# 同步標記允許的最大錯誤位元數；隨機影像平均會有 SYNC_BITS/2 個錯誤
+SYNC_MAX_MISMATCH = 10
+
+PAYLOAD_BITS = 255 * 8
+TILE_CAPACITY = TILE_SIZE * TILE_SIZE
+
+assert SYNC_BITS + PAYLOAD_BITS <= TILE_CAPACITY, "TILE_SIZE 太小，無法容納同步標記與負載"
+
+
+def sync_marker(version: int = LAYOUT_TILED, level: int = 1) -> np.ndarray:
+    """回傳指定佈局版本與 DWT 層級的同步標記位元 (由版本字串的 SHA-256 決定，跨平台固定；第 1 層沿用原本的標記)。"""
+    name = f"INVISIGUARD-TILE-v{version}" if level == 1 else f"INVISIGUARD-TILE-v{version}-L{level}"
+    digest = hashlib.sha256(name.encode("ascii")).digest()
+    bits = np.unpackbits(np.frombuffer(digest, dtype=np.uint8))
+    return bits[:SYNC_BITS].astype(np.uint8)
+
+
+def tile_slot_positions(count: int) -> tuple[np.ndarray, np.ndarray]:
+    """區塊內前 count 個位置的 (列, 行) 座標，依列優先順序排列。"""
+    slots = np.arange(count)
+    return slots // TILE_SIZE, slots % TILE_SIZE
+
+
+def tile_origins(ll_shape: tuple[int, int], offset: tuple[int, int] = (0, 0)) -> list[tuple[int, int]]:
+    """列出完整落在 LL 範圍內的區塊左上角座標 (列優先)。"""
+    oy, ox = offset
+    rows = (ll_shape[0] - oy) // TILE_SIZE
+    cols = (ll_shape[1] - ox) // TILE_SIZE
+    return [(oy + r * TILE_SIZE, ox + c * TILE_SIZE) for r in range(rows) for c in range(cols)]
+
+
+# Haar 低通濾波係數 (與 pywt.Wavelet('haar').dec_lo 相同)
+HAAR_LO = 0.7071067811865476
+
+
+def haar_ll(y_channel: np.ndarray, symmetric: bool = False) -> np.ndarray:
+    """
+    只計算單層 Haar DWT 的 LL 子帶。
+
+    每個 2x2 像素區塊的和除以 2，且運算順序與 pywt.dwt2(y, 'haar') 相同，結果逐位元一致
+    (QIM 在量化邊界上的捨入取決於最後一位元，不能只是「近似」相同)。
+    由於 Haar 只依賴局部 2x2 區塊，可以只對影像的一小塊區域計算，不必轉換整張影像。
+    奇數尺寸時預設捨棄最後一列/行；symmetric=True 則像 pywt 一樣做對稱延伸。
+    """
+    y = y_channel
+    if symmetric and (y.shape[0] % 2 or y.shape[1] % 2):
+        y = np.pad(y, ((0, y.shape[0] % 2), (0, y.shape[1] % 2)), mode='symmetric')
+    h = y.shape[0] - y.shape[0] % 2
+    w = y.shape[1] - y.shape[1] % 2
+    y = y[:h, :w]
+    rows = y[0::2] * HAAR_LO + y[1::2] * HAAR_LO
+    return rows[:, 0::2] * HAAR_LO + rows[:, 1::2] * HAAR_LO
+
+
+def haar_reduce(y_channel: np.ndarray, levels: int, symmetric: bool = True) -> np.ndarray:
+    """
+    連續做 levels 次 haar_ll，得到第 levels 層 Haar DWT 的 LL 子帶 (levels=0 時原樣返回)。
+    與 pywt.wavedec2(y, 'haar', level=levels) 的近似係數一致；每層都對奇數尺寸做對稱延伸。
+    """
+    for _ in range(levels):
+        y_channel = haar_ll(y_channel, symmetric=symmetric)
+    return y_channel
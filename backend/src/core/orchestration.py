@@ -0,0 +1,165 @@
+"""
+提取方法協調器
+
+已知原始圖像時 (/extract)，對齊後的可疑圖像可以用多種方法解碼：區塊佈局、舊版佈局
+(兩者都同時評估所有候選強度) 與舊的 DCT 方法。每種方法連同成本與優先順序登記在
+ExtractionOrchestrator 中，並回傳 ExtractionResult：成功與否由 Reed-Solomon 解碼與負載解析
+決定，不再從錯誤訊息的字串判斷。
+
+- concurrent 模式同時執行所有方法，第一個成功的結果會取消其餘方法 (每個方法在自己的
+  子 CancelToken 下執行，於下一個 checkpoint() 停止)，失敗路徑的延遲接近最慢的單一方法，
+  而不是所有方法的總和。
+- cascade 模式依 (優先順序, 成本) 依序執行，第一個成功即停止。
+- auto (預設) 在可用的 CPU 核心多於一個時使用 concurrent，否則使用 cascade：單核心上
+  同時執行只會互相搶占時間。
+"""
+
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .extraction import ALPHA_CANDIDATES, BASE_DELTA, WatermarkExtractor
+from src.utils.cancellation import SUPERSEDED, CancelToken, OperationCancelled, cancel_scope, checkpoint, current_token
+from src.utils.logger import get_logger
+from src.utils.metrics import EXTRACTION_RESULTS, record_stage
+from src.utils.threads import job_threads
+
+logger = get_logger(__name__)
+
+MODE_CONCURRENT = "concurrent"
+MODE_CASCADE = "cascade"
+MODE_AUTO = "auto"
+EXTRACTION_MODE = os.environ.get("INVISIGUARD_EXTRACTION_MODE", MODE_AUTO)
+
+
+@dataclass(frozen=True)
+class ExtractionResult:
+    """一種方法的提取結果；ok 為 False 時 text 是錯誤描述。"""
+    method: str
+    ok: bool
+    text: str
+    info: dict = field(default_factory=dict)
+    seconds: float = 0.0
+
+
+@dataclass(frozen=True)
+class ExtractionMethod:
+    """
+    可登記的提取方法。run(image) 回傳 (是否成功, 訊息或錯誤描述, 資訊)。
+    cost 是失敗時的相對耗時 (約為 3 MP 圖像上的毫秒數)，priority 越小越優先 (可靠度較高)；
+    兩者決定 cascade 的順序，以及全部失敗時回報哪個方法的錯誤。
+    """
+    name: str
+    run: Callable[[np.ndarray], tuple]
+    cost: float
+    priority: int
+
+
+class ExtractionOrchestrator:
+    def __init__(self, methods: Optional[List[ExtractionMethod]] = None, mode: str = EXTRACTION_MODE):
+        if mode == MODE_AUTO:
+            mode = MODE_CONCURRENT if job_threads() > 1 else MODE_CASCADE
+        if mode not in (MODE_CONCURRENT, MODE_CASCADE):
+            raise ValueError(f"未知的提取模式: {mode} (可用: {MODE_AUTO}, {MODE_CONCURRENT}, {MODE_CASCADE})")
+        self.mode = mode
+        self.methods: Dict[str, ExtractionMethod] = {}
+        for method in methods or ():
+            self.register(method)
+
+    def register(self, method: ExtractionMethod):
+        self.methods[method.name] = method
+
+    def _ordered(self) -> List[ExtractionMethod]:
+        return sorted(self.methods.values(), key=lambda m: (m.priority, m.cost))
+
+    def run(self, image: np.ndarray) -> tuple[ExtractionResult, List[ExtractionResult]]:
+        """
+        執行登記的方法，回傳 (採用的結果, 所有已完成的嘗試)。
+        全部失敗時採用優先順序最高的方法的失敗結果；被取消的方法不列入嘗試。
+        """
+        if not self.methods:
+            raise ValueError("沒有登記任何提取方法")
+        if self.mode == MODE_CASCADE or len(self.methods) == 1:
+            attempts = self._run_cascade(image)
+        else:
+            attempts = self._run_concurrent(image)
+        for attempt in attempts:
+            if attempt.ok:
+                return attempt, attempts
+        rank = {m.name: i for i, m in enumerate(self._ordered())}
+        return min(attempts, key=lambda a: rank[a.method]), attempts
+
+    def _attempt(self, method: ExtractionMethod, image: np.ndarray) -> ExtractionResult:
+        start = time.perf_counter()
+        try:
+            ok, text, info = method.run(image)
+        except OperationCancelled:
+            EXTRACTION_RESULTS.inc(method=method.name, result="cancelled")
+            raise
+        seconds = time.perf_counter() - start
+        record_stage(f"extract_{method.name}", seconds)
+        EXTRACTION_RESULTS.inc(method=method.name, result="success" if ok else "failure")
+        logger.debug("[Orchestrator] %s: %s (%.1f ms)", method.name, "成功" if ok else text, seconds * 1000)
+        return ExtractionResult(method.name, ok, text, info, seconds)
+
+    def _run_cascade(self, image: np.ndarray) -> List[ExtractionResult]:
+        attempts = []
+        for method in self._ordered():
+            checkpoint()
+            attempt = self._attempt(method, image)
+            attempts.append(attempt)
+            if attempt.ok:
+                break
+        return attempts
+
+    def _run_concurrent(self, image: np.ndarray) -> List[ExtractionResult]:
+        # 每個方法使用目前工作 (請求) 的子權杖：請求被取消時全部停止，也可以單獨取消落後的方法
+        parent = current_token()
+        tokens = {name: parent.child() if parent is not None else CancelToken() for name in self.methods}
+
+        def attempt_in_scope(method):
+            with cancel_scope(tokens[method.name]):
+                return self._attempt(method, image)
+
+        attempts = []
+        methods = self._ordered()
+        # 不超過這個工作分到的核心數 (serve.py 的 INVISIGUARD_JOB_THREADS)；其餘方法排隊等候
+        pool = ThreadPoolExecutor(max_workers=min(len(methods), job_threads()), thread_name_prefix="extract")
+        try:
+            futures = {pool.submit(contextvars.copy_context().run, attempt_in_scope, m): m for m in methods}
+            for future in as_completed(futures):
+                try:
+                    attempt = future.result()
+                except OperationCancelled:
+                    checkpoint()  # 整個請求被取消時向上拋出
+                    continue
+                attempts.append(attempt)
+                if attempt.ok:
+                    # 第一個有效的 RS 解碼：其餘方法在下一個 checkpoint 停止，不必等待
+                    for name, token in tokens.items():
+                        if name != attempt.method:
+                            token.cancel(SUPERSEDED)
+                    break
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        return attempts
+
+
+def standard_methods(extractor: WatermarkExtractor, alphas=ALPHA_CANDIDATES) -> List[ExtractionMethod]:
+    """/extract 使用的方法：區塊佈局、舊版佈局 (皆不需知道 alpha) 與 DCT。"""
+    deltas = BASE_DELTA * np.asarray(alphas, dtype=float)
+
+    def dct(image):
+        ok, text = extractor._extract_dct_checked(image)
+        return ok, text, {}
+
+    return [
+        ExtractionMethod("tiled", lambda image: extractor._extract_tiled(image, deltas), cost=25.0, priority=0),
+        ExtractionMethod("legacy", lambda image: extractor._extract_legacy_multi_delta(image, deltas), cost=60.0, priority=1),
+        ExtractionMethod("dct", dct, cost=5.0, priority=2),
+    ]
@@ -2,6 +2,17 @@ import cv2
 import numpy as np
 from fastapi import UploadFile
 import io
+import os
+import struct
+import tempfile
+from typing import Iterator, Optional
+
+# 大圖處理的記憶體預算：條帶 (row band) 的工作記憶體與輸出緩衝區各佔一半 (可用環境變數覆寫)
+MEMORY_BUDGET_BYTES = int(os.environ.get("INVISIGUARD_MEMORY_BUDGET_MB", "256")) * 1024 * 1024
+# 超過預算的輸出緩衝區改以 np.memmap 存放於此目錄 (未設定時使用系統暫存目錄)
+SPILL_DIR = os.environ.get("INVISIGUARD_SPILL_DIR") or None
+# JPEG 的幀開始 (SOF) 標記，區段內含圖像尺寸 (排除 DHT/JPG/DAC 的 0xC4/0xC8/0xCC)
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
 
 class ImageProcessor:
     @staticmethod
@@ -20,6 +31,22 @@ class ImageProcessor:
         """
         # 異步讀取上傳文件的內容
         contents = await file.read()
+        return ImageProcessor.decode_image(contents)
+
+    @staticmethod
+    def decode_image(contents: bytes) -> np.ndarray:
+        """
+        將上傳文件的原始內容解碼為 numpy 陣列 (BGR 格式)。
+
+        Args:
+            contents (bytes): 圖像文件的原始二進制數據。
+
+        Returns:
+            np.ndarray: 以 BGR 色彩空間表示的圖像 numpy 陣列。
+
+        Raises:
+            ValueError: 如果無法解碼圖像。
+        """
         # 將原始二進制數據轉換為 numpy 陣列
         nparr = np.frombuffer(contents, np.uint8)
         # 使用 OpenCV 從 numpy 陣列中解碼圖像。IMREAD_COLOR 表示以彩色圖像加載。
@@ -28,6 +55,44 @@ class ImageProcessor:
             raise ValueError("無法解碼圖像")
         return img
 
+    @staticmethod
+    def peek_dimensions(contents: bytes) -> Optional[tuple[int, int]]:
+        """
+        不解碼圖像，只從 PNG / JPEG 標頭讀取 (高度, 寬度)，用於在解碼前估計處理成本。
+
+        Args:
+            contents (bytes): 圖像文件的原始二進制數據。
+
+        Returns:
+            tuple[int, int] | None: (高度, 寬度)；無法辨識的格式或損壞的標頭返回 None。
+        """
+        # PNG: 8 字節簽名後的第一個區塊必須是 IHDR (寬、高各 4 字節，大端序)
+        if contents[:8] == b"\x89PNG\r\n\x1a\n" and contents[12:16] == b"IHDR" and len(contents) >= 24:
+            width, height = struct.unpack(">II", contents[16:24])
+            return height, width
+        
+        # JPEG: 依序走訪標記區段，直到 SOFn (幀開始) 區段
+        if contents[:2] == b"\xff\xd8":
+            pos = 2
+            while pos + 9 <= len(contents):
+                if contents[pos] != 0xFF:
+                    return None
+                marker = contents[pos + 1]
+                if marker == 0xFF:
+                    # 填充字節
+                    pos += 1
+                    continue
+                if marker in JPEG_SOF_MARKERS:
+                    height, width = struct.unpack(">HH", contents[pos + 5:pos + 9])
+                    return height, width
+                if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                    # 沒有長度欄位的獨立標記
+                    pos += 2
+                    continue
+                (length,) = struct.unpack(">H", contents[pos + 2:pos + 4])
+                pos += 2 + length
+        return None
+
     @staticmethod
     def resize_image(image: np.ndarray, width: int = None, height: int = None) -> np.ndarray:
         """
@@ -88,3 +153,49 @@ class ImageProcessor:
             np.ndarray: 灰階圖像。
         """
         return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    @staticmethod
+    def band_rows(height: int, bytes_per_row: int, budget: Optional[int] = None, align: int = 2) -> int:
+        """
+        計算在記憶體預算內每個條帶可處理的像素列數。
+
+        Args:
+            height (int): 圖像高度。
+            bytes_per_row (int): 處理一列像素所需的工作記憶體 (位元組)。
+            budget (int, optional): 記憶體預算，預設為 MEMORY_BUDGET_BYTES；條帶只使用其中一半。
+            align (int): 條帶列數的倍數，第 L 層 Haar 為 2^L (與 2^L x 2^L 的像素區塊對齊)。
+
+        Returns:
+            int: 條帶列數，為 align 的倍數且至少為 align。
+        """
+        budget = MEMORY_BUDGET_BYTES if budget is None else budget
+        rows = (budget // 2) // max(1, bytes_per_row)
+        rows = max(align, rows - rows % align)
+        return min(rows, height + (-height) % align)
+
+    @staticmethod
+    def iter_bands(height: int, rows: int) -> Iterator[tuple[int, int]]:
+        """依序產生每個條帶的 (起始列, 結束列)，最後一個條帶可能較短。"""
+        for top in range(0, height, rows):
+            yield top, min(top + rows, height)
+
+    @staticmethod
+    def allocate(shape: tuple, dtype=np.uint8, budget: Optional[int] = None) -> np.ndarray:
+        """
+        配置輸出緩衝區。超過記憶體預算一半時改用 np.memmap，數據存放在 SPILL_DIR 的匿名暫存檔，
+        由作業系統按需換頁，緩衝區被回收時暫存檔自動刪除。
+
+        Args:
+            shape (tuple): 陣列形狀。
+            dtype: 陣列資料型別。
+            budget (int, optional): 記憶體預算，預設為 MEMORY_BUDGET_BYTES。
+
+        Returns:
+            np.ndarray: 一般陣列或 np.memmap (未初始化)。
+        """
+        budget = MEMORY_BUDGET_BYTES if budget is None else budget
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        if nbytes <= budget // 2:
+            return np.empty(shape, dtype=dtype)
+        spill = tempfile.TemporaryFile(dir=SPILL_DIR)
+        return np.memmap(spill, dtype=dtype, mode='w+', shape=shape)
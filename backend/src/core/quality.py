@@ -0,0 +1,153 @@
+"""
+圖像品質指標 (PSNR, SSIM)
+
+浮水印只修改圖像最上方的 changed_rows 列 (舊版佈局只有負載所在的幾列)，其餘像素與原圖相同：
+它們對 MSE 沒有貢獻，完全落在未修改區域的 SSIM 視窗值恰為 1。因此只需要對修改過的列
+(加上 SSIM 視窗的半徑) 計算，再換算成整張圖像的數值，結果與對整張圖像計算相同。
+
+PSNR 以 BGR 三個通道計算 (與先前的 API 數值一致)，SSIM 以灰階 (亮度) 計算，皆以 float32 進行。
+SSIM 視窗 (INVISIGUARD_SSIM_WINDOW)：
+- "box" (預設)：與 skimage.metrics.structural_similarity 的預設值一致 (7x7 均勻視窗、樣本共變異數)，
+  以 OpenCV 的 box filter 計算。
+- "gaussian"：Wang et al. (2004) 的原始定義 (11x11、sigma=1.5 的高斯視窗、母體共變異數)，
+  與 skimage 的 gaussian_weights=True, use_sample_covariance=False 一致。
+兩者皆為 K1=0.01、K2=0.03、uint8 的 data_range=255，平均時去掉邊緣半個視窗的像素。
+"""
+
+import cv2
+import numpy as np
+import os
+from typing import Optional, Sequence, Union
+
+METRICS = ("psnr", "ssim")
+SSIM_WINDOWS = {"box": 7, "gaussian": 11}  # 視窗邊長
+SSIM_WINDOW = os.environ.get("INVISIGUARD_SSIM_WINDOW", "box")
+GAUSSIAN_SIGMA = 1.5
+SSIM_K1 = 0.01
+SSIM_K2 = 0.03
+DATA_RANGE = 255.0
+MAX_PSNR = 100.0  # 兩張圖像完全相同時回報的 PSNR
+
+
+def psnr_from_sse(sse: float, size: int) -> float:
+    """由平方誤差總和 (所有像素與通道) 與元素數量計算 PSNR。"""
+    mse = sse / size
+    if mse == 0:
+        return MAX_PSNR
+    return float(20 * np.log10(DATA_RANGE / np.sqrt(mse)))
+
+
+def squared_error(original: np.ndarray, processed: np.ndarray) -> float:
+    """平方誤差總和 (以 OpenCV 計算，不會有 uint8 相減的溢位)。"""
+    return float(cv2.norm(original, processed, cv2.NORM_L2SQR))
+
+
+def ssim_pad(window: str = SSIM_WINDOW) -> int:
+    """SSIM 視窗的半徑：修改過的列下方需要多少列原始像素，以及平均時去掉的邊緣寬度。"""
+    if window not in SSIM_WINDOWS:
+        raise ValueError(f"不支援的 SSIM 視窗: {window} (可用: {', '.join(SSIM_WINDOWS)})")
+    return (SSIM_WINDOWS[window] - 1) // 2
+
+
+def to_luma(image: np.ndarray) -> np.ndarray:
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+
+class SsimReference:
+    """
+    參考圖像 (原圖) 一側的 SSIM 統計量：視窗平均與平方的視窗平均。
+    與同一張原圖比較多張圖像時 (例如 alpha 搜尋) 只需計算一次，每次比較少做兩次濾波。
+    """
+
+    def __init__(self, gray: np.ndarray, window: str = SSIM_WINDOW):
+        self.window = window
+        self.pad = ssim_pad(window)
+        self.x = gray.astype(np.float32)
+        self.ux = self._mean(self.x)
+        self.uxx = self._mean(self.x * self.x)
+
+    def _mean(self, img: np.ndarray) -> np.ndarray:
+        size = SSIM_WINDOWS[self.window]
+        if self.window == "gaussian":
+            return cv2.GaussianBlur(img, (size, size), GAUSSIAN_SIGMA, borderType=cv2.BORDER_REFLECT)
+        return cv2.boxFilter(img, -1, (size, size), normalize=True, borderType=cv2.BORDER_REFLECT)
+
+    def map(self, gray: np.ndarray) -> np.ndarray:
+        """逐像素的 SSIM (float32)；邊緣 self.pad 個像素的值受邊界延伸影響，平均時應排除。"""
+        y = gray.astype(np.float32)
+        ux = self.ux
+        uy = self._mean(y)
+        # box 視窗使用樣本共變異數 (與 skimage 預設相同)，高斯視窗使用母體共變異數
+        size = SSIM_WINDOWS[self.window]
+        cov_norm = 1.0 if self.window == "gaussian" else size * size / (size * size - 1)
+        vx = cov_norm * (self.uxx - ux * ux)
+        vy = cov_norm * (self._mean(y * y) - uy * uy)
+        vxy = cov_norm * (self._mean(self.x * y) - ux * uy)
+        c1 = (SSIM_K1 * DATA_RANGE) ** 2
+        c2 = (SSIM_K2 * DATA_RANGE) ** 2
+        return ((2 * ux * uy + c1) * (2 * vxy + c2)) / ((ux * ux + uy * uy + c1) * (vx + vy + c2))
+
+
+def ssim_map(gray1: np.ndarray, gray2: np.ndarray, window: str = SSIM_WINDOW) -> np.ndarray:
+    """逐像素的 SSIM (見 SsimReference.map)。"""
+    return SsimReference(gray1, window).map(gray2)
+
+
+def strip_ssim(original: Union[np.ndarray, SsimReference], processed_gray: np.ndarray, changed_rows: int, shape: tuple) -> float:
+    """
+    只有最上方 changed_rows 列被修改時，整張圖像 (形狀 shape) 的平均 SSIM。
+
+    original (灰階或其 SsimReference) / processed_gray 為兩張圖像最上方的
+    min(高度, changed_rows + 2 * ssim_pad()) 列：中心在 changed_rows + ssim_pad() 列以下的視窗
+    都沒有碰到修改過的像素，SSIM 為 1。
+    """
+    if not isinstance(original, SsimReference):
+        original = SsimReference(original)
+    pad = original.pad
+    height, width = shape[:2]
+    if height <= 2 * pad or width <= 2 * pad:
+        size = SSIM_WINDOWS[original.window]
+        raise ValueError(f"圖像太小，無法計算 SSIM (至少需要 {size}x{size})")
+    total = (height - 2 * pad) * (width - 2 * pad)
+    last = min(changed_rows + pad, height - pad)
+    if last <= pad:
+        return 1.0
+    changed = original.map(processed_gray)[pad:last, pad:width - pad]
+    return float((changed.sum(dtype=np.float64) + (total - changed.size)) / total)
+
+
+def measure(original: np.ndarray, processed: np.ndarray, changed_rows: Optional[int] = None,
+            metrics: Sequence[str] = METRICS, window: str = SSIM_WINDOW) -> dict:
+    """
+    計算 processed 相對於 original 的品質指標。
+
+    Args:
+        original (np.ndarray): 原始圖像 (BGR 或灰階)。
+        processed (np.ndarray): 處理後的圖像，形狀與 original 相同。
+        changed_rows (int, optional): 只有最上方這些列可能不同 (例如 EmbedPlan.embed_rows)；
+            None 表示整張圖像。
+        metrics (Sequence[str]): 要計算的指標 (METRICS 的子集)，空序列表示不計算。
+        window (str): SSIM 視窗 ("box" 或 "gaussian")。
+
+    Returns:
+        dict: 指標名稱對應的數值。
+
+    Raises:
+        ValueError: 不支援的指標或視窗、形狀不同，或圖像太小無法計算 SSIM。
+    """
+    unknown = set(metrics) - set(METRICS)
+    if unknown:
+        raise ValueError(f"不支援的品質指標: {', '.join(sorted(unknown))} (可用: {', '.join(METRICS)})")
+    if original.shape != processed.shape:
+        raise ValueError(f"圖像形狀不同: {original.shape} vs {processed.shape}")
+    height = original.shape[0]
+    rows = height if changed_rows is None else max(0, min(changed_rows, height))
+    result = {}
+    if "psnr" in metrics:
+        result["psnr"] = psnr_from_sse(squared_error(original[:rows], processed[:rows]), original.size)
+    if "ssim" in metrics:
+        # 每張圖像只轉換一次灰階，而且只轉換修改過的列與其下方一個視窗半徑的列
+        context = rows + 2 * ssim_pad(window)
+        reference = SsimReference(to_luma(original[:context]), window)
+        result["ssim"] = strip_ssim(reference, to_luma(processed[:context]), rows, original.shape)
+    return result
@@ -0,0 +1,116 @@
+"""
+依目標品質自動選擇嵌入強度 (alpha)
+
+使用者原本以試誤的方式挑選 alpha，每次都要完整嵌入一次。AlphaSearch 對一張圖像只做一次
+與強度無關的工作 (色彩轉換、LL 子帶、位元平面，見 WatermarkEmbedder._analyze_band)，
+之後每個候選 alpha 只需重新量化並把變化量加回會被修改的列 (embed_rows)，品質指標也只在這些列上計算
+(見 quality.py)。結果與以該 alpha 呼叫 embed_watermark_dwt_qim 逐位元相同。
+
+在 SEARCH_ALPHAS 上二分搜尋符合所有目標 (PSNR 不低於 target_psnr、SSIM 不低於 target_ssim)
+的最大 alpha (最強、最耐攻擊的浮水印)；品質隨 alpha 單調下降，約 6 次評估即可完成。
+連最小的 alpha 都不符合時採用最小的 alpha，並回報 target_met=False。
+"""
+
+import numpy as np
+from dataclasses import dataclass
+from typing import Optional
+
+from .embedding import BASE_DELTA, LEVEL, WatermarkEmbedder
+from .layout import LAYOUT_LEGACY
+from .quality import SsimReference, psnr_from_sse, squared_error, ssim_pad, strip_ssim, to_luma
+from src.utils.cancellation import checkpoint
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 可選的強度 (與 /embed 的 alpha 範圍與滑桿步進相同)
+SEARCH_ALPHAS = tuple(round(0.1 * i, 1) for i in range(1, 51))
+
+
+@dataclass(frozen=True)
+class SearchResult:
+    alpha: float
+    image: np.ndarray  # 以 alpha 嵌入的圖像
+    psnr: float
+    ssim: float
+    target_met: bool
+    evaluations: int  # 評估過的候選 alpha 數
+
+
+class AlphaSearch:
+    def __init__(self, embedder: WatermarkEmbedder, image: np.ndarray, text: str, layout: int = LAYOUT_LEGACY, level: int = LEVEL):
+        self.embedder = embedder
+        self.image = image
+        self.plan = embedder.plan_embedding(image.shape, text, layout, level)
+        rows = self.plan.embed_rows
+        # 只有最上方 embed_rows 列會改變 (列數為 2^level 的倍數或到圖像底部，與 Haar 區塊對齊)
+        self.strip = image[:rows]
+        self.analysis = embedder._analyze_band(self.strip, 0, self.plan.bits, self.plan.layout, self.plan.grid, level)
+        # SSIM 需要修改列下方一個視窗半徑的原始像素
+        context = image[:rows + 2 * ssim_pad()]
+        self._reference = SsimReference(to_luma(context))
+        self._context_below = context[rows:]
+        self.evaluations = 0
+
+    def synthesize(self, alpha: float) -> np.ndarray:
+        """以 alpha 嵌入後的 embed_rows 列。"""
+        if self.analysis is None:
+            return self.strip
+        return self.embedder._synthesize_band(self.strip, self.analysis, BASE_DELTA * alpha)
+
+    def psnr(self, strip: np.ndarray) -> float:
+        return psnr_from_sse(squared_error(self.strip, strip), self.image.size)
+
+    def ssim(self, strip: np.ndarray) -> float:
+        processed = to_luma(np.concatenate([strip, self._context_below]))
+        return strip_ssim(self._reference, processed, len(strip), self.image.shape)
+
+    def image_with(self, strip: np.ndarray) -> np.ndarray:
+        """把嵌入後的列放回整張圖像。"""
+        image = self.image.copy()
+        image[:len(strip)] = strip
+        return image
+
+    def run(self, target_psnr: Optional[float] = None, target_ssim: Optional[float] = None, alphas=SEARCH_ALPHAS) -> SearchResult:
+        """二分搜尋符合所有目標的最大 alpha (見模組說明)。"""
+        if target_psnr is None and target_ssim is None:
+            raise ValueError("至少需要指定 target_psnr 或 target_ssim 其中之一")
+
+        def evaluate(alpha):
+            checkpoint()
+            self.evaluations += 1
+            strip = self.synthesize(alpha)
+            metrics = {}
+            meets = True
+            if target_psnr is not None:
+                metrics["psnr"] = self.psnr(strip)
+                meets = metrics["psnr"] >= target_psnr
+            # PSNR 不符合時不必再算 SSIM
+            if target_ssim is not None and meets:
+                metrics["ssim"] = self.ssim(strip)
+                meets = metrics["ssim"] >= target_ssim
+            logger.debug("[AlphaSearch] alpha=%s: %s (%s)", alpha, metrics, "符合" if meets else "不符合")
+            return meets, strip, metrics
+
+        # 不變式: alphas[lo] 符合 (lo=-1 表示尚未找到)，alphas[hi] 不符合 (hi=len 表示尚未確認)
+        lo, hi = -1, len(alphas)
+        best = None
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            meets, strip, metrics = evaluate(alphas[mid])
+            if meets:
+                lo, best = mid, (strip, metrics)
+            else:
+                hi = mid
+                if mid == 0:
+                    fallback = (strip, metrics)
+
+        target_met = best is not None
+        strip, metrics = best if target_met else fallback
+        alpha = alphas[max(lo, 0)]
+        # 回報的指標兩者都要有：補算搜尋時沒有用到的那一個
+        psnr = metrics["psnr"] if "psnr" in metrics else self.psnr(strip)
+        ssim = metrics["ssim"] if "ssim" in metrics else self.ssim(strip)
+        logger.info("[AlphaSearch] alpha=%s (PSNR %.2f, SSIM %.4f, %s 次評估, 目標%s)",
+                    alpha, psnr, ssim, self.evaluations, "達成" if target_met else "未達成")
+        return SearchResult(alpha, self.image_with(strip), psnr, ssim, target_met, self.evaluations)
@@ -1,7 +1,22 @@
 import numpy as np
 import cv2
+from typing import Optional
 
-def generate_signal_heatmap(original: np.ndarray, watermarked: np.ndarray, alpha_map: np.ndarray = None) -> np.ndarray:
+from .processor import ImageProcessor
+
+# 熱圖逐條帶處理時每個像素的工作記憶體估計 (差異、灰階、熱圖、疊加結果)
+HEATMAP_BYTES_PER_PIXEL = 12
+
+
+def _gray_diff(original: np.ndarray, watermarked: np.ndarray) -> np.ndarray:
+    """原始圖像與帶浮水印圖像的絕對差異 (灰階)。"""
+    diff = cv2.absdiff(original, watermarked)
+    if len(diff.shape) == 3:
+        diff = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
+    return diff
+
+
+def generate_signal_heatmap(original: np.ndarray, watermarked: np.ndarray, alpha_map: np.ndarray = None, memory_budget: Optional[int] = None) -> np.ndarray:
     """
     生成一個高對比度的浮水印信號熱圖可視化。
 
@@ -12,28 +27,22 @@ def generate_signal_heatmap(original: np.ndarray, watermarked: np.ndarray, alpha
         original (np.ndarray): 原始圖像 (BGR 格式)。
         watermarked (np.ndarray): 帶浮水印的圖像 (BGR 格式)。
         alpha_map (np.ndarray, optional): 可選的顯式 alpha 圖 (浮點數 0-1)。如果為 None，則從差異中推斷。
+        memory_budget (int, optional): 從差異推斷時逐條帶處理的記憶體預算 (見 processor.MEMORY_BUDGET_BYTES)。
 
     Returns:
         np.ndarray: 一個帶有熱圖疊加的 BGR 圖像。
     """
-    # 1. 如果沒有提供 alpha_map，則計算差異
+    # 1. 如果沒有提供 alpha_map，則從差異推斷 (逐條帶處理以限制大圖的記憶體用量)
     if alpha_map is None:
-        # 計算原始圖像和帶浮水印圖像之間的絕對差異。
-        # 這些差異就是浮水印信號。
-        diff = cv2.absdiff(original, watermarked)
-        # 如果是彩色圖像，將差異轉換為灰階
-        if len(diff.shape) == 3:
-            diff = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
-        
-        # 將差異正規化到 0-255 的範圍。
-        # 浮水印造成的差異通常非常小（例如，像素值只有 1-5 的變化）。
-        # 我們需要將這個微小的差異拉伸到完整的 0-255 範圍，以便能夠看到它。
-        alpha_map = cv2.normalize(diff, None, 0, 255, cv2.NORM_MINMAX)
-    else:
-        # 如果提供了 alpha_map (範圍是 0-1 的浮點數)，則將其縮放到 0-255 的範圍。
-        if alpha_map.dtype != np.uint8:
-            alpha_map = (alpha_map * 255).astype(np.uint8)
-            
+        return _heatmap_from_diff(original, watermarked, memory_budget)
+    
+    # 如果提供了 alpha_map (範圍是 0-1 的浮點數)，則將其縮放到 0-255 的範圍。
+    if alpha_map.dtype != np.uint8:
+        alpha_map = (alpha_map * 255).astype(np.uint8)
+    return _overlay(original, alpha_map)
+
+
+def _overlay(original: np.ndarray, alpha_map: np.ndarray) -> np.ndarray:
     # 2. 應用色彩映射
     # cv2.COLORMAP_JET 是一個常見的色彩映射，它會將灰階圖像轉換為從藍色（低值）到紅色（高值）的彩色圖像。
     # 這使得我們可以很容易地看出浮水印信號在哪裡最強。
@@ -45,3 +54,30 @@ def generate_signal_heatmap(original: np.ndarray, watermarked: np.ndarray, alpha
     overlay = cv2.addWeighted(heatmap, 0.3, original, 0.7, 0)
     
     return overlay
+
+
+def _heatmap_from_diff(original: np.ndarray, watermarked: np.ndarray, memory_budget: Optional[int] = None) -> np.ndarray:
+    """
+    計算原始圖像和帶浮水印圖像之間的絕對差異 (這些差異就是浮水印信號) 並生成熱圖。
+    正規化需要全圖的最小/最大值，因此分兩次逐條帶掃描：先統計範圍，再正規化與疊加。
+    """
+    height, width = original.shape[:2]
+    rows = ImageProcessor.band_rows(height, width * HEATMAP_BYTES_PER_PIXEL, memory_budget)
+    bands = list(ImageProcessor.iter_bands(height, rows))
+    
+    low, high = 255, 0
+    for top, bottom in bands:
+        diff = _gray_diff(original[top:bottom], watermarked[top:bottom])
+        low, high = min(low, int(diff.min())), max(high, int(diff.max()))
+    
+    # 將差異正規化到 0-255 的範圍 (與 cv2.normalize(..., NORM_MINMAX) 相同)。
+    # 浮水印造成的差異通常非常小（例如，像素值只有 1-5 的變化）。
+    # 我們需要將這個微小的差異拉伸到完整的 0-255 範圍，以便能夠看到它。
+    scale = 255.0 / (high - low) if high > low else 0.0
+    
+    overlay = ImageProcessor.allocate(original.shape[:2] + (3,), np.uint8, memory_budget)
+    for top, bottom in bands:
+        diff = _gray_diff(original[top:bottom], watermarked[top:bottom])
+        alpha_map = cv2.convertScaleAbs(diff, alpha=scale, beta=-low * scale)
+        overlay[top:bottom] = _overlay(original[top:bottom], alpha_map)
+    return overlay
@@ -0,0 +1,190 @@
+"""
+Admission control for image processing jobs.
+
+Every request is charged an estimated peak memory cost derived from the image
+dimensions before it is decoded. Jobs are admitted against a global byte budget
+and a cap on concurrently running jobs; the rest wait in a queue or, when the
+queue is full or the wait would be too long, are rejected so the API can answer
+503 with a Retry-After hint.
+
+Fairness between small and large images:
+- Jobs up to SMALL_JOB_BYTES are "small" and are served from their own FIFO queue.
+- Large jobs may never hold more than (1 - SMALL_RESERVE) of the budget, so small
+  jobs always find headroom even while a huge upload is being processed.
+- While a large job is waiting, small jobs are limited to the reserved share, so a
+  steady stream of small jobs cannot starve the large queue either.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Optional
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Estimated peak bytes per decoded pixel, per operation (decoded image, outputs,
+# metrics and alignment buffers). Uploaded bytes are charged on top.
+COST_BYTES_PER_PIXEL = {
+    "embed": 64,  # SSIM on the changed rows in float32 (was 120 with full-image float64 SSIM)
+    "embed_search": 72,  # embed plus the search's cached analysis and candidate strip
+    "extract": 40,
+    "verify": 8,
+    "rendition": 4,  # decoded source plus the much smaller preview
+}
+
+ADMISSION_BUDGET_BYTES = int(os.environ.get("INVISIGUARD_ADMISSION_BUDGET_MB", "1024")) * 1024 * 1024
+MAX_CONCURRENT_JOBS = int(os.environ.get("INVISIGUARD_MAX_JOBS", "0")) or (os.cpu_count() or 2)
+MAX_QUEUED_JOBS = int(os.environ.get("INVISIGUARD_MAX_QUEUED_JOBS", "32"))
+QUEUE_TIMEOUT_S = float(os.environ.get("INVISIGUARD_QUEUE_TIMEOUT_S", "30"))
+SMALL_RESERVE = 0.25  # Share of the budget that large jobs can never take
+SMALL_JOB_BYTES = 64 * 1024 * 1024  # Jobs up to this cost use the small-job queue
+DEFAULT_JOB_SECONDS = 1.0  # Initial service-time estimate for Retry-After
+
+
+class AdmissionRejected(Exception):
+    """Raised when a job cannot be admitted; `retry_after` is in seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Waiter:
+    cost: int
+    small: bool
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        budget_bytes: int = ADMISSION_BUDGET_BYTES,
+        max_jobs: int = MAX_CONCURRENT_JOBS,
+        max_queued: int = MAX_QUEUED_JOBS,
+        queue_timeout: float = QUEUE_TIMEOUT_S,
+        small_job_bytes: int = SMALL_JOB_BYTES,
+        small_reserve: float = SMALL_RESERVE,
+    ):
+        self.budget_bytes = budget_bytes
+        self.max_jobs = max_jobs
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.small_job_bytes = small_job_bytes
+        self.large_limit = int(budget_bytes * (1 - small_reserve))
+        self.small_limit_when_contended = budget_bytes - self.large_limit
+
+        # State is only touched from the event loop thread, so no lock is needed.
+        self._in_use = {True: 0, False: 0}  # small/large -> bytes
+        self._running = 0
+        self._queues = {True: deque(), False: deque()}
+        self._avg_job_seconds = DEFAULT_JOB_SECONDS
+
+    def estimate(self, operation: str, height: int, width: int, upload_bytes: int = 0) -> int:
+        """Estimated peak memory (bytes) of running `operation` on an image of this size."""
+        return height * width * COST_BYTES_PER_PIXEL[operation] + upload_bytes
+
+    def _fits(self, cost: int, small: bool) -> bool:
+        if self._running >= self.max_jobs:
+            return False
+        in_use = self._in_use[True] + self._in_use[False]
+        if in_use + cost > self.budget_bytes:
+            return False
+        if small:
+            return not self._queues[False] or self._in_use[True] + cost <= self.small_limit_when_contended
+        return self._in_use[False] + cost <= self.large_limit
+
+    def _acquire(self, cost: int, small: bool):
+        self._in_use[small] += cost
+        self._running += 1
+
+    def _dispatch(self):
+        """Admit queued jobs that now fit, small queue first."""
+        progress = True
+        while progress:
+            progress = False
+            for small in (True, False):
+                queue = self._queues[small]
+                if queue and self._fits(queue[0].cost, small):
+                    waiter = queue.popleft()
+                    self._acquire(waiter.cost, small)
+                    waiter.future.set_result(None)
+                    progress = True
+
+    def _abandon(self, waiter: _Waiter):
+        """Drop a waiter that gave up; jobs behind it may now fit."""
+        waiter.future.cancel()
+        self._queues[waiter.small].remove(waiter)
+        self._dispatch()
+
+    def retry_after(self) -> int:
+        """Seconds until a new job is likely to be admitted."""
+        waiting = sum(len(q) for q in self._queues.values())
+        rounds = (waiting + self._running) / max(1, self.max_jobs)
+        return max(1, math.ceil(rounds * self._avg_job_seconds))
+
+    def snapshot(self) -> dict:
+        return {
+            "running_jobs": self._running,
+            "queued_small": len(self._queues[True]),
+            "queued_large": len(self._queues[False]),
+            "bytes_in_use": self._in_use[True] + self._in_use[False],
+            "budget_bytes": self.budget_bytes,
+        }
+
+    @asynccontextmanager
+    async def admit(self, cost: int):
+        """
+        Hold an admission slot for `cost` bytes for the duration of the block.
+        Raises AdmissionRejected when the queue is full or the wait times out.
+        """
+        small = cost <= self.small_job_bytes
+        # A job larger than the large-job share is charged as exactly that share: it
+        # then runs next to the small-job reserve instead of waiting for an idle system.
+        cost = min(cost, self.large_limit)
+        queue = self._queues[small]
+        if not queue and self._fits(cost, small):
+            self._acquire(cost, small)
+        else:
+            if sum(len(q) for q in self._queues.values()) >= self.max_queued:
+                logger.warning("Admission rejected: queue full (%s)", self.snapshot())
+                raise AdmissionRejected("queue_full", self.retry_after())
+            waiter = _Waiter(cost, small, asyncio.get_running_loop().create_future())
+            queue.append(waiter)
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+            except asyncio.TimeoutError:
+                if not waiter.future.done():
+                    self._abandon(waiter)
+                    logger.warning("Admission rejected: waited %ss (%s)", self.queue_timeout, self.snapshot())
+                    raise AdmissionRejected("queue_timeout", self.retry_after())
+            except asyncio.CancelledError:
+                # Client went away while queued; hand the slot on if it was already granted
+                if waiter.future.done() and not waiter.future.cancelled():
+                    self._release(cost, small, started=None)
+                else:
+                    self._abandon(waiter)
+                raise
+            logger.debug("Admitted after %.3fs in queue", time.monotonic() - waiter.enqueued_at)
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(cost, small, started)
+
+    def _release(self, cost: int, small: bool, started: Optional[float]):
+        self._in_use[small] -= cost
+        self._running -= 1
+        if started is not None:
+            # Exponential moving average of job duration, used for Retry-After
+            self._avg_job_seconds = 0.8 * self._avg_job_seconds + 0.2 * (time.monotonic() - started)
+        self._dispatch()
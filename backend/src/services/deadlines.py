@@ -0,0 +1,158 @@
+"""
+Request deadlines and client-disconnect detection.
+
+CancellationMiddleware gives every POST request a CancelToken (see
+src/utils/cancellation.py) and runs the endpoint in its own task:
+
+- The deadline is INVISIGUARD_REQUEST_TIMEOUT_S, or less if the client sends an
+  X-Request-Timeout header (seconds). When it passes, the endpoint is cancelled
+  and the client gets 504 DEADLINE_EXCEEDED.
+- Once the request body has been read, the connection is watched for a
+  disconnect. If the client goes away (tab closed, upstream timeout), the
+  endpoint is cancelled and a 499 (nginx's "client closed request") is
+  answered, which the server drops, so the middlewares above see a response.
+
+Cancelling the endpoint also cancels the token. The engine code in the worker
+threads then stops at its next checkpoint(), and the admission slot is freed once the
+thread has stopped. Outputs are only ever renamed into place when complete, and
+stored outputs are kept (see src/services/storage.py).
+"""
+
+import asyncio
+import json
+import os
+
+from src.utils.cancellation import CLIENT_DISCONNECTED, DEADLINE_EXCEEDED, CancelToken, cancel_scope
+from src.utils.logger import get_logger
+from src.utils.metrics import Counter
+
+logger = get_logger(__name__)
+
+REQUEST_TIMEOUT_S = float(os.environ.get("INVISIGUARD_REQUEST_TIMEOUT_S", "120"))
+TIMEOUT_HEADER = b"x-request-timeout"
+CANCELLABLE_METHODS = ("POST", "PUT", "PATCH")
+CLIENT_CLOSED_STATUS = 499
+
+CANCELLED_REQUESTS = Counter(
+    "invisiguard_cancelled_requests_total",
+    "Requests whose processing was abandoned, by reason (client_disconnected, deadline_exceeded)",
+    ("reason",),
+)
+
+
+def _timeout(scope) -> float:
+    """The server deadline, shortened by a valid X-Request-Timeout header."""
+    for name, value in scope.get("headers", ()):
+        if name == TIMEOUT_HEADER:
+            try:
+                requested = float(value)
+            except ValueError:
+                break
+            if requested > 0:
+                return min(requested, REQUEST_TIMEOUT_S)
+    return REQUEST_TIMEOUT_S
+
+
+def _cancelled_response(reason: str, timeout: float) -> tuple[int, bytes]:
+    if reason == DEADLINE_EXCEEDED:
+        return 504, json.dumps({
+            "status": "error",
+            "error_code": "DEADLINE_EXCEEDED",
+            "message": "The request did not finish within its deadline",
+            "details": {"timeout_seconds": timeout},
+            "suggestion": "Retry later, or submit large images through /v1/jobs",
+        }).encode()
+    return CLIENT_CLOSED_STATUS, json.dumps({
+        "status": "error",
+        "error_code": "CLIENT_DISCONNECTED",
+        "message": "The client closed the connection before the response was ready",
+    }).encode()
+
+
+class CancellationMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in CANCELLABLE_METHODS or REQUEST_TIMEOUT_S <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        timeout = _timeout(scope)
+        token = CancelToken(timeout)
+        body_read = asyncio.Event()
+        response_started = False
+        response_sent = False
+
+        async def receive_body():
+            message = await receive()
+            if message["type"] == "http.request" and not message.get("more_body", False):
+                body_read.set()
+            elif message["type"] == "http.disconnect":
+                token.cancel(CLIENT_DISCONNECTED)
+            return message
+
+        async def send_response(message):
+            nonlocal response_started, response_sent
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_sent = True
+
+        async def watch_disconnect():
+            # After the body, the next message the server delivers is the disconnect
+            await body_read.wait()
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            # A disconnect after the whole response went out is the normal end of the request
+            if not response_sent:
+                token.cancel(CLIENT_DISCONNECTED)
+
+        # The endpoint task copies the current context, so the token reaches the engine threads
+        with cancel_scope(token):
+            endpoint = asyncio.create_task(self.app(scope, receive_body, send_response))
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            done, _ = await asyncio.wait({endpoint, watcher}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if watcher in done and endpoint not in done and not token.cancelled:
+                # The watcher stopped without seeing a disconnect: only the deadline is left
+                done, _ = await asyncio.wait({endpoint}, timeout=token.remaining())
+            if endpoint in done:
+                endpoint.result()
+                return
+            # Cancel the endpoint before the token, so it cannot turn the engine's
+            # OperationCancelled into an error response of its own
+            endpoint.cancel()
+            token.cancel(DEADLINE_EXCEEDED)
+            await self._settle(endpoint)
+            CANCELLED_REQUESTS.inc(reason=token.reason)
+            logger.warning("Cancelled %s %s: %s", scope["method"], scope["path"], token.reason)
+            if not response_started:
+                await self._send_cancelled(send, token.reason, timeout)
+        finally:
+            watcher.cancel()
+            if not endpoint.done():
+                # The server is cancelling this request (e.g. shutdown)
+                endpoint.cancel()
+                token.cancel(CLIENT_DISCONNECTED)
+
+    @staticmethod
+    async def _settle(endpoint: asyncio.Task):
+        try:
+            await endpoint
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            logger.debug("Cancelled endpoint raised", exc_info=True)
+
+    @staticmethod
+    async def _send_cancelled(send, reason: str, timeout: float):
+        status, body = _cancelled_response(reason, timeout)
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
@@ -0,0 +1,373 @@
+"""
+Asynchronous jobs for large or long-running operations.
+
+POST /v1/jobs/{kind} stores the uploads in a spool directory, records the job in
+a SQLite queue and returns its id at once; GET /v1/jobs/{id} reports status and
+progress, optionally long-polling until the job finishes.
+
+Jobs are run by JobRunner tasks inside the API process, through the same
+admission controller and engine pool as synchronous requests. The queue is a
+SQLite database, so queued jobs survive restarts and every serve.py worker
+process can take jobs from the same queue:
+
+- A job is claimed in a write transaction, so exactly one runner gets it.
+- A running job holds a lease that its runner renews while working. If the
+  process dies, the lease expires and the job is queued again, up to
+  MAX_ATTEMPTS times.
+- Finished jobs and their spool files are deleted after JOB_RETENTION_S.
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from src.utils.cancellation import CancelToken, cancel_scope
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+JOBS_DIR = os.environ.get("INVISIGUARD_JOBS_DIR", "jobs")
+JOB_WORKERS = int(os.environ.get("INVISIGUARD_JOB_WORKERS", "2"))
+JOB_RETENTION_S = float(os.environ.get("INVISIGUARD_JOB_RETENTION_S", str(24 * 3600)))
+LEASE_S = 60.0
+MAX_ATTEMPTS = 3
+POLL_INTERVAL_S = 1.0  # Idle runners look for jobs queued by other processes this often
+WAIT_POLL_S = 0.2  # Long-poll check interval
+PURGE_INTERVAL_S = 600.0
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+TERMINAL_STATUSES = (SUCCEEDED, FAILED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    inputs TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    stage TEXT,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, available_at, created_at);
+"""
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    status: str
+    params: Dict[str, Any]
+    inputs: List[str]
+    progress: float
+    stage: Optional[str]
+    result: Optional[Dict[str, Any]]
+    error: Optional[Dict[str, Any]]
+    attempts: int
+    created_at: float
+    started_at: Optional[float]
+    finished_at: Optional[float]
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "Job":
+        return cls(
+            id=row["id"],
+            kind=row["kind"],
+            status=row["status"],
+            params=json.loads(row["params"]),
+            inputs=json.loads(row["inputs"]),
+            progress=row["progress"],
+            stage=row["stage"],
+            result=json.loads(row["result"]) if row["result"] else None,
+            error=json.loads(row["error"]) if row["error"] else None,
+            attempts=row["attempts"],
+            created_at=row["created_at"],
+            started_at=row["started_at"],
+            finished_at=row["finished_at"],
+        )
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+
+class JobRetry(Exception):
+    """Raised by a handler when the job should be queued again later (e.g. the server is at capacity)."""
+
+    def __init__(self, delay: float):
+        super().__init__(f"retry in {delay}s")
+        self.delay = delay
+
+
+class JobFailed(Exception):
+    """Raised by a handler with the structured error (an ErrorResponse payload) the job ends with."""
+
+    def __init__(self, error: Dict[str, Any]):
+        super().__init__(error.get("message", "job failed"))
+        self.error = error
+
+
+class JobStore:
+    """SQLite-backed job queue. Methods block; call them through asyncio.to_thread from the event loop."""
+
+    def __init__(self, directory: str = JOBS_DIR):
+        self.directory = directory
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _db(self) -> sqlite3.Connection:
+        # Opened on first use, so importing the API does not create files
+        if self._connection is None:
+            os.makedirs(self.directory, exist_ok=True)
+            connection = sqlite3.connect(os.path.join(self.directory, "jobs.sqlite3"), timeout=30, isolation_level=None, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def _spool(self, job_id: str) -> str:
+        return os.path.join(self.directory, "spool", job_id)
+
+    def create(self, kind: str, params: Dict[str, Any], uploads: List[bytes]) -> Job:
+        """Spool the uploads to disk and queue the job."""
+        job_id = uuid.uuid4().hex
+        spool = self._spool(job_id)
+        os.makedirs(spool, exist_ok=True)
+        inputs = []
+        for index, contents in enumerate(uploads):
+            path = os.path.join(spool, f"input_{index}")
+            with open(path, "wb") as f:
+                f.write(contents)
+            inputs.append(path)
+        now = time.time()
+        with self._lock:
+            self._db().execute(
+                "INSERT INTO jobs (id, kind, status, params, inputs, created_at, available_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, json.dumps(params), json.dumps(inputs), now, now),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._db().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row else None
+
+    def claim(self) -> Optional[Job]:
+        """
+        Take the oldest runnable job: a queued job that is due, or a running job whose
+        runner stopped renewing its lease (its process died).
+        """
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute(
+                    "SELECT * FROM jobs WHERE (status = ? AND available_at <= ?) OR (status = ? AND lease_until < ?) "
+                    "ORDER BY created_at LIMIT 1",
+                    (QUEUED, now, RUNNING, now),
+                ).fetchone()
+                if row is None:
+                    db.execute("COMMIT")
+                    return None
+                if row["status"] == RUNNING and row["attempts"] >= MAX_ATTEMPTS:
+                    error = {"status": "error", "error_code": "JOB_ABANDONED",
+                             "message": f"The job was interrupted {row['attempts']} times and was given up"}
+                    db.execute("UPDATE jobs SET status = ?, error = ?, finished_at = ?, lease_until = NULL WHERE id = ?",
+                               (FAILED, json.dumps(error), now, row["id"]))
+                    db.execute("COMMIT")
+                    self._remove_spool(row["id"])
+                    return None
+                db.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, lease_until = ?, "
+                    "progress = 0, stage = NULL WHERE id = ?",
+                    (RUNNING, now, now + LEASE_S, row["id"]),
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        if row["status"] == RUNNING:
+            logger.warning("Job %s: lease expired, running it again (attempt %d)", row["id"], row["attempts"] + 1)
+        return self.get(row["id"])
+
+    def report(self, job_id: str, progress: float, stage: Optional[str] = None):
+        """Record progress and renew the lease."""
+        with self._lock:
+            self._db().execute(
+                "UPDATE jobs SET progress = ?, stage = ?, lease_until = ? WHERE id = ? AND status = ?",
+                (progress, stage, time.time() + LEASE_S, job_id, RUNNING),
+            )
+
+    def renew(self, job_id: str):
+        with self._lock:
+            self._db().execute("UPDATE jobs SET lease_until = ? WHERE id = ? AND status = ?", (time.time() + LEASE_S, job_id, RUNNING))
+
+    def finish(self, job_id: str, result: Optional[Dict[str, Any]] = None, error: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            self._db().execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, progress = ?, stage = NULL, finished_at = ?, lease_until = NULL WHERE id = ?",
+                (FAILED if error else SUCCEEDED, json.dumps(result) if result is not None else None,
+                 json.dumps(error) if error else None, 0.0 if error else 1.0, time.time(), job_id),
+            )
+        self._remove_spool(job_id)
+
+    def requeue(self, job_id: str, delay: float):
+        """Put a claimed job back in the queue without counting the attempt."""
+        with self._lock:
+            self._db().execute(
+                "UPDATE jobs SET status = ?, attempts = attempts - 1, available_at = ?, progress = 0, stage = NULL, "
+                "started_at = NULL, lease_until = NULL WHERE id = ?",
+                (QUEUED, time.time() + delay, job_id),
+            )
+
+    def purge(self, older_than: float = JOB_RETENTION_S) -> int:
+        """Delete finished jobs (and any leftover spool files) older than `older_than` seconds."""
+        cutoff = time.time() - older_than
+        with self._lock:
+            db = self._db()
+            ids = [row["id"] for row in db.execute("SELECT id FROM jobs WHERE finished_at < ?", (cutoff,))]
+            db.execute("DELETE FROM jobs WHERE finished_at < ?", (cutoff,))
+        for job_id in ids:
+            self._remove_spool(job_id)
+        return len(ids)
+
+    def _remove_spool(self, job_id: str):
+        shutil.rmtree(self._spool(job_id), ignore_errors=True)
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+Report = Callable[[float, Optional[str]], Awaitable[None]]
+Handler = Callable[[Job, Report], Awaitable[Dict[str, Any]]]
+
+
+class JobRunner:
+    """Runs queued jobs on `workers` asyncio tasks; `handlers` maps a job kind to its coroutine."""
+
+    def __init__(self, store: JobStore, handlers: Optional[Dict[str, Handler]] = None, workers: int = JOB_WORKERS):
+        self.store = store
+        self.handlers: Dict[str, Handler] = dict(handlers or {})
+        self.workers = workers
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def register(self, kind: str, handler: Handler):
+        self.handlers[kind] = handler
+
+    async def submit(self, kind: str, params: Dict[str, Any], uploads: List[bytes]) -> Job:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = await asyncio.to_thread(self.store.create, kind, params, uploads)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        logger.info("Job %s queued (%s)", job.id, kind)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Job]:
+        """The job once it has finished, or its current state after `timeout` seconds."""
+        deadline = time.monotonic() + timeout
+        job = await self.get(job_id)
+        while job is not None and not job.done and time.monotonic() < deadline:
+            await asyncio.sleep(min(WAIT_POLL_S, max(0.0, deadline - time.monotonic())))
+            job = await self.get(job_id)
+        return job
+
+    def start(self):
+        if self._tasks or self.workers <= 0:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work(), name=f"job-runner-{i}") for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._purge(), name="job-purge"))
+
+    async def stop(self):
+        """Stop taking jobs. A job interrupted here is picked up again once its lease expires."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self):
+        while True:
+            try:
+                job = await asyncio.to_thread(self.store.claim)
+            except sqlite3.Error:
+                logger.exception("Could not claim a job")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), POLL_INTERVAL_S)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job: Job):
+        async def report(progress: float, stage: Optional[str] = None):
+            await asyncio.to_thread(self.store.report, job.id, progress, stage)
+
+        async def keep_lease():
+            while True:
+                await asyncio.sleep(LEASE_S / 3)
+                await asyncio.to_thread(self.store.renew, job.id)
+
+        lease = asyncio.create_task(keep_lease())
+        started = time.monotonic()
+        try:
+            # stop() cancels this task; the token then stops the engine thread at its next checkpoint
+            with cancel_scope(CancelToken()):
+                result = await self.handlers[job.kind](job, report)
+        except JobRetry as e:
+            await asyncio.to_thread(self.store.requeue, job.id, e.delay)
+            logger.info("Job %s requeued for %.1fs", job.id, e.delay)
+        except JobFailed as e:
+            await asyncio.to_thread(self.store.finish, job.id, error=e.error)
+            logger.warning("Job %s failed: %s", job.id, e.error.get("error_code"))
+        except Exception as e:
+            logger.exception("Job %s crashed", job.id)
+            error = {"status": "error", "error_code": "INTERNAL_SERVER_ERROR",
+                     "message": "An unexpected error occurred while processing the job", "details": {"error_message": str(e)}}
+            await asyncio.to_thread(self.store.finish, job.id, error=error)
+        else:
+            await asyncio.to_thread(self.store.finish, job.id, result=result)
+            logger.info("Job %s (%s) finished in %.0f ms", job.id, job.kind, (time.monotonic() - started) * 1000)
+        finally:
+            lease.cancel()
+
+    async def _purge(self):
+        while True:
+            try:
+                purged = await asyncio.to_thread(self.store.purge)
+                if purged:
+                    logger.info("Purged %d finished jobs", purged)
+            except sqlite3.Error:
+                logger.exception("Could not purge finished jobs")
+            await asyncio.sleep(PURGE_INTERVAL_S)
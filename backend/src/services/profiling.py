@@ -0,0 +1,211 @@
+"""
+Opt-in profiling of single requests.
+
+A request that carries the profiling token in the `X-Profile-Token` header,
+matching INVISIGUARD_PROFILE_TOKEN, is profiled; all other traffic runs
+unprofiled. The token is never read from the query string, where it would end up
+in access logs, browser history and Referer headers. Profiling is disabled when no token is configured, and
+main.py then does not install ProfilingMiddleware at all.
+
+For a profiled request:
+- every engine job it submits to the worker pool runs under cProfile in that
+  worker thread (the session travels with the request's contextvars), and
+- tracemalloc traces allocations from the start to the end of the request.
+  tracemalloc is process-wide, so the snapshot also contains allocations made by
+  requests running at the same time.
+
+The artifacts are written to PROFILE_DIR as profile_<id>.prof (pstats),
+profile_<id>.tracemalloc (tracemalloc.Snapshot.dump) and profile_<id>.txt (a
+readable summary); <id> is returned in the X-Profile-Id response header. Only the
+newest PROFILE_RETENTION profiles are kept. The artifacts under /static are only
+served to requests that carry the token as well (see storage.OutputFiles).
+"""
+
+import asyncio
+import contextvars
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+from starlette.requests import HTTPConnection
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+PROFILE_TOKEN = os.environ.get("INVISIGUARD_PROFILE_TOKEN", "")
+PROFILE_DIR = os.environ.get("INVISIGUARD_PROFILE_DIR", os.path.join("static", "debug"))
+PROFILE_RETENTION = int(os.environ.get("INVISIGUARD_PROFILE_RETENTION", "20"))
+PROFILE_HEADER = "X-Profile-Token"
+PROFILE_ID_HEADER = "X-Profile-Id"
+TRACEMALLOC_FRAMES = 10
+SUMMARY_ROWS = 30
+
+_current_session: contextvars.ContextVar[Optional["ProfileSession"]] = contextvars.ContextVar("profile_session", default=None)
+
+# tracemalloc is global: keep it running while any profiled request is in flight
+_tracing_lock = threading.Lock()
+_tracing_sessions = 0
+_tracing_started_here = False
+
+
+def _start_tracing():
+    global _tracing_sessions, _tracing_started_here
+    with _tracing_lock:
+        if _tracing_sessions == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            _tracing_started_here = True
+        _tracing_sessions += 1
+
+
+def _stop_tracing() -> tracemalloc.Snapshot:
+    global _tracing_sessions, _tracing_started_here
+    with _tracing_lock:
+        snapshot = tracemalloc.take_snapshot()
+        _tracing_sessions -= 1
+        if _tracing_sessions == 0 and _tracing_started_here:
+            tracemalloc.stop()
+            _tracing_started_here = False
+        return snapshot
+
+
+class ProfileSession:
+    def __init__(self, description: str):
+        self.id = uuid.uuid4().hex
+        self.description = description
+        self._stats: Optional[pstats.Stats] = None
+        self._lock = threading.Lock()
+        self._jobs = 0
+        self._start = time.perf_counter()
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self.duration = 0.0
+        _start_tracing()
+
+    @contextmanager
+    def profile_thread(self):
+        """cProfile the enclosed code in the current (worker) thread and merge it into the session."""
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            with self._lock:
+                self._jobs += 1
+                if self._stats is None:
+                    self._stats = pstats.Stats(profiler)
+                else:
+                    self._stats.add(profiler)
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._start
+        self._snapshot = _stop_tracing()
+
+    def save(self, directory: str = PROFILE_DIR) -> list[str]:
+        """Write the profile artifacts and return their paths."""
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"profile_{self.id}")
+        paths = []
+        summary = io.StringIO()
+        summary.write(f"{self.description}\nwall time {self.duration * 1000:.1f} ms, {self._jobs} engine job(s) profiled\n\n")
+        if self._stats is not None:
+            self._stats.dump_stats(f"{base}.prof")
+            paths.append(f"{base}.prof")
+            self._stats.stream = summary
+            self._stats.sort_stats("cumulative").print_stats(SUMMARY_ROWS)
+        if self._snapshot is not None:
+            self._snapshot.dump(f"{base}.tracemalloc")
+            paths.append(f"{base}.tracemalloc")
+            summary.write("Top allocations (still allocated at the end of the request):\n")
+            for stat in self._snapshot.statistics("lineno")[:SUMMARY_ROWS]:
+                summary.write(f"{stat}\n")
+        with open(f"{base}.txt", "w") as f:
+            f.write(summary.getvalue())
+        paths.append(f"{base}.txt")
+        return paths
+
+
+def current_session() -> Optional[ProfileSession]:
+    """The profiling session of the request being handled, if it opted in."""
+    return _current_session.get()
+
+
+def authorized(connection: HTTPConnection) -> bool:
+    """True when the request carries the profiling token header; False while profiling is disabled."""
+    if not PROFILE_TOKEN:
+        return False
+    token = connection.headers.get(PROFILE_HEADER)
+    if not token:
+        return False
+    if not hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode()):
+        logger.warning("Ignoring an invalid profiling token for %s", connection.url.path)
+        return False
+    return True
+
+
+def enforce_retention(directory: str = PROFILE_DIR, keep: int = PROFILE_RETENTION):
+    """Delete all but the newest `keep` profiles (all artifacts of a profile share its id)."""
+    try:
+        names = [name for name in os.listdir(directory) if name.startswith("profile_")]
+    except FileNotFoundError:
+        return
+    newest = {}
+    for name in names:
+        profile_id = name.split(".", 1)[0]
+        newest[profile_id] = max(newest.get(profile_id, 0.0), os.path.getmtime(os.path.join(directory, name)))
+    expired = set(sorted(newest, key=newest.get, reverse=True)[keep:])
+    for name in names:
+        if name.split(".", 1)[0] in expired:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+
+def _write_artifacts(session: ProfileSession) -> list[str]:
+    paths = session.save()
+    enforce_retention()
+    return paths
+
+
+class ProfilingMiddleware:
+    """ASGI middleware: profile the request if it carries a valid profiling token."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not authorized(HTTPConnection(scope)):
+            await self.app(scope, receive, send)
+            return
+
+        session = ProfileSession(f"{scope['method']} {scope['path']}")
+        finished = False
+
+        async def send_with_profile(message):
+            nonlocal finished
+            if message["type"] == "http.response.start":
+                # The endpoint has done its work: save the profile and name it in the response
+                session.finish()
+                finished = True
+                paths = await asyncio.to_thread(_write_artifacts, session)
+                logger.info("Profiled %s in %.1f ms: %s", session.description, session.duration * 1000, paths)
+                headers = [*message.get("headers", ()), (PROFILE_ID_HEADER.lower().encode(), session.id.encode())]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _current_session.set(session)
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            _current_session.reset(token)
+            if not finished:
+                session.finish()
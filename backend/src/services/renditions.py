@@ -0,0 +1,143 @@
+"""
+Bounded-size preview renditions of processed outputs.
+
+The UI shows watermarked images and signal maps in small panels; serving the
+full-resolution PNGs for that is most of the egress. GET /v1/renditions/{filename}
+returns a JPEG or WebP copy of a file in static/processed whose longer side is at
+most one of RENDITION_SIZES (images are never upscaled).
+
+Renditions are generated on first request with ImageProcessor.resize_image and
+cached in RENDITION_DIR as <stem>_<size><ext>. Outputs in static/processed are
+never rewritten, so a rendition only has to be regenerated when its source is
+newer (or the cache was cleared). The ETag is derived from the source file and the
+rendition parameters, so conditional requests are answered without generating or
+reading the rendition.
+"""
+
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from src.core.processor import ImageProcessor
+from src.utils.cancellation import checkpoint
+from src.utils.logger import get_logger
+from src.utils.metrics import Counter, stage_timer
+
+logger = get_logger(__name__)
+
+SOURCE_DIR = os.path.join("static", "processed")
+RENDITION_DIR = os.environ.get("INVISIGUARD_RENDITION_DIR", os.path.join("static", "renditions"))
+RENDITION_SIZES = (256, 512, 1024, 2048)  # Allowed max dimensions; a fixed set keeps the cache bounded
+DEFAULT_RENDITION_SIZE = 1024
+DEFAULT_RENDITION_FORMAT = "webp"
+HEADER_BYTES = 64 * 1024  # Enough of the source to find the PNG/JPEG dimensions
+
+
+@dataclass(frozen=True)
+class RenditionFormat:
+    extension: str
+    media_type: str
+    params: tuple
+
+
+RENDITION_FORMATS = {
+    "webp": RenditionFormat(".webp", "image/webp", (cv2.IMWRITE_WEBP_QUALITY, 80)),
+    "jpeg": RenditionFormat(".jpg", "image/jpeg", (cv2.IMWRITE_JPEG_QUALITY, 85, cv2.IMWRITE_JPEG_OPTIMIZE, 1)),
+}
+
+RENDITIONS = Counter(
+    "invisiguard_renditions_total",
+    "Preview rendition requests by result (hit, generated, not_modified)",
+    ("result",),
+)
+
+
+@dataclass(frozen=True)
+class Rendition:
+    source: str
+    path: str
+    max_dim: int
+    format: str
+    etag: str
+
+    @property
+    def media_type(self) -> str:
+        return RENDITION_FORMATS[self.format].media_type
+
+    def is_cached(self) -> bool:
+        """True when the cached file exists and is not older than its source."""
+        try:
+            return os.stat(self.path).st_mtime_ns >= os.stat(self.source).st_mtime_ns
+        except FileNotFoundError:
+            return False
+
+
+class RenditionCache:
+    def __init__(self, source_dir: str = SOURCE_DIR, rendition_dir: str = RENDITION_DIR):
+        self.source_dir = source_dir
+        self.rendition_dir = rendition_dir
+
+    def lookup(self, filename: str, max_dim: int = DEFAULT_RENDITION_SIZE, fmt: str = DEFAULT_RENDITION_FORMAT) -> Rendition:
+        """
+        Describe the rendition of `filename` (a file name in source_dir) without generating it.
+
+        Raises:
+            ValueError: if max_dim or fmt is not supported.
+            FileNotFoundError: if there is no such processed output.
+        """
+        if max_dim not in RENDITION_SIZES:
+            raise ValueError(f"Unsupported rendition size: {max_dim}")
+        if fmt not in RENDITION_FORMATS:
+            raise ValueError(f"Unsupported rendition format: {fmt}")
+        # Only plain file names: no paths out of source_dir, no hidden or temporary files
+        if os.path.basename(filename) != filename or filename.startswith("."):
+            raise FileNotFoundError(filename)
+        source = os.path.join(self.source_dir, filename)
+        stat = os.stat(source)  # FileNotFoundError for unknown outputs
+        stem = os.path.splitext(filename)[0]
+        path = os.path.join(self.rendition_dir, f"{stem}_{max_dim}{RENDITION_FORMATS[fmt].extension}")
+        key = f"{filename}:{stat.st_size}:{stat.st_mtime_ns}:{max_dim}:{fmt}"
+        etag = '"' + hashlib.sha1(key.encode()).hexdigest()[:20] + '"'
+        return Rendition(source, path, max_dim, fmt, etag)
+
+    def source_dimensions(self, rendition: Rendition) -> Optional[tuple[int, int]]:
+        """(height, width) of the source from its header, for admission; None if unknown."""
+        with open(rendition.source, "rb") as f:
+            return ImageProcessor.peek_dimensions(f.read(HEADER_BYTES))
+
+    def generate(self, rendition: Rendition) -> str:
+        """Decode, downscale, encode and atomically store the rendition; returns its path."""
+        checkpoint()
+        with stage_timer("rendition", size=rendition.max_dim, format=rendition.format):
+            image = cv2.imread(rendition.source, cv2.IMREAD_COLOR)
+            if image is None:
+                raise ValueError(f"Could not decode {rendition.source}")
+            image = self._downscale(image, rendition.max_dim)
+            checkpoint()
+            rendition_format = RENDITION_FORMATS[rendition.format]
+            ok, encoded = cv2.imencode(rendition_format.extension, image, list(rendition_format.params))
+            if not ok:
+                raise ValueError(f"Could not encode {rendition.path}")
+            os.makedirs(self.rendition_dir, exist_ok=True)
+            # Concurrent requests for the same rendition each write their own temporary file;
+            # the rename makes whichever finishes last the cached copy
+            temporary = f"{rendition.path}.{uuid.uuid4().hex}.tmp"
+            with open(temporary, "wb") as f:
+                f.write(encoded.tobytes())
+            os.replace(temporary, rendition.path)
+        logger.debug("Generated rendition %s (%d bytes)", rendition.path, encoded.size)
+        return rendition.path
+
+    @staticmethod
+    def _downscale(image: np.ndarray, max_dim: int) -> np.ndarray:
+        height, width = image.shape[:2]
+        if max(height, width) <= max_dim:
+            return image
+        if width >= height:
+            return ImageProcessor.resize_image(image, width=max_dim)
+        return ImageProcessor.resize_image(image, height=max_dim)
@@ -0,0 +1,138 @@
+"""
+Processed outputs on disk, and how they are served.
+
+Outputs are stored under content-hashed names (<prefix><sha256 prefix>.png), so a
+URL always refers to the same bytes: responses carry the hash as a strong ETag and
+`Cache-Control: immutable`, and embedding the same image twice reuses the file.
+
+STATIC_MODE (INVISIGUARD_STATIC_MODE) decides who sends the bytes:
+- "app" (default): the Python worker streams the file (Starlette FileResponse).
+- "accel": the worker answers with an empty response carrying
+  `X-Accel-Redirect: ACCEL_PREFIX/<path under static/>`, and nginx sends the file
+  itself with sendfile from an internal location (see nginx_deployment.conf).
+  The worker only checks that the file exists and picks the cache headers.
+
+Profiling artifacts (profiling.PROFILE_DIR, static/debug by default) are only
+served to requests that carry the profiling token.
+"""
+
+import hashlib
+import os
+import re
+import uuid
+from typing import Optional
+
+import cv2
+import numpy as np
+from starlette.datastructures import Headers
+from starlette.requests import HTTPConnection
+from starlette.responses import FileResponse, PlainTextResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from src.services import profiling
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+STATIC_DIR = "static"
+OUTPUT_DIR = os.path.join(STATIC_DIR, "processed")
+STATIC_MODE = os.environ.get("INVISIGUARD_STATIC_MODE", "app")
+STATIC_MODES = ("app", "accel")
+ACCEL_PREFIX = os.environ.get("INVISIGUARD_ACCEL_PREFIX", "/_static/")
+HASH_LENGTH = 32  # Hex digits of the SHA-256 kept in file names (128 bits)
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Directories under static/ whose files never change once written
+IMMUTABLE_DIRS = ("processed", "renditions")
+# Profiling artifacts, readable only with the profiling token (never matches when PROFILE_DIR is outside static/)
+PRIVATE_DIR = os.path.relpath(profiling.PROFILE_DIR, STATIC_DIR)
+CONTENT_HASHED_NAME = re.compile(rf"^[a-z_]*([0-9a-f]{{{HASH_LENGTH}}})\.png$")
+
+if STATIC_MODE not in STATIC_MODES:
+    raise ValueError(f"INVISIGUARD_STATIC_MODE must be one of {STATIC_MODES}, not {STATIC_MODE!r}")
+
+
+def save_output(image: np.ndarray, prefix: str = "", directory: str = OUTPUT_DIR) -> tuple[str, bool]:
+    """
+    Encode `image` as PNG and store it as <prefix><hash>.png in `directory`.
+
+    Returns:
+        tuple[str, bool]: the file name, and whether this call created the file
+        (False when identical content was already stored).
+    """
+    ok, encoded = cv2.imencode(".png", image)
+    if not ok:
+        raise ValueError("Could not encode the output as PNG")
+    filename = f"{prefix}{hashlib.sha256(encoded).hexdigest()[:HASH_LENGTH]}.png"
+    path = os.path.join(directory, filename)
+    if os.path.exists(path):
+        return filename, False
+    # Write then rename, so a file under its final name is always complete
+    temporary = os.path.join(directory, f".{filename}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(temporary, "wb") as f:
+            f.write(encoded.tobytes())
+        os.replace(temporary, path)
+    except BaseException:
+        try:
+            os.remove(temporary)
+        except FileNotFoundError:
+            pass
+        raise
+    return filename, True
+
+
+def output_url(filename: str) -> str:
+    return f"/{STATIC_DIR}/processed/{filename}"
+
+
+def cache_headers(path: str) -> dict:
+    """Cache-Control and, for content-hashed outputs, an ETag derived from the name."""
+    directory, name = os.path.split(os.path.relpath(path, STATIC_DIR))
+    if directory not in IMMUTABLE_DIRS:
+        return {}
+    headers = {"Cache-Control": IMMUTABLE}
+    match = CONTENT_HASHED_NAME.match(name)
+    if match:
+        headers["ETag"] = f'"{match.group(1)}"'
+    return headers
+
+
+def _accel_path(path: str) -> Optional[str]:
+    """The X-Accel-Redirect target of a file under STATIC_DIR (None for files outside it)."""
+    relative = os.path.relpath(path, STATIC_DIR)
+    if relative.startswith(os.pardir):
+        return None
+    return ACCEL_PREFIX.rstrip("/") + "/" + relative.replace(os.sep, "/")
+
+
+def file_response(path: str, media_type: Optional[str] = None, headers: Optional[dict] = None,
+                  stat_result: Optional[os.stat_result] = None) -> Response:
+    """Send a file from disk: streamed by the worker, or handed to nginx in "accel" mode."""
+    headers = {**cache_headers(path), **(headers or {})}
+    accel = _accel_path(path) if STATIC_MODE == "accel" else None
+    if accel is not None:
+        # nginx computes ETag, Last-Modified and Content-Type from the file it sends
+        headers.pop("ETag", None)
+        return Response(headers={**headers, "X-Accel-Redirect": accel})
+    return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat_result)
+
+
+def _is_private(path: str) -> bool:
+    path = os.path.normpath(path)
+    return path == PRIVATE_DIR or path.startswith(PRIVATE_DIR + os.sep)
+
+
+class OutputFiles(StaticFiles):
+    """StaticFiles for /static with immutable caching of outputs and optional X-Accel-Redirect."""
+
+    async def get_response(self, path: str, scope) -> Response:
+        # Profiles reveal code paths and memory contents: answer as if they did not exist
+        if _is_private(path) and not profiling.authorized(HTTPConnection(scope)):
+            return PlainTextResponse("Not Found", status_code=404)
+        return await super().get_response(path, scope)
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        response = file_response(os.fspath(full_path), stat_result=stat_result)
+        if isinstance(response, FileResponse) and self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -1,50 +1,195 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import cv2
-from src.core.embedding import WatermarkEmbedder
+from src.core import validate_algorithm_parameters
+from src.core.embedding import LEVEL, WatermarkEmbedder
 from src.core.extraction import WatermarkExtractor
+from src.core.orchestration import ExtractionOrchestrator, standard_methods
 from src.core.geometry import GeometryProcessor
 from src.core.visualization import generate_signal_heatmap
 from src.core.processor import ImageProcessor
-import os
-import uuid
+from src.core.quality import METRICS, measure
+from src.core.layout import LAYOUT_LEGACY, LAYOUT_TILED, SUPPORTED_LEVELS
+from src.core.tuning import AlphaSearch
+from src.services import profiling, storage
+from src.services.renditions import Rendition, RenditionCache
+from src.utils.cancellation import CANCELLED, checkpoint, current_token
+from src.utils.logger import get_logger
+from src.utils.metrics import EXECUTOR_ACTIVE, EXECUTOR_QUEUED, EXECUTOR_WAIT_SECONDS, FALLBACKS, stage_timer
+from typing import Optional, Sequence
+import time
+
+logger = get_logger(__name__)
+
+# Warm-up round trip: big enough for a 2x2 grid of tiles (LAYOUT_TILED) and small enough to take milliseconds
+WARM_UP_SIZE = 192
+WARM_UP_TEXT = "warm-up"
 
 class WatermarkService:
-    def __init__(self):
+    def __init__(self, max_workers: Optional[int] = None):
         self.embedder = WatermarkEmbedder()
         self.extractor = WatermarkExtractor()
+        # /extract decoders (tiled, legacy, DCT); the first valid decode cancels the others
+        self.orchestrator = ExtractionOrchestrator(standard_methods(self.extractor))
         self.geometry = GeometryProcessor()
         self.processor = ImageProcessor()
+        self.renditions = RenditionCache()
+        # Engine work runs in its own pool so the event loop keeps serving other requests;
+        # the admission controller decides how many jobs may run at once.
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="watermark")
+        # Set once warm_up() has completed; gates the readiness endpoint
+        self.ready = False
+        self.warm_up_error: Optional[str] = None
+
+    async def _run_blocking(self, func, *args, **kwargs):
+        """Run CPU-bound engine code in the worker pool, carrying over the caller's contextvars."""
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, func, *args, **kwargs)
+        EXECUTOR_QUEUED.inc()
+        future = asyncio.get_running_loop().run_in_executor(
+            self._executor, self._tracked, call, time.perf_counter(), profiling.current_session()
+        )
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # The request was abandoned: stop the engine at its next checkpoint, and keep
+            # the caller (and its admission slot) until the worker thread is free again.
+            token = current_token()
+            if token is not None:
+                token.cancel(CANCELLED)
+            await asyncio.wait({future})
+            if not future.cancelled():
+                future.exception()  # the OperationCancelled is expected; mark it as retrieved
+            raise
+
+    @staticmethod
+    def _tracked(call, submitted: float, session: Optional[profiling.ProfileSession] = None):
+        """Worker-side wrapper: keeps the executor queue-depth gauges current and profiles opted-in requests."""
+        EXECUTOR_QUEUED.dec()
+        EXECUTOR_WAIT_SECONDS.observe(time.perf_counter() - submitted)
+        EXECUTOR_ACTIVE.inc()
+        try:
+            if session is None:
+                return call()
+            with session.profile_thread():
+                return call()
+        finally:
+            EXECUTOR_ACTIVE.dec()
+
+    async def warm_up(self):
+        """
+        Prime the engines before the worker reports ready: runs a tiny embed -> verify round trip
+        plus the fallback and metrics paths, so lazily imported modules,
+        codec caches and OpenCV state are initialised before the first real request.
+        """
+        start = time.perf_counter()
+        try:
+            await self._run_blocking(self._warm_up)
+        except Exception as e:
+            self.warm_up_error = f"{type(e).__name__}: {e}"
+            logger.error("Warm-up failed: %s", self.warm_up_error, exc_info=e)
+            return
+        self.ready = True
+        logger.info("Warm-up completed in %.0f ms", (time.perf_counter() - start) * 1000)
+
+    def _warm_up(self):
+        validate_algorithm_parameters()
+        image = np.random.RandomState(0).randint(0, 256, (WARM_UP_SIZE, WARM_UP_SIZE, 3), dtype=np.uint8)
+        image = self.processor.decode_image(cv2.imencode(".png", image)[1].tobytes())
+        watermarked = self.embedder.embed_watermark_dwt_qim(image, WARM_UP_TEXT, 1.0, layout=LAYOUT_TILED)
+        text, metadata = self.extractor.extract_with_blind_alignment(watermarked)
+        if text != WARM_UP_TEXT:
+            raise RuntimeError(f"Round trip returned {text!r} ({metadata.get('error')})")
+        # Paths that are not on the round trip: DCT fallback, ORB alignment, signal map and metrics
+        self.extractor.extract_watermark_dct(watermarked)
+        self.geometry.align_image(image, watermarked)
+        generate_signal_heatmap(image, watermarked)
+        measure(image, watermarked)
 
-    async def embed(self, image: np.ndarray, text: str, alpha: float) -> dict:
+    async def decode(self, contents: bytes) -> np.ndarray:
+        """Decode an uploaded image off the event loop."""
+        return await self._run_blocking(self._decode, contents)
+
+    def _decode(self, contents: bytes) -> np.ndarray:
+        checkpoint()
+        with stage_timer("decode", bytes=len(contents)):
+            return self.processor.decode_image(contents)
+
+    async def embed(self, image: np.ndarray, text: str, alpha: float, layout: int = LAYOUT_LEGACY, level: int = LEVEL,
+                    target_psnr: Optional[float] = None, target_ssim: Optional[float] = None,
+                    metrics: Sequence[str] = METRICS) -> dict:
         """
         Orchestrate the embedding process.
-        Returns dict with paths and metrics.
+        With a target_psnr and/or target_ssim the strength is chosen by AlphaSearch (the strongest
+        alpha that meets every target) and `alpha` is ignored.
+        `metrics` selects the quality metrics to report (a subset of METRICS; empty skips them).
+        Returns dict with paths, metrics, the alpha and the DWT level used.
         """
+        return await self._run_blocking(self._embed, image, text, alpha, layout, level, target_psnr, target_ssim, metrics)
+
+    def _embed(self, image: np.ndarray, text: str, alpha: float, layout: int, level: int = LEVEL,
+               target_psnr: Optional[float] = None, target_ssim: Optional[float] = None,
+               metrics: Sequence[str] = METRICS) -> dict:
+        # Every stage starts with a cancellation checkpoint (see src/utils/cancellation.py)
         # 1. Embed watermark using the new DWT+QIM method
-        watermarked_image = self.embedder.embed_watermark_dwt_qim(image, text, alpha)
+        checkpoint()
+        search = None
+        if target_psnr is not None or target_ssim is not None:
+            # The search evaluates candidates on the rows the watermark changes and already
+            # has both metrics of the one it picks, so step 3 is skipped
+            with stage_timer("alpha_search"):
+                search = AlphaSearch(self.embedder, image, text, layout, level).run(target_psnr, target_ssim)
+            watermarked_image, alpha = search.image, search.alpha
+        else:
+            with stage_timer("embed"):
+                watermarked_image = self.embedder.embed_watermark_dwt_qim(image, text, alpha, layout=layout, level=level)
         
         # 2. Generate Signal Map
-        signal_map = generate_signal_heatmap(image, watermarked_image)
-        
-        # 3. Calculate metrics (PSNR, SSIM)
-        psnr = self._calculate_psnr(image, watermarked_image)
-        ssim = self._calculate_ssim(image, watermarked_image)
+        checkpoint()
+        with stage_timer("signal_map"):
+            signal_map = generate_signal_heatmap(image, watermarked_image)
         
-        # 4. Save result
-        filename = f"{uuid.uuid4()}.png"
-        output_path = os.path.join("static/processed", filename)
-        self.processor.save_image(watermarked_image, output_path)
+        # 3. Calculate the requested metrics (PSNR, SSIM) on the rows the watermark changed
+        checkpoint()
+        if search is not None:
+            quality = {"psnr": search.psnr, "ssim": search.ssim}
+        else:
+            with stage_timer("metrics"):
+                changed_rows = self.embedder.plan_embedding(image.shape, text, layout, level).embed_rows if metrics else 0
+                quality = measure(image, watermarked_image, changed_rows, metrics)
         
-        signal_filename = f"signal_{filename}"
-        signal_path = os.path.join("static/processed", signal_filename)
-        self.processor.save_image(signal_map, signal_path)
+        # 4. Save result under content-hashed names (see src/services/storage.py).
+        # A cancelled request leaves the files it stored: a concurrent request with the same
+        # content may already have been handed the same name.
+        with stage_timer("save"):
+            names = []
+            for prefix, output in (("", watermarked_image), ("signal_", signal_map)):
+                checkpoint()
+                names.append(storage.save_output(output, prefix)[0])
+        checkpoint()
+        filename, signal_filename = names
         
-        return {
-            "image_url": f"/static/processed/{filename}",
-            "signal_map_url": f"/static/processed/{signal_filename}",
-            "psnr": round(psnr, 2),
-            "ssim": round(ssim, 4)
+        result = {
+            "image_url": storage.output_url(filename),
+            "signal_map_url": storage.output_url(signal_filename),
+            "level": level,
+            "alpha": alpha
         }
+        if "psnr" in metrics:
+            result["psnr"] = round(quality["psnr"], 2)
+        if "ssim" in metrics:
+            result["ssim"] = round(quality["ssim"], 4)
+        if search is not None:
+            result["target_met"] = search.target_met
+            result["search_evaluations"] = search.evaluations
+        return result
+
+    async def render(self, rendition: Rendition) -> str:
+        """Generate a preview rendition (see src/services/renditions.py) off the event loop."""
+        return await self._run_blocking(self.renditions.generate, rendition)
 
     async def extract(self, original: np.ndarray, suspect: np.ndarray) -> dict:
         """
@@ -52,11 +197,16 @@ class WatermarkService:
         This function extracts watermark by comparing the original (unwatermarked) 
         and suspect (watermarked) images.
         """
-        print(f"[Extract Service] Original shape: {original.shape}, Suspect shape: {suspect.shape}")
+        return await self._run_blocking(self._extract, original, suspect)
+
+    def _extract(self, original: np.ndarray, suspect: np.ndarray) -> dict:
+        logger.debug("[Extract Service] Original shape: %s, Suspect shape: %s", original.shape, suspect.shape)
         
         # 1. Align suspect to match original geometry
-        aligned = self.geometry.align_image(original, suspect)
-        print(f"[Extract Service] Alignment result: {aligned is not None}")
+        checkpoint()
+        with stage_timer("alignment"):
+            aligned = self.geometry.align_image(original, suspect)
+        logger.debug("[Extract Service] Alignment result: %s", aligned is not None)
         
         if aligned is None:
             # Fallback: try without alignment
@@ -65,33 +215,43 @@ class WatermarkService:
         else:
             status = "aligned"
         
-        # 2. Extract watermark from the aligned suspect image
-        # For Extract (with original), we extract directly from the watermarked image
-        # The watermarked image should contain the embedded watermark
-        text = self.extractor.extract_watermark_dwt_qim(aligned)
+        # 2. Extract watermark from the aligned suspect image with every registered method
+        # (tiled and legacy layouts at any alpha, DCT); the first valid decode cancels the rest
+        checkpoint()
+        with stage_timer("extract"):
+            result, attempts = self.orchestrator.run(aligned)
         
-        # 3. If extraction failed, log details for debugging
-        if "failed" in text.lower() or "invalid" in text.lower() or "not enough" in text.lower():
-            # Try DCT fallback method
-            text_dct = self.extractor.extract_watermark_dct(aligned)
-            if not ("failed" in text_dct.lower() or "invalid" in text_dct.lower()):
-                text = text_dct
-                status = f"{status}_dct_fallback"
+        if result.ok and result.method == "dct":
+            FALLBACKS.inc(fallback="dwt_to_dct")
+            status = f"{status}_dct_fallback"
+        elif not result.ok:
+            logger.debug("[Extract Service] All methods failed: %s", {a.method: a.text for a in attempts})
         
         return {
-            "extracted_text": text,
-            "status": status
+            "extracted": result.ok,
+            "extracted_text": result.text,
+            "status": status,
+            "method": result.method,
+            "metadata": result.info
         }
 
-    async def verify(self, suspect: np.ndarray) -> dict:
+    async def verify(self, suspect: np.ndarray, region: Optional[tuple[int, int, int, int]] = None, level: Optional[int] = None) -> dict:
         """
         Orchestrate the blind verification process.
+        `region` optionally restricts decoding to an (x, y, width, height) pixel window;
+        `level` is the DWT level the image was embedded at, if known (otherwise every level is tried).
         """
+        return await self._run_blocking(self._verify, suspect, region, level)
+
+    def _verify(self, suspect: np.ndarray, region: Optional[tuple[int, int, int, int]], level: Optional[int] = None) -> dict:
         # 1. Extract with blind alignment
-        text, metadata = self.extractor.extract_with_blind_alignment(suspect)
+        checkpoint()
+        levels = SUPPORTED_LEVELS if level is None else (level,)
+        with stage_timer("extract"):
+            text, metadata = self.extractor.extract_with_blind_alignment(suspect, region=region, levels=levels)
         
-        # 2. Determine verification status
-        verified = bool(text and len(text) > 0)
+        # 2. Determine verification status (the extractor records failures under "error")
+        verified = bool(text and len(text) > 0) and "error" not in metadata
         
         return {
             "verified": verified,
@@ -101,17 +261,7 @@ class WatermarkService:
         }
 
     def _calculate_psnr(self, img1: np.ndarray, img2: np.ndarray) -> float:
-        mse = np.mean((img1 - img2) ** 2)
-        if mse == 0:
-            return 100.0
-        return 20 * np.log10(255.0 / np.sqrt(mse))
+        return measure(img1, img2, metrics=("psnr",))["psnr"]
 
     def _calculate_ssim(self, img1: np.ndarray, img2: np.ndarray) -> float:
-        try:
-            from skimage.metrics import structural_similarity
-            gray1 = cv2.cvtColor(img1, cv2.COLOR_BGR2GRAY)
-            gray2 = cv2.cvtColor(img2, cv2.COLOR_BGR2GRAY)
-            return structural_similarity(gray1, gray2)
-        except ImportError:
-            print("Warning: scikit-image not found. SSIM calculation skipped.")
-            return 0.0
+        return measure(img1, img2, metrics=("ssim",))["ssim"]
@@ -0,0 +1,92 @@
+"""
+Cooperative cancellation of engine work
+
+A CancelToken is attached to each HTTP request (see src/services/deadlines.py)
+and each job, and travels with the contextvars into the worker threads.
+Long-running code calls checkpoint() between steps: once the token is cancelled
+(the client disconnected, the request deadline passed, or the server is shutting
+down), the checkpoint raises OperationCancelled and the remaining steps are skipped.
+
+Code that runs without a token (the bulk CLI, benchmarks) is never cancelled,
+and its checkpoints cost one contextvar lookup.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+CLIENT_DISCONNECTED = "client_disconnected"
+DEADLINE_EXCEEDED = "deadline_exceeded"
+CANCELLED = "cancelled"
+SUPERSEDED = "superseded"  # another attempt at the same work already succeeded
+
+
+class OperationCancelled(Exception):
+    """Raised at a checkpoint once the work's token has been cancelled; `reason` says why."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CancelToken:
+    """
+    Cancellation flag shared between the event loop and worker threads. The deadline is informational:
+    whoever owns the token (the deadline middleware) cancels it when the deadline passes.
+    A child token (see child()) is also cancelled when its parent is, but can be cancelled on its own.
+    """
+
+    def __init__(self, timeout: Optional[float] = None, parent: Optional["CancelToken"] = None):
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.reason: Optional[str] = None
+        self.parent = parent
+        self._event = threading.Event()
+
+    def child(self) -> "CancelToken":
+        return CancelToken(parent=self)
+
+    def cancel(self, reason: str):
+        """Cancel the work; the first reason given is kept."""
+        if self.reason is None:
+            self.reason = reason
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set() or (self.parent is not None and self.parent.cancelled)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds until the deadline (None without one)."""
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+    def check(self):
+        if self.parent is not None:
+            self.parent.check()
+        if self._event.is_set():
+            raise OperationCancelled(self.reason)
+
+
+_current_token: contextvars.ContextVar[Optional[CancelToken]] = contextvars.ContextVar("cancel_token", default=None)
+
+
+def current_token() -> Optional[CancelToken]:
+    return _current_token.get()
+
+
+@contextmanager
+def cancel_scope(token: CancelToken):
+    """Make `token` the current token for the enclosed code (and the tasks and threads it hands its context to)."""
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+
+
+def checkpoint():
+    """Raise OperationCancelled if the current work has been cancelled."""
+    token = _current_token.get()
+    if token is not None:
+        token.check()
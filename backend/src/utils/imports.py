@@ -0,0 +1,21 @@
+"""
+Deferred imports for heavy optional modules
+
+    _fftpack = lazy_module("scipy.fftpack")
+    ...
+    _fftpack().dct(block)
+
+The module is imported on the first call (the import lock makes this safe from
+several threads) and cached afterwards, so a worker only pays for a heavy
+import when a code path needs it, or during the startup warm-up.
+"""
+
+import functools
+import importlib
+from types import ModuleType
+from typing import Callable
+
+
+def lazy_module(name: str) -> Callable[[], ModuleType]:
+    """Return a function that imports `name` on first use and returns the module."""
+    return functools.cache(functools.partial(importlib.import_module, name))
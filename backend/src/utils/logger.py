@@ -1,40 +1,176 @@
 """
 Logging configuration for InvisiGuard backend
 Provides structured logging with context for debugging
+
+Records are handed to a queue and written by a background listener thread, so
+request threads and the event loop never block on stdout. Message arguments are
+only formatted once a record passes the level and sampling filters; wrap
+expensive arguments (array slices, reductions) in `lazy(...)` so they are not
+computed at all when the record is dropped.
 """
 
+import atexit
+import copy
 import logging
+import os
+import queue
+import random
 import sys
 from datetime import datetime
-from typing import Optional, Dict, Any
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable, Optional, Dict, Any
 import json
 
 # Configure logging format
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
 
-def setup_logging(level: str = "INFO") -> logging.Logger:
+# Environment configuration (read by setup_logging when no explicit value is given)
+LOG_LEVEL = os.environ.get("INVISIGUARD_LOG_LEVEL", "INFO")
+LOG_JSON = os.environ.get("INVISIGUARD_LOG_JSON", "0").lower() in ("1", "true", "yes")
+# Comma-separated "logger=rate" pairs, e.g. "invisiguard.stages=0.01"
+LOG_SAMPLING = os.environ.get("INVISIGUARD_LOG_SAMPLING", "")
+
+_listener: Optional[QueueListener] = None
+
+
+class lazy:
+    """
+    Log argument evaluated only when the message is formatted:
+
+        logger.debug("first bits: %s", lazy(lambda: bits[:50].tolist()))
+    """
+    __slots__ = ("func",)
+
+    def __init__(self, func: Callable[[], Any]):
+        self.func = func
+
+    def __str__(self) -> str:
+        return str(self.func())
+
+    def __repr__(self) -> str:
+        return repr(self.func())
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including the structured `context` extra when present."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        context = getattr(record, "context", None)
+        if context:
+            entry["context"] = context
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a fraction of the DEBUG/INFO records of each configured logger and its children;
+    warnings and errors always pass. The most specific configured name applies.
+
+    Installed on the handler: logger filters only see records logged on that very
+    logger, not the ones propagating up from its children.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def rate(self, name: str) -> float:
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.rate(record.name)
+
+
+class _ResolvingQueueHandler(QueueHandler):
+    """
+    Resolves the message in the calling thread (the arguments may be mutated after
+    the call returns) and leaves formatting and I/O to the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _parse_sampling(spec: str) -> Dict[str, float]:
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = item.partition("=")
+        rates[name.strip()] = float(rate)
+    return rates
+
+
+def _stop_listener():
+    """Flush queued records and stop the listener thread (also runs at interpreter exit)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(_stop_listener)
+
+
+def setup_logging(level: Optional[str] = None, json_output: Optional[bool] = None, sampling: Optional[Dict[str, float]] = None) -> logging.Logger:
     """
     Setup application-wide logging configuration
     
     Args:
-        level: Log level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
+        level: Log level (DEBUG, INFO, WARNING, ERROR, CRITICAL); default INVISIGUARD_LOG_LEVEL
+        json_output: Write JSON lines instead of text; default INVISIGUARD_LOG_JSON
+        sampling: Logger name -> fraction of DEBUG/INFO records to keep; default INVISIGUARD_LOG_SAMPLING
     
     Returns:
         Configured logger instance
     """
+    global _listener
+    level = level or LOG_LEVEL
+    json_output = LOG_JSON if json_output is None else json_output
+    sampling = _parse_sampling(LOG_SAMPLING) if sampling is None else sampling
+    
     # Convert string level to logging constant
     numeric_level = getattr(logging, level.upper(), logging.INFO)
     
-    # Configure root logger
-    logging.basicConfig(
-        level=numeric_level,
-        format=LOG_FORMAT,
-        datefmt=DATE_FORMAT,
-        handlers=[
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
+    # Replace any previous configuration (setup_logging may be called again)
+    _stop_listener()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    
+    # The stream handler only runs on the listener thread
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter() if json_output else logging.Formatter(LOG_FORMAT, DATE_FORMAT))
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, stream_handler)
+    _listener.start()
+    
+    # Per-logger sampling for noisy loggers, before the message is resolved
+    queue_handler = _ResolvingQueueHandler(log_queue)
+    if sampling:
+        queue_handler.addFilter(SamplingFilter(sampling))
+    root.addHandler(queue_handler)
+    root.setLevel(numeric_level)
     
     # Get logger for this application
     logger = logging.getLogger("invisiguard")
@@ -63,12 +199,14 @@ def log_request_context(logger: logging.Logger, endpoint: str, **kwargs):
         endpoint: API endpoint being called
         **kwargs: Additional context (file_size, text_length, etc.)
     """
+    if not logger.isEnabledFor(logging.INFO):
+        return
     context = {
         "timestamp": datetime.now().isoformat(),
         "endpoint": endpoint,
         **kwargs
     }
-    logger.info(f"Request: {endpoint}", extra={"context": context})
+    logger.info("Request: %s", endpoint, extra={"context": context})
 
 def log_processing_stage(logger: logging.Logger, stage: str, duration_ms: Optional[float] = None, **kwargs):
     """
@@ -80,12 +218,17 @@ def log_processing_stage(logger: logging.Logger, stage: str, duration_ms: Option
         duration_ms: Duration in milliseconds
         **kwargs: Additional context
     """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
     context = {
         "stage": stage,
         "duration_ms": duration_ms,
         **kwargs
     }
-    logger.debug(f"Stage: {stage} {f'({duration_ms}ms)' if duration_ms else ''}", extra={"context": context})
+    if duration_ms is None:
+        logger.debug("Stage: %s", stage, extra={"context": context})
+    else:
+        logger.debug("Stage: %s (%sms)", stage, duration_ms, extra={"context": context})
 
 def log_error_with_context(
     logger: logging.Logger,
@@ -157,6 +300,3 @@ def log_success_with_metrics(logger: logging.Logger, operation: str, metrics: Di
             }
         }
     )
-
-# Initialize default logger
-default_logger = setup_logging()
@@ -0,0 +1,313 @@
+"""
+In-process metrics for InvisiGuard, exposed in the Prometheus text format
+
+Provides counters, gauges and histograms, a registry that renders them for the
+/metrics endpoint, and timers for the processing stages (upload, decode, DWT,
+QIM, Reed-Solomon, alignment, fallbacks, metrics, save). Every stage timing is
+recorded in a histogram and passed to log_processing_stage.
+"""
+
+import math
+import threading
+import time
+from collections import defaultdict
+from contextlib import ContextDecorator
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.utils.logger import get_logger, log_processing_stage
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers sub-millisecond RS decodes up to multi-second embeds of large images
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+logger = get_logger("stages")
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), registry: Optional["Registry"] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count; `function` reads the total from elsewhere at scrape time."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 function: Optional[Callable[[], float]] = None, registry: Optional["Registry"] = None):
+        super().__init__(name, documentation, labelnames, registry)
+        self._function = function
+        self._values: Dict[Tuple[str, ...], float] = defaultdict(float)
+
+    def inc(self, amount: float = 1, **labels):
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] += amount
+
+    def value(self, **labels) -> float:
+        if self._function is not None:
+            return self._function()
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            return [f"{self.name} {_format_value(self._function())}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down; `function` reads the current value at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 function: Optional[Callable[[], float]] = None, registry: Optional["Registry"] = None):
+        super().__init__(name, documentation, labelnames, registry)
+        self._function = function
+        self._values: Dict[Tuple[str, ...], float] = defaultdict(float)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] += amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        if self._function is not None:
+            return self._function()
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            return [f"{self.name} {_format_value(self._function())}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets (upper bounds in `buckets`)."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = STAGE_BUCKETS, registry: Optional["Registry"] = None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        # Index of the first bucket whose upper bound holds the value (len(buckets) = +Inf)
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return sum(series[0]) if series else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def unregister(self, name: str):
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = Histogram(
+    "invisiguard_stage_duration_seconds",
+    "Time spent in each processing stage",
+    ("stage",),
+)
+EXECUTOR_WAIT_SECONDS = Histogram(
+    "invisiguard_executor_wait_seconds",
+    "Time engine jobs waited for a worker thread",
+)
+EXECUTOR_QUEUED = Gauge("invisiguard_executor_queued_jobs", "Engine jobs waiting for a worker thread")
+EXECUTOR_ACTIVE = Gauge("invisiguard_executor_active_jobs", "Engine jobs running on a worker thread")
+EXTRACTIONS = Counter(
+    "invisiguard_extractions_total",
+    "Watermark extraction attempts by entry point",
+    ("method",),
+)
+FALLBACKS = Counter(
+    "invisiguard_fallbacks_total",
+    "Extractions that fell back to a slower or weaker method",
+    ("fallback",),
+)
+EXTRACTION_RESULTS = Counter(
+    "invisiguard_extraction_method_results_total",
+    "Outcomes of the methods run by the extraction orchestrator (success, failure, cancelled)",
+    ("method", "result"),
+)
+SCREENED_OUT = Counter(
+    "invisiguard_screened_out_total",
+    "Verifications rejected by negative screening before decoding",
+)
+RS_DECODES = Counter(
+    "invisiguard_rs_decodes_total",
+    "Reed-Solomon packet decodes by outcome (clean, corrected, failed)",
+    ("result",),
+)
+RS_CORRECTIONS = Counter(
+    "invisiguard_rs_corrected_bytes_total",
+    "Bytes repaired by Reed-Solomon decoding",
+)
+
+
+class stage_timer(ContextDecorator):
+    """
+    Time a processing stage, as a context manager or decorator:
+
+        with stage_timer("decode"):
+            ...
+
+    The duration is added to invisiguard_stage_duration_seconds{stage=...} and
+    logged through log_processing_stage together with any extra context.
+    """
+
+    def __init__(self, stage: str, **context):
+        self.stage = stage
+        self.context = context
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record_stage(self.stage, time.perf_counter() - self.start, failed=exc_type is not None, **self.context)
+        return False
+
+
+def record_stage(stage: str, seconds: float, **context):
+    """Observe a stage duration and log it through the invisiguard.stages logger (sampled as one target)."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    log_processing_stage(logger, stage, duration_ms=round(seconds * 1000, 3), **context)
+
+
+class StageClock:
+    """
+    Sums the time of stages that run in many short sections (e.g. once per image band)
+    and records each stage once when the clock is closed:
+
+        with StageClock() as clock:
+            for band in bands:
+                with clock("dwt"):
+                    ...
+    """
+
+    def __init__(self):
+        self.totals: Dict[str, float] = defaultdict(float)
+
+    def __call__(self, stage: str) -> "_ClockSection":
+        return _ClockSection(self.totals, stage)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for stage, seconds in self.totals.items():
+            record_stage(stage, seconds)
+        return False
+
+
+class _ClockSection:
+    __slots__ = ("totals", "stage", "start")
+
+    def __init__(self, totals: Dict[str, float], stage: str):
+        self.totals = totals
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.totals[self.stage] += time.perf_counter() - self.start
+        return False
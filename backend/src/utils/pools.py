@@ -0,0 +1,32 @@
+"""
+Per-thread instances of engine objects that are not safe to share.
+
+OpenCV feature detectors and matchers keep internal buffers, so one instance
+used by several worker threads at once can corrupt results, and a lock around
+it would serialize the threads. PerThread creates one instance per thread on
+first use instead; the instance lives as long as its thread.
+"""
+
+import threading
+from typing import Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class PerThread(Generic[T]):
+    """Lazily builds one `factory()` instance for each thread that calls get()."""
+
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.created = 0
+
+    def get(self) -> T:
+        try:
+            return self._local.instance
+        except AttributeError:
+            instance = self._local.instance = self._factory()
+            with self._lock:
+                self.created += 1
+            return instance
@@ -0,0 +1,120 @@
+"""
+CPU and thread budgeting for multi-worker deployments
+
+OpenCV, the BLAS behind NumPy and OpenMP each start a thread pool sized to the
+whole machine. With several worker processes this oversubscribes the CPU. This
+module splits the usable cores between workers:
+
+- plan() decides the number of workers, concurrent jobs per worker and library
+  threads per job, so workers * jobs * library threads <= usable cores.
+- ThreadPlan.job_threads is how many threads one job may keep busy on its own
+  (the concurrent /extract decoders, parallel tile decoding); the launcher passes
+  it to the workers as INVISIGUARD_JOB_THREADS and job_threads() reads it back.
+- library_thread_env() gives the environment variables that cap BLAS/OpenMP.
+  They only take effect if set before NumPy is imported, so the launcher
+  (serve.py) sets them before it starts the workers.
+- apply_library_threads() runs inside each worker and applies the OpenCV limit
+  (and, if threadpoolctl is installed, the limit for BLAS libraries that are
+  already loaded).
+
+This module must not import NumPy or OpenCV at import time.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+LIBRARY_THREADS_ENV = "INVISIGUARD_LIBRARY_THREADS"
+JOB_THREADS_ENV = "INVISIGUARD_JOB_THREADS"
+# Thread-pool variables of OpenMP, OpenBLAS, MKL, Accelerate and numexpr
+BLAS_THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+
+@dataclass(frozen=True)
+class ThreadPlan:
+    cores: int
+    workers: int
+    jobs_per_worker: int  # Concurrent engine jobs (INVISIGUARD_MAX_JOBS) per worker
+    library_threads: int  # OpenCV/BLAS threads per job
+
+    @property
+    def job_threads(self) -> int:
+        """Threads one job may run in parallel: its share of the cores."""
+        return max(1, self.cores // self.workers // self.jobs_per_worker)
+
+    def worker_cores(self, index: int, cpus: list[int]) -> list[int]:
+        """CPUs for worker `index` when pinning: an equal, contiguous share (wrapping around)."""
+        share = max(1, len(cpus) // self.workers)
+        start = (index * share) % len(cpus)
+        return [cpus[(start + i) % len(cpus)] for i in range(share)]
+
+
+def usable_cpus() -> list[int]:
+    """CPUs this process may run on (affinity mask), limited by a cgroup v2 CPU quota if present."""
+    if hasattr(os, "sched_getaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+    else:
+        cpus = list(range(os.cpu_count() or 1))
+    quota = _cgroup_cpu_quota()
+    if quota is not None and quota < len(cpus):
+        cpus = cpus[:max(1, int(quota))]
+    return cpus
+
+
+def _cgroup_cpu_quota() -> Optional[float]:
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+    except (OSError, ValueError):
+        return None
+    if quota == "max":
+        return None
+    return int(quota) / int(period)
+
+
+def job_threads() -> int:
+    """Threads one job may run in parallel: INVISIGUARD_JOB_THREADS (set by serve.py), else every usable core."""
+    value = os.environ.get(JOB_THREADS_ENV)
+    return max(1, int(value)) if value else len(usable_cpus())
+
+
+def plan(cores: int, workers: Optional[int] = None, jobs_per_worker: Optional[int] = None,
+         library_threads: Optional[int] = None) -> ThreadPlan:
+    """
+    Split `cores` between workers. By default every core gets its own worker running one job
+    with single-threaded libraries: the engines parallelise best across requests, not inside one.
+    """
+    workers = max(1, workers or cores)
+    share = max(1, cores // workers)
+    jobs_per_worker = max(1, jobs_per_worker or share)
+    library_threads = max(1, library_threads or share // jobs_per_worker)
+    return ThreadPlan(cores, workers, jobs_per_worker, library_threads)
+
+
+def library_thread_env(threads: int) -> dict[str, str]:
+    """Environment for a worker whose libraries may use `threads` threads each."""
+    env = {name: str(threads) for name in BLAS_THREAD_ENV_VARS}
+    env[LIBRARY_THREADS_ENV] = str(threads)
+    return env
+
+
+def apply_library_threads():
+    """Apply INVISIGUARD_LIBRARY_THREADS in this process (no-op when it is not set)."""
+    value = os.environ.get(LIBRARY_THREADS_ENV)
+    if not value:
+        return
+    threads = int(value)
+    import cv2
+    cv2.setNumThreads(threads)
+    try:
+        # Optional: caps BLAS pools that were created before the environment took effect
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    threadpool_limits(threads)
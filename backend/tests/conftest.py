@@ -0,0 +1,37 @@
+"""Shared test images and the application fixture."""
+
+import importlib
+import os
+
+import cv2
+import numpy as np
+import pytest
+from skimage import data
+
+from src.services import storage
+
+
+def gradient_image(height: int, width: int, seed: int = 0, noise: float = 12.0, blur: int = 0,
+                   low: float = 40, high: float = 200) -> np.ndarray:
+    """BGR horizontal gradient from `low` to `high` plus Gaussian noise, optionally blurred with a `blur` x `blur` kernel."""
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(low, high, width, dtype=np.float32)[None, :, None]
+    image = np.clip(gradient + rng.normal(0, noise, (height, width, 3)), 0, 255).astype(np.uint8)
+    return cv2.GaussianBlur(image, (blur, blur), 0) if blur else image
+
+
+def photo(name: str) -> np.ndarray:
+    """A scikit-image sample image as BGR (grayscale ones are expanded to three channels)."""
+    image = getattr(data, name)()
+    return cv2.cvtColor(image, cv2.COLOR_RGB2BGR if image.ndim == 3 else cv2.COLOR_GRAY2BGR)
+
+
+@pytest.fixture(scope="module")
+def app(tmp_path_factory):
+    # main creates and serves ./static: keep the outputs of the tests out of the tree
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(tmp_path_factory.mktemp("server"))
+        app = importlib.import_module("main").app
+        # main may have been imported (and created its directories) in another module's directory
+        os.makedirs(storage.OUTPUT_DIR, exist_ok=True)
+        yield app
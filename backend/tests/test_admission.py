@@ -0,0 +1,134 @@
+"""Admission control: queueing, small-job headroom, and 503 with Retry-After when overloaded."""
+
+import asyncio
+
+import cv2
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.api import routes
+from src.core.processor import ImageProcessor
+from src.services.admission import AdmissionController, AdmissionRejected
+
+MB = 1024 * 1024
+
+
+async def _hold(controller: AdmissionController, cost: int, started: list, release: asyncio.Event, name: str):
+    async with controller.admit(cost):
+        started.append(name)
+        await release.wait()
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_jobs_beyond_the_cap_queue_and_run_in_order():
+    async def scenario():
+        controller = AdmissionController(budget_bytes=1024 * MB, max_jobs=2, max_queued=8, queue_timeout=5)
+        started, release = [], asyncio.Event()
+        tasks = [asyncio.create_task(_hold(controller, MB, started, release, name)) for name in "abcd"]
+        await _settle()
+        assert started == ["a", "b"]
+        assert controller.snapshot()["queued_small"] == 2
+        release.set()
+        await asyncio.gather(*tasks)
+        assert started == ["a", "b", "c", "d"]
+        assert controller.snapshot()["running_jobs"] == 0
+        assert controller.snapshot()["bytes_in_use"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_and_timeout_are_rejected_with_retry_after():
+    async def scenario():
+        controller = AdmissionController(budget_bytes=1024 * MB, max_jobs=1, max_queued=1, queue_timeout=0.05)
+        started, release = [], asyncio.Event()
+        running = asyncio.create_task(_hold(controller, MB, started, release, "running"))
+        waiting = asyncio.create_task(_hold(controller, MB, started, release, "waiting"))
+        await _settle()
+
+        with pytest.raises(AdmissionRejected) as full:
+            async with controller.admit(MB):
+                pass
+        assert full.value.reason == "queue_full"
+        assert full.value.retry_after >= 1
+
+        with pytest.raises(AdmissionRejected) as timeout:
+            await waiting
+        assert timeout.value.reason == "queue_timeout"
+        assert controller.snapshot()["queued_small"] == 0
+        release.set()
+        await running
+
+    asyncio.run(scenario())
+
+
+def test_small_jobs_keep_headroom_next_to_a_large_job():
+    async def scenario():
+        controller = AdmissionController(budget_bytes=400 * MB, max_jobs=8, max_queued=8, queue_timeout=5, small_job_bytes=10 * MB)
+        started, release = [], asyncio.Event()
+        # Larger than the budget: charged as the large-job share (300 MB), so it still runs
+        huge = asyncio.create_task(_hold(controller, 1000 * MB, started, release, "huge"))
+        await _settle()
+        large = asyncio.create_task(_hold(controller, 200 * MB, started, release, "large"))
+        small = asyncio.create_task(_hold(controller, 10 * MB, started, release, "small"))
+        await _settle()
+        assert started == ["huge", "small"]
+        assert controller.snapshot()["queued_large"] == 1
+        release.set()
+        await asyncio.gather(huge, large, small)
+        assert started == ["huge", "small", "large"]
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        controller = AdmissionController(budget_bytes=1024 * MB, max_jobs=1, max_queued=8, queue_timeout=5)
+        started, release = [], asyncio.Event()
+        running = asyncio.create_task(_hold(controller, MB, started, release, "running"))
+        waiting = asyncio.create_task(_hold(controller, MB, started, release, "waiting"))
+        await _settle()
+        waiting.cancel()
+        await _settle()
+        assert controller.snapshot()["queued_small"] == 0
+        release.set()
+        await running
+        assert started == ["running"]
+        assert controller.snapshot()["running_jobs"] == 0
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(routes.router, prefix="/v1")
+    return TestClient(app)
+
+
+def test_overloaded_request_gets_503_with_retry_after(client, monkeypatch):
+    # No job may run and none may wait: every request is rejected at once
+    monkeypatch.setattr(routes, "admission", AdmissionController(max_jobs=0, max_queued=0))
+    image = cv2.imencode(".png", np.full((64, 64, 3), 128, np.uint8))[1].tobytes()
+    response = client.post("/v1/verify", files={"image": ("image.png", image, "image/png")})
+    assert response.status_code == 503
+    body = response.json()
+    assert body["error_code"] == "SERVER_OVERLOADED"
+    assert body["details"]["reason"] == "queue_full"
+    assert int(response.headers["Retry-After"]) == body["details"]["retry_after_seconds"] >= 1
+
+
+@pytest.mark.parametrize("contents", (
+    b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00",  # Header cut inside IHDR
+    b"\xff\xd8\xff\xc0\x00\x11\x08\x00",  # JPEG cut inside SOF0
+))
+def test_truncated_header_is_a_decode_error(client, contents):
+    assert ImageProcessor.peek_dimensions(contents) is None
+    response = client.post("/v1/verify", files={"image": ("image.png", contents, "image/png")})
+    assert response.status_code == 400
+    assert response.json()["error_code"] == "IMAGE_DECODE_ERROR"
@@ -0,0 +1,62 @@
+"""Memory-bounded processing: banded and memmap-backed outputs match the single-band result."""
+
+import cv2
+import numpy as np
+import pytest
+
+from src.core.embedding import WatermarkEmbedder
+from src.core.extraction import WatermarkExtractor
+from src.core.layout import SUPPORTED_LAYOUTS, SUPPORTED_LEVELS
+from src.core.processor import ImageProcessor
+from src.core.visualization import generate_signal_heatmap
+from tests.conftest import gradient_image
+
+TEXT = "band test"
+SMALL_BUDGET = 256 * 1024  # A few rows per band, and the output spills to a memmap
+LARGE_BUDGET = 1024 * 1024 * 1024
+
+
+@pytest.fixture(scope="module")
+def image():
+    return gradient_image(620, 700, noise=20, blur=3, low=30, high=220)
+
+
+@pytest.fixture(scope="module")
+def embedder():
+    return WatermarkEmbedder()
+
+
+@pytest.mark.parametrize("layout", SUPPORTED_LAYOUTS)
+@pytest.mark.parametrize("level", SUPPORTED_LEVELS)
+def test_banded_embedding_matches_in_memory(embedder, image, layout, level):
+    whole = embedder.embed_watermark_dwt_qim(image, TEXT, 1.5, layout=layout, level=level, memory_budget=LARGE_BUDGET)
+    banded = embedder.embed_watermark_dwt_qim(image, TEXT, 1.5, layout=layout, level=level, memory_budget=SMALL_BUDGET)
+    assert not isinstance(whole, np.memmap)
+    assert isinstance(banded, np.memmap)
+    np.testing.assert_array_equal(np.asarray(banded), whole)
+    assert WatermarkExtractor().extract_multi_delta(np.asarray(banded))[1] == TEXT
+
+
+def test_banded_grayscale_embedding_matches_in_memory(embedder, image):
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    whole = embedder.embed_watermark_dwt_qim(gray, TEXT, 1.0, memory_budget=LARGE_BUDGET)
+    banded = embedder.embed_watermark_dwt_qim(gray, TEXT, 1.0, memory_budget=SMALL_BUDGET // 4)
+    np.testing.assert_array_equal(np.asarray(banded), whole)
+
+
+def test_banded_heatmap_matches_in_memory(embedder, image):
+    watermarked = embedder.embed_watermark_dwt_qim(image, TEXT, 2.0)
+    whole = generate_signal_heatmap(image, watermarked, memory_budget=LARGE_BUDGET)
+    banded = generate_signal_heatmap(image, watermarked, memory_budget=SMALL_BUDGET)
+    np.testing.assert_array_equal(np.asarray(banded), whole)
+
+
+@pytest.mark.parametrize("align", (2, 4, 8))
+def test_bands_are_aligned_and_cover_the_image(align):
+    rows = ImageProcessor.band_rows(1001, 700 * 40, SMALL_BUDGET, align=align)
+    assert rows % align == 0
+    bands = list(ImageProcessor.iter_bands(1001, rows))
+    assert bands[0][0] == 0 and bands[-1][1] == 1001
+    assert all(bottom == next_top for (_, bottom), (next_top, _) in zip(bands, bands[1:]))
+    # Tiny budgets still make progress
+    assert ImageProcessor.band_rows(1001, 700 * 40, 1, align=align) == align
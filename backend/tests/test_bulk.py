@@ -0,0 +1,57 @@
+"""Bulk CLI: output names never collide, and resume matches inputs to manifest records by path and content."""
+
+import json
+
+import bulk
+
+
+def _record(path, status, **fields):
+    return json.dumps({"input": path, "status": status, **fields}) + "\n"
+
+
+def test_resume_skips_only_unchanged_inputs(tmp_path):
+    unchanged, replaced, failed, new = (tmp_path / name for name in ("a.png", "b.png", "c.png", "d.png"))
+    for path in (unchanged, replaced, failed, new):
+        path.write_bytes(path.name.encode())
+    manifest = tmp_path / "manifest.jsonl"
+    manifest.write_text(
+        _record(str(unchanged), "ok", sha256=bulk.file_sha256(str(unchanged)))
+        + _record(str(replaced), "ok", sha256=bulk.file_sha256(str(replaced)))
+        + _record(str(failed), "error")
+        + '{"input": "' + str(new)  # cut off by an interrupted run
+    )
+    replaced.write_bytes(b"new content")
+
+    done = bulk.load_manifest(str(manifest))
+    inputs = [(str(path), path.name) for path in (unchanged, replaced, failed, new)]
+    assert [path for path, _ in bulk.pending(inputs, done, retry_failed=False)] == [str(replaced), str(new)]
+    assert [path for path, _ in bulk.pending(inputs, done, retry_failed=True)] == [str(replaced), str(failed), str(new)]
+
+
+def test_partial_last_line_is_terminated(tmp_path):
+    manifest = tmp_path / "manifest.jsonl"
+    manifest.write_text(_record("a.png", "ok") + '{"input": "b.p')
+    bulk._terminate_last_line(str(manifest))
+    bulk._terminate_last_line(str(manifest))
+    with open(manifest, "a") as f:
+        f.write(_record("c.png", "ok"))
+    assert list(bulk.load_manifest(str(manifest))) == ["a.png", "c.png"]
+
+
+def test_output_paths_never_collide(tmp_path):
+    photos = tmp_path / "photos"
+    for relative in ("a/x.jpg", "b/x.jpg", "a/x.png", "a/y.jpg"):
+        (photos / relative).parent.mkdir(parents=True, exist_ok=True)
+        (photos / relative).write_bytes(b"image")
+    listed = tmp_path / "list.txt"
+    listed.write_text(f"{photos / 'a/x.jpg'}\n{photos / 'b/x.jpg'}\n")
+
+    from_directory = dict(bulk.iter_inputs([str(photos)]))
+    from_list = dict(bulk.iter_inputs([], list_file=str(listed)))
+    assert len(set(from_directory.values())) == len(from_directory) == 4
+    assert len(set(from_list.values())) == len(from_list) == 2
+    # Only names that would clash are tagged; the relative layout is kept
+    assert from_directory[str(photos / "a/y.jpg")] == "photos/a/y.png"
+    assert from_directory[str(photos / "b/x.jpg")] == "photos/b/x.png"
+    # The same input always gets the same output, so a resumed run rewrites the same file
+    assert dict(bulk.iter_inputs([str(photos / "a/x.jpg")])) == {str(photos / "a/x.jpg"): from_list[str(photos / "a/x.jpg")]}
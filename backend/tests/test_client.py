@@ -0,0 +1,110 @@
+"""InvisiGuardClient against the app, in-process through httpx's ASGI transport."""
+
+import asyncio
+
+import cv2
+import httpx
+import pytest
+
+from src.client import InvisiGuardClient, InvisiGuardError
+from src.client import client as client_module
+from tests.conftest import gradient_image
+
+TEXT = "(c) ACME"
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(client_module, "BACKOFF_BASE_S", 0.0)
+
+
+def _png(seed: int) -> bytes:
+    return cv2.imencode(".png", gradient_image(256, 320, seed=seed))[1].tobytes()
+
+
+class FlakyTransport(httpx.AsyncBaseTransport):
+    """Answers the first `failures` requests with 503 SERVER_OVERLOADED, then forwards to the app."""
+
+    def __init__(self, app, failures: int):
+        self.inner = httpx.ASGITransport(app=app)
+        self.failures = failures
+        self.requests = 0
+
+    async def handle_async_request(self, request):
+        self.requests += 1
+        if self.requests <= self.failures:
+            await request.aread()
+            body = {"status": "error", "error_code": "SERVER_OVERLOADED", "message": "busy"}
+            return httpx.Response(503, json=body, headers={"Retry-After": "0"})
+        return await self.inner.handle_async_request(request)
+
+
+def _client(app, transport=None, **kwargs) -> InvisiGuardClient:
+    return InvisiGuardClient("http://testserver", transport=transport or httpx.ASGITransport(app=app), **kwargs)
+
+
+def test_embed_download_and_verify_from_disk(app, tmp_path):
+    source = tmp_path / "photo.png"
+    source.write_bytes(_png(0))
+
+    async def scenario():
+        async with _client(app) as client:
+            embedded = await client.embed(source, TEXT)
+            downloaded = await client.download(embedded.image_url, tmp_path / "watermarked.png")
+            return embedded, await client.verify(downloaded)
+
+    embedded, verified = asyncio.run(scenario())
+    assert embedded.psnr > 30
+    assert verified.verified
+    assert verified.watermark_text == TEXT
+
+
+def test_bulk_calls_keep_input_order_and_return_errors_in_place(app):
+    images = [_png(seed) for seed in range(4)] + [b"not an image"]
+
+    async def scenario():
+        async with _client(app, max_concurrency=2) as client:
+            return await client.verify_many(images)
+
+    results = asyncio.run(scenario())
+    assert [r.verified for r in results[:4]] == [False] * 4
+    assert isinstance(results[4], InvisiGuardError)
+    assert results[4].error_code == "IMAGE_DECODE_ERROR"
+
+
+def test_overloaded_responses_are_retried(app):
+    transport = FlakyTransport(app, failures=2)
+
+    async def scenario():
+        async with _client(app, transport=transport, max_retries=3) as client:
+            return await client.embed(_png(1), TEXT)
+
+    assert asyncio.run(scenario()).image_url.startswith("/static/processed/")
+    assert transport.requests == 3
+
+
+def test_retries_are_bounded(app):
+    transport = FlakyTransport(app, failures=10)
+
+    async def scenario():
+        async with _client(app, transport=transport, max_retries=2) as client:
+            await client.embed(_png(1), TEXT)
+
+    with pytest.raises(InvisiGuardError) as excinfo:
+        asyncio.run(scenario())
+    assert excinfo.value.status_code == 503
+    assert transport.requests == 3
+
+
+def test_validation_errors_are_not_retried(app):
+    transport = FlakyTransport(app, failures=0)
+
+    async def scenario():
+        async with _client(app, transport=transport) as client:
+            await client.embed(_png(2), TEXT, alpha=50.0)
+
+    with pytest.raises(InvisiGuardError) as excinfo:
+        asyncio.run(scenario())
+    assert excinfo.value.error_code == "INVALID_ALPHA_RANGE"
+    assert excinfo.value.error.field == "alpha"
+    assert transport.requests == 1
@@ -0,0 +1,81 @@
+"""Payload codec: vectorized syndromes against reedsolo, the clean-packet shortcut and the encode cache."""
+
+import numpy as np
+import pytest
+import reedsolo
+from reedsolo import ReedSolomonError
+
+from src.core.codec import PayloadCodec
+
+NSYM = 30
+TEXT = "codec test"
+
+
+class UnusedBackend:
+    """Stands in for the Reed-Solomon backend where decoding must not reach it."""
+
+    def decode(self, *args, **kwargs):
+        raise AssertionError("the backend decoder was called")
+
+
+def _packet(codec: PayloadCodec, text: str = TEXT) -> bytearray:
+    return PayloadCodec.bits_to_packet(codec.encode_text(text))
+
+
+def test_clean_packet_skips_the_backend():
+    codec = PayloadCodec(NSYM)
+    packet = _packet(codec)
+    assert not codec.syndromes(packet).any()
+    codec.rsc = UnusedBackend()
+    data, corrected = codec.decode(packet)
+    assert corrected == 0
+    assert bytes(data[:4 + len(TEXT)]) == b"INV" + bytes([len(TEXT)]) + TEXT.encode()
+
+
+def test_corrupted_byte_is_detected_and_corrected():
+    codec = PayloadCodec(NSYM)
+    packet = _packet(codec)
+    corrupted = bytearray(packet)
+    corrupted[7] ^= 0x5A
+    assert codec.syndromes(corrupted).any()
+    data, corrected = codec.decode(corrupted)
+    assert corrected == 1
+    assert data == packet[:-NSYM]
+
+
+@pytest.mark.parametrize("fcr", (0, 1, 120))
+def test_syndromes_match_reedsolo(fcr):
+    codec = PayloadCodec(NSYM, fcr=fcr)
+    rng = np.random.default_rng(fcr)
+    packet = _packet(codec)
+    for _ in range(5):
+        corrupted = bytearray(packet)
+        for position in rng.choice(len(packet), size=3, replace=False):
+            corrupted[position] ^= int(rng.integers(1, 256))
+        # reedsolo prepends a 0 to its syndrome list
+        expected = reedsolo.rs_calc_syndromes(corrupted, NSYM, fcr=fcr)[1:]
+        assert codec.syndromes(corrupted).tolist() == list(expected)
+    assert codec.decode(packet)[1] == 0
+
+
+def test_too_many_errors_raise():
+    codec = PayloadCodec(NSYM)
+    corrupted = bytearray(_packet(codec))
+    for position in range(0, 2 * NSYM, 2):
+        corrupted[position] ^= 0xFF
+    with pytest.raises(ReedSolomonError):
+        codec.decode(corrupted)
+
+
+def test_repeated_text_is_served_from_the_cache():
+    codec = PayloadCodec(NSYM)
+    first = codec.encode_text(TEXT)
+    before = codec._encode_cached.cache_info()
+    second = codec.encode_text(TEXT)
+    after = codec._encode_cached.cache_info()
+    assert second is first
+    assert (after.hits, after.misses) == (before.hits + 1, before.misses)
+    # Shared between callers, so it must not be writable
+    assert not second.flags.writeable
+    with pytest.raises(ValueError):
+        second[0] = 1 - second[0]
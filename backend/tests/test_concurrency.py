@@ -0,0 +1,100 @@
+"""Shared engine objects under parallel load: every result must match the sequential run."""
+
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import pytest
+
+from src.core.codec import PayloadCodec
+from src.core.embedding import N_ECC_SYMBOLS, WatermarkEmbedder
+from src.core.extraction import WatermarkExtractor
+from src.core.geometry import GeometryProcessor
+from src.core.layout import LAYOUT_LEGACY, LAYOUT_TILED
+from tests.conftest import gradient_image
+
+THREADS = 8
+ROUNDS = 6
+
+
+def _corrupt(packet: bytearray, seed: int, errors: int = 10) -> bytearray:
+    packet = bytearray(packet)
+    for pos in np.random.default_rng(seed).choice(len(packet), errors, replace=False):
+        packet[pos] ^= 0xFF
+    return packet
+
+
+@pytest.fixture(scope="module")
+def engines():
+    return WatermarkEmbedder(), WatermarkExtractor(), GeometryProcessor()
+
+
+@pytest.fixture(scope="module")
+def tasks(engines):
+    """(name, zero-argument call) pairs that all use the same engine instances."""
+    embedder, extractor, geometry = engines
+    images = [gradient_image(240, 320, seed=seed) for seed in range(3)]
+    transform = cv2.getRotationMatrix2D((160, 120), 3.0, 0.97)
+    packet = embedder.codec.bits_to_packet(embedder.codec.encode_text("stress"))
+
+    def embed(image, text, alpha, layout):
+        return embedder.embed_watermark_dwt_qim(image, text, alpha, layout=layout).tobytes()
+
+    def round_trip(image, text, alpha, layout):
+        ok, decoded, info = extractor.extract_multi_delta(embedder.embed_watermark_dwt_qim(image, text, alpha, layout=layout))
+        return ok, decoded, info.get("alpha_detected")
+
+    def align(image):
+        aligned = geometry.align_image(image, cv2.warpAffine(image, transform, (320, 240)))
+        return None if aligned is None else aligned.tobytes()
+
+    def decode(seed):
+        decoded, corrections = extractor.codec.decode(_corrupt(packet, seed))
+        return bytes(decoded), corrections
+
+    def new_codec(seed):
+        # Building a codec while other threads decode must not disturb their Reed-Solomon tables
+        codec = PayloadCodec(N_ECC_SYMBOLS)
+        return bytes(codec.decode(_corrupt(packet, seed))[0])
+
+    calls = []
+    for i, image in enumerate(images):
+        for layout in (LAYOUT_TILED, LAYOUT_LEGACY):
+            calls.append((f"embed-{i}-{layout}", lambda i=image, l=layout: embed(i, f"text {l}", 1.5, l)))
+            calls.append((f"round-trip-{i}-{layout}", lambda i=image, l=layout: round_trip(i, f"payload {l}", 0.8 + l, l)))
+        calls.append((f"align-{i}", lambda i=image: align(i)))
+        calls.append((f"dct-{i}", lambda i=image: extractor._dct_bits(i).tobytes()))
+    for seed in range(4):
+        calls.append((f"decode-{seed}", lambda s=seed: decode(s)))
+        calls.append((f"new-codec-{seed}", lambda s=seed: new_codec(s)))
+    return calls
+
+
+def test_parallel_results_match_sequential(tasks):
+    expected = {name: call() for name, call in tasks}
+    assert expected["round-trip-0-2"][:2] == (True, "payload 2")
+
+    work = [task for task in tasks for _ in range(ROUNDS)]
+    random.Random(0).shuffle(work)
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        results = list(pool.map(lambda task: (task[0], task[1]()), work))
+
+    mismatched = sorted({name for name, result in results if result != expected[name]})
+    assert not mismatched
+
+
+def test_stateful_engine_objects_are_per_thread(engines):
+    _, _, geometry = engines
+    barrier = threading.Barrier(4)
+
+    def objects(_):
+        barrier.wait()  # four calls on four different threads
+        return id(geometry.orb), id(geometry.matcher)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        seen = list(pool.map(objects, range(4)))
+    assert len({orb for orb, _ in seen}) == 4
+    assert len({matcher for _, matcher in seen}) == 4
+    assert geometry.orb is geometry.orb
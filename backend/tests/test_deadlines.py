@@ -0,0 +1,98 @@
+"""Request deadlines: the endpoint is cancelled, its engine thread stops, and the client gets 504."""
+
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.core.embedding import WatermarkEmbedder
+from src.services import deadlines
+from src.services.deadlines import CancellationMiddleware
+from src.utils.cancellation import DEADLINE_EXCEEDED, CancelToken, OperationCancelled, cancel_scope, checkpoint
+
+
+class Engine:
+    """Blocking work that polls checkpoint() the way the engines do, and records how it ended."""
+
+    def __init__(self):
+        self.outcome = None
+        self.stopped = threading.Event()
+
+    def run(self, seconds: float):
+        try:
+            end = time.monotonic() + seconds
+            while time.monotonic() < end:
+                checkpoint()
+                time.sleep(0.005)
+            self.outcome = "finished"
+        except OperationCancelled as e:
+            self.outcome = e.reason
+            raise
+        finally:
+            self.stopped.set()
+
+
+@pytest.fixture
+def engine():
+    return Engine()
+
+
+@pytest.fixture
+def client(engine):
+    app = FastAPI()
+
+    @app.post("/work")
+    async def work(seconds: float):
+        # to_thread copies the context, so the request's token reaches the thread
+        await asyncio.to_thread(engine.run, seconds)
+        return {"ok": True}
+
+    @app.get("/work")
+    async def read(seconds: float):
+        await asyncio.sleep(seconds)
+        return {"ok": True}
+
+    return TestClient(CancellationMiddleware(app))
+
+
+def test_fast_request_is_untouched(client, engine):
+    response = client.post("/work", params={"seconds": 0.01}, headers={"X-Request-Timeout": "5"})
+    assert response.json() == {"ok": True}
+    assert engine.outcome == "finished"
+
+
+def test_deadline_cancels_the_engine_and_answers_504(client, engine):
+    started = time.monotonic()
+    response = client.post("/work", params={"seconds": 5}, headers={"X-Request-Timeout": "0.2"})
+    assert time.monotonic() - started < 2
+    assert response.status_code == 504
+    body = response.json()
+    assert body["error_code"] == "DEADLINE_EXCEEDED"
+    assert body["details"]["timeout_seconds"] == 0.2
+    assert engine.stopped.wait(2)
+    assert engine.outcome == DEADLINE_EXCEEDED
+
+
+def test_reads_are_not_subject_to_the_deadline(client, monkeypatch):
+    monkeypatch.setattr(deadlines, "REQUEST_TIMEOUT_S", 0.05)
+    assert client.get("/work", params={"seconds": 0.2}).json() == {"ok": True}
+
+
+@pytest.mark.parametrize("header, expected", (("2.5", 2.5), ("1000", 120.0), ("0", 120.0), ("soon", 120.0), (None, 120.0)))
+def test_header_can_only_shorten_the_deadline(monkeypatch, header, expected):
+    monkeypatch.setattr(deadlines, "REQUEST_TIMEOUT_S", 120.0)
+    headers = [] if header is None else [(deadlines.TIMEOUT_HEADER, header.encode())]
+    assert deadlines._timeout({"headers": headers}) == expected
+
+
+def test_cancelled_token_stops_the_embedder():
+    image = np.full((256, 256, 3), 128, np.uint8)
+    token = CancelToken()
+    token.cancel(DEADLINE_EXCEEDED)
+    with cancel_scope(token), pytest.raises(OperationCancelled) as cancelled:
+        WatermarkEmbedder().embed_watermark_dwt_qim(image, "deadline", 1.0)
+    assert cancelled.value.reason == DEADLINE_EXCEEDED
@@ -0,0 +1,50 @@
+"""Soft-decision retry: bytes flagged unreliable are decoded as Reed-Solomon erasures."""
+
+import numpy as np
+import pytest
+
+from src.core.extraction import RS_BLOCK_SIZE, WatermarkExtractor
+
+TEXT = "erasure test"
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    return WatermarkExtractor()
+
+
+def _corrupt(bits: np.ndarray, byte_positions) -> tuple[np.ndarray, np.ndarray]:
+    """Flips one bit in each listed byte and marks exactly those bits as unreliable."""
+    bits = bits.copy()
+    reliability = np.full(len(bits), 0.5)
+    for position in byte_positions:
+        bits[position * 8 + 3] ^= 1
+        reliability[position * 8 + 3] = 0.01
+    return bits, reliability
+
+
+def test_erasures_recover_more_errors_than_hard_decoding(extractor):
+    # 20 byte errors: beyond the 15 that hard decoding corrects, within the 30 erasures the ECC allows
+    bits, reliability = _corrupt(extractor.codec.encode_text(TEXT), range(5, 245, 12))
+    assert not extractor._decode_rs_checked(bits)[0]
+    assert extractor._decode_rs_checked(bits, reliability) == (True, TEXT)
+
+
+def test_reliable_errors_are_not_erased(extractor):
+    # The same errors reported as reliable: the erasures land on correct bytes and cannot help
+    bits, _ = _corrupt(extractor.codec.encode_text(TEXT), range(5, 245, 12))
+    reliability = np.full(len(bits), 0.5)
+    reliability[::97] = 0.01
+    assert not extractor._decode_rs_checked(bits, reliability)[0]
+
+
+def test_miscorrected_padding_is_rejected(extractor):
+    # A valid codeword whose header and message parse, but whose padding is not zero,
+    # is what a miscorrection looks like: the erasure retry must not report it
+    data = bytearray(b"INV\x03nat" + bytes(RS_BLOCK_SIZE - extractor.codec.nsym - 7))
+    data[100] = 0x5A
+    codeword = np.unpackbits(np.frombuffer(bytes(extractor.codec.rsc.encode(data)), dtype=np.uint8))
+    bits, reliability = _corrupt(codeword, range(5, 245, 12))
+    assert not extractor._decode_rs_checked(bits, reliability)[0]
+    assert extractor._padding_intact(bytearray(b"INV\x03nat" + bytes(10)))
+    assert not extractor._padding_intact(data)
@@ -0,0 +1,122 @@
+"""SQLite job queue: exclusive claims, lease expiry, requeueing and the runner loop."""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.services import jobs
+from src.services.jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, JobFailed, JobRetry, JobRunner, JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path))
+    yield store
+    store.close()
+
+
+def test_each_job_is_claimed_by_exactly_one_process(tmp_path, store):
+    created = {store.create("verify", {"n": n}, [b"image"]).id for n in range(20)}
+    # One store per "process": separate connections to the same database
+    stores = [JobStore(str(tmp_path)) for _ in range(4)]
+
+    def drain(worker_store):
+        claimed = []
+        while (job := worker_store.claim()) is not None:
+            claimed.append(job.id)
+        return claimed
+
+    with ThreadPoolExecutor(len(stores)) as pool:
+        claims = [job_id for claimed in pool.map(drain, stores) for job_id in claimed]
+    for worker_store in stores:
+        worker_store.close()
+    assert sorted(claims) == sorted(created)
+    assert all(store.get(job_id).status == RUNNING for job_id in created)
+
+
+def test_expired_lease_is_claimed_again_until_abandoned(store, monkeypatch):
+    job = store.create("embed", {}, [b"image"])
+    assert os.path.exists(job.inputs[0])
+    # Every lease is already expired: as if each runner died right after claiming
+    monkeypatch.setattr(jobs, "LEASE_S", -1.0)
+    for attempt in range(1, jobs.MAX_ATTEMPTS + 1):
+        claimed = store.claim()
+        assert (claimed.id, claimed.attempts) == (job.id, attempt)
+    assert store.claim() is None
+    abandoned = store.get(job.id)
+    assert abandoned.status == FAILED
+    assert abandoned.error["error_code"] == "JOB_ABANDONED"
+    assert not os.path.exists(job.inputs[0])
+
+
+def test_renewed_lease_keeps_the_job(store):
+    job = store.create("embed", {}, [b"image"])
+    store.claim()
+    store.report(job.id, 0.5, "embedding")
+    assert store.claim() is None
+    running = store.get(job.id)
+    assert (running.progress, running.stage) == (0.5, "embedding")
+
+
+def test_requeue_delays_without_counting_the_attempt(store):
+    job = store.create("embed", {}, [b"image"])
+    store.claim()
+    store.requeue(job.id, delay=0.2)
+    queued = store.get(job.id)
+    assert (queued.status, queued.attempts) == (QUEUED, 0)
+    assert store.claim() is None  # Not due yet
+    time.sleep(0.25)
+    assert store.claim().attempts == 1
+
+
+def test_purge_deletes_finished_jobs(store):
+    done = store.create("verify", {}, [b"image"])
+    pending = store.create("verify", {}, [b"image"])
+    store.claim()
+    store.finish(done.id, result={"verified": False})
+    assert store.purge(older_than=-1) == 1
+    assert store.get(done.id) is None
+    assert store.get(pending.id).status == QUEUED
+
+
+def test_runner_reports_results_errors_and_retries(store, monkeypatch):
+    monkeypatch.setattr(jobs, "POLL_INTERVAL_S", 0.01)
+    monkeypatch.setattr(jobs, "WAIT_POLL_S", 0.01)
+    attempts = []
+
+    async def echo(job, report):
+        await report(0.5, "echo")
+        with open(job.inputs[0], "rb") as f:
+            return {"size": len(f.read()), **job.params}
+
+    async def busy_once(job, report):
+        attempts.append(job.id)
+        if len(attempts) == 1:
+            raise JobRetry(0.0)
+        return {"attempts": len(attempts)}
+
+    async def reject(job, report):
+        raise JobFailed({"status": "error", "error_code": "INVALID_IMAGE", "message": "bad"})
+
+    async def scenario():
+        runner = JobRunner(store, {"echo": echo, "busy": busy_once, "reject": reject}, workers=2)
+        runner.start()
+        try:
+            submitted = [
+                await runner.submit("echo", {"text": "hi"}, [b"12345"]),
+                await runner.submit("busy", {}, [b""]),
+                await runner.submit("reject", {}, [b""]),
+            ]
+            with pytest.raises(ValueError):
+                await runner.submit("unknown", {}, [])
+            return [await runner.wait(job.id, timeout=5) for job in submitted]
+        finally:
+            await runner.stop()
+
+    echoed, retried, rejected = asyncio.run(scenario())
+    assert (echoed.status, echoed.result, echoed.progress) == (SUCCEEDED, {"size": 5, "text": "hi"}, 1.0)
+    assert (retried.status, retried.result, retried.attempts) == (SUCCEEDED, {"attempts": 2}, 1)
+    assert (rejected.status, rejected.error["error_code"]) == (FAILED, "INVALID_IMAGE")
@@ -0,0 +1,53 @@
+"""Payload placement at every supported DWT level: round trip, level detection and rescaling."""
+
+import cv2
+import pytest
+
+from src.core.embedding import WatermarkEmbedder
+from src.core.extraction import WatermarkExtractor
+from src.core.layout import LAYOUT_LEGACY, LAYOUT_TILED, SUPPORTED_LEVELS
+from tests.conftest import gradient_image
+
+TEXT = "level test"
+
+
+@pytest.fixture(scope="module")
+def image():
+    return gradient_image(600, 800, noise=15, blur=5)
+
+
+@pytest.fixture(scope="module")
+def engines():
+    return WatermarkEmbedder(), WatermarkExtractor()
+
+
+@pytest.mark.parametrize("layout", (LAYOUT_TILED, LAYOUT_LEGACY))
+@pytest.mark.parametrize("level", SUPPORTED_LEVELS)
+def test_round_trip_reports_level(engines, image, layout, level):
+    embedder, extractor = engines
+    watermarked = embedder.embed_watermark_dwt_qim(image, TEXT, 1.0, layout=layout, level=level)
+    ok, text, info = extractor.extract_multi_delta(watermarked)
+    assert (ok, text) == (True, TEXT)
+    assert info["dwt_level"] == level
+    assert info["alpha_detected"] == 1.0
+    # Restricting the search to another level finds nothing
+    other = next(l for l in SUPPORTED_LEVELS if l != level)
+    assert not extractor.extract_multi_delta(watermarked, levels=(other,))[0]
+
+
+@pytest.mark.parametrize("level, survives", ((1, False), (2, True), (3, True)))
+def test_coarse_levels_survive_rescaling(engines, image, level, survives):
+    embedder, extractor = engines
+    watermarked = embedder.embed_watermark_dwt_qim(image, TEXT, 1.0, level=level)
+    height, width = watermarked.shape[:2]
+    small = cv2.resize(watermarked, None, fx=0.75, fy=0.75, interpolation=cv2.INTER_AREA)
+    restored = cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR)
+    ok, text, _ = extractor.extract_multi_delta(restored)
+    assert ok == survives
+    if survives:
+        assert text == TEXT
+
+
+def test_unsupported_level_is_rejected(engines, image):
+    with pytest.raises(ValueError):
+        engines[0].embed_watermark_dwt_qim(image, TEXT, 1.0, level=4)
@@ -0,0 +1,65 @@
+"""Log sampling: configured on a logger name, applied to its children and to every stage timing."""
+
+import io
+import logging
+import sys
+
+import numpy as np
+import pytest
+
+from src.core.orchestration import MODE_CASCADE, ExtractionMethod, ExtractionOrchestrator
+from src.utils import logger as logger_module
+from src.utils.logger import get_logger, setup_logging
+from src.utils.metrics import stage_timer
+
+
+@pytest.fixture
+def configure(monkeypatch):
+    """setup_logging into a buffer; returns a function that configures and one that flushes and reads."""
+    root, app = logging.getLogger(), logging.getLogger("invisiguard")
+    handlers, levels = list(root.handlers), (root.level, app.level)
+    buffer = io.StringIO()
+
+    def setup(sampling):
+        # Inside the test: pytest swaps sys.stdout back after fixture setup
+        monkeypatch.setattr(sys, "stdout", buffer)
+        setup_logging("DEBUG", sampling=sampling)
+
+    def read():
+        logger_module._stop_listener()
+        return buffer.getvalue()
+
+    yield setup, read
+    logger_module._stop_listener()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(levels[0])
+    app.setLevel(levels[1])
+
+
+def test_sampling_applies_to_child_loggers(configure):
+    setup, read = configure
+    setup({"invisiguard.src.core": 0.0, "invisiguard.src.core.codec": 1.0})
+    get_logger("src.core.extraction").debug("dropped debug")
+    get_logger("src.core.extraction").warning("kept warning")
+    get_logger("src.core.codec").info("kept by the more specific rate")
+    get_logger("src.api.routes").info("kept elsewhere")
+    logged = read()
+    assert "dropped debug" not in logged
+    for message in ("kept warning", "kept by the more specific rate", "kept elsewhere"):
+        assert message in logged
+
+
+def test_stage_records_use_the_stages_logger(configure):
+    setup, read = configure
+    setup({"invisiguard.stages": 0.0})
+    method = ExtractionMethod("fake", lambda image: (True, "text", {}), cost=1.0, priority=0)
+    ExtractionOrchestrator([method], mode=MODE_CASCADE).run(np.zeros((8, 8), np.uint8))
+    with stage_timer("decode"):
+        pass
+    get_logger("src.core.orchestration").debug("module record")
+    logged = read()
+    assert "Stage:" not in logged
+    assert "module record" in logged
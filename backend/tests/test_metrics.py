@@ -0,0 +1,125 @@
+"""Prometheus exposition: the text format of each metric type and the series /metrics reports after real requests."""
+
+import math
+import re
+
+import cv2
+import pytest
+from fastapi.testclient import TestClient
+
+from src.utils.metrics import CONTENT_TYPE, Counter, Gauge, Histogram, Registry
+from tests.conftest import gradient_image
+
+TEXT = "metrics test"
+SAMPLE = re.compile(r'^([a-z_:][a-z0-9_:]*)(\{[^}]*\})? (\S+)$')
+
+
+@pytest.fixture(scope="module")
+def client(app):
+    return TestClient(app)
+
+
+def _families(text: str) -> dict:
+    """Metric name -> {"help", "type", "samples": [(sample name, labels, value)]}, checking the line grammar."""
+    families, name = {}, None
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            name, _, documentation = line[len("# HELP "):].partition(" ")
+            families[name] = {"help": documentation, "samples": []}
+        elif line.startswith("# TYPE "):
+            typed, _, kind = line[len("# TYPE "):].partition(" ")
+            assert typed == name, f"TYPE of {typed} does not follow its HELP"
+            families[name]["type"] = kind
+        else:
+            match = SAMPLE.match(line)
+            assert match, f"not a sample line: {line!r}"
+            assert name is not None and match.group(1).startswith(name)
+            families[name]["samples"].append((match.group(1), match.group(2) or "", float(match.group(3))))
+    return families
+
+
+def _check_histogram(name: str, samples: list):
+    """Per label set: non-decreasing cumulative buckets ending in +Inf, whose last count equals _count."""
+    series = {}
+    for sample, labels, value in samples:
+        le = re.search(r'le="([^"]*)"', labels)
+        key = re.sub(r',?le="[^"]*"', "", labels).replace("{}", "")
+        parts = series.setdefault(key, {"buckets": []})
+        if le:
+            parts["buckets"].append((le.group(1), value))
+        else:
+            parts[sample[len(name):]] = value
+    for parts in series.values():
+        bounds, counts = zip(*parts["buckets"])
+        assert bounds[-1] == "+Inf"
+        assert [float(bound) for bound in bounds[:-1]] == sorted(float(bound) for bound in bounds[:-1])
+        assert list(counts) == sorted(counts)
+        assert counts[-1] == parts["_count"]
+        assert "_sum" in parts
+
+
+def test_each_metric_type_renders_the_text_format():
+    registry = Registry()
+    counter = Counter("demo_events_total", "Events", ("kind",), registry=registry)
+    gauge = Gauge("demo_depth", "Depth", registry=registry)
+    histogram = Histogram("demo_seconds", "Latency", ("stage",), buckets=(0.1, 1.0), registry=registry)
+    counter.inc(kind='a"b')
+    counter.inc(2, kind="plain")
+    gauge.set(3)
+    for value in (0.05, 0.5, 0.5, 7.0):
+        histogram.observe(value, stage="x")
+
+    assert registry.render().splitlines() == [
+        "# HELP demo_events_total Events",
+        "# TYPE demo_events_total counter",
+        'demo_events_total{kind="a\\"b"} 1',
+        'demo_events_total{kind="plain"} 2',
+        "# HELP demo_depth Depth",
+        "# TYPE demo_depth gauge",
+        "demo_depth 3",
+        "# HELP demo_seconds Latency",
+        "# TYPE demo_seconds histogram",
+        'demo_seconds_bucket{stage="x",le="0.1"} 1',
+        'demo_seconds_bucket{stage="x",le="1"} 3',
+        'demo_seconds_bucket{stage="x",le="+Inf"} 4',
+        'demo_seconds_sum{stage="x"} 8.05',
+        'demo_seconds_count{stage="x"} 4',
+    ]
+    with pytest.raises(ValueError):
+        counter.inc(-1, kind="plain")
+    with pytest.raises(ValueError):
+        histogram.observe(1.0)
+
+
+def test_metrics_after_embed_and_verify(client):
+    upload = {"file": ("photo.png", cv2.imencode(".png", gradient_image(256, 320))[1].tobytes(), "image/png")}
+    # The same text twice: the second payload encode is a cache hit
+    for _ in range(2):
+        embedded = client.post("/v1/embed", files=upload, data={"text": TEXT, "alpha": 1.0})
+        assert embedded.status_code == 200
+    watermarked = client.get(embedded.json()["data"]["image_url"]).content
+    # A legacy embedding: the tiled decode fails first and falls back
+    verified = client.post("/v1/verify", files={"image": ("watermarked.png", watermarked, "image/png")})
+    assert verified.json()["data"]["verified"]
+
+    response = client.get("/metrics")
+    assert response.headers["content-type"] == CONTENT_TYPE
+    families = _families(response.text)
+    for name, family in families.items():
+        assert family["help"] and family["type"] in ("counter", "gauge", "histogram"), name
+        if family["type"] == "histogram":
+            _check_histogram(name, family["samples"])
+
+    stages = {re.search(r'stage="([^"]*)"', labels).group(1)
+              for _, labels, _ in families["invisiguard_stage_duration_seconds"]["samples"]}
+    assert {"upload", "decode", "dwt", "qim", "reconstruct", "rs_encode", "rs_decode", "embed", "metrics", "save",
+            "screen", "tiled_decode", "legacy_fallback", "extract"} <= stages
+
+    def value(name, labels=""):
+        return next(v for sample, sample_labels, v in families[name]["samples"] if sample == name and sample_labels == labels)
+
+    assert value("invisiguard_fallbacks_total", '{fallback="tiled_to_legacy"}') >= 1
+    assert value("invisiguard_rs_decodes_total", '{result="clean"}') >= 1
+    assert value("invisiguard_rs_encode_cache_hits_total") >= 1
+    assert value("invisiguard_rs_encode_cache_misses_total") >= 1
+    assert math.isfinite(value("invisiguard_executor_queued_jobs"))
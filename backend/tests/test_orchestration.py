@@ -0,0 +1,122 @@
+"""Extraction orchestrator: first success wins and cancels the rest; cascade order; failure reporting."""
+
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from src.core import orchestration
+from src.core.embedding import WatermarkEmbedder
+from src.core.extraction import WatermarkExtractor
+from src.core.layout import LAYOUT_TILED
+from src.core.orchestration import MODE_CASCADE, MODE_CONCURRENT, ExtractionMethod, ExtractionOrchestrator, standard_methods
+from src.utils.cancellation import DEADLINE_EXCEEDED, SUPERSEDED, CancelToken, OperationCancelled, cancel_scope, checkpoint
+
+IMAGE = np.zeros((8, 8), np.uint8)
+
+
+class Recorder:
+    """Builds fake methods and records which ran and how the slow ones ended."""
+
+    def __init__(self):
+        self.calls = []
+        self.outcomes = {}
+        self.stopped = threading.Event()
+
+    def method(self, name, ok, priority, cost=1.0, seconds=0.0):
+        def run(image):
+            self.calls.append(name)
+            end = time.monotonic() + seconds
+            try:
+                while time.monotonic() < end:
+                    checkpoint()
+                    time.sleep(0.005)
+            except OperationCancelled as e:
+                self.outcomes[name] = e.reason
+                self.stopped.set()
+                raise
+            self.outcomes[name] = "finished"
+            return ok, f"{name} text" if ok else f"{name} failed", {"method": name}
+        return ExtractionMethod(name, run, cost=cost, priority=priority)
+
+
+@pytest.fixture(autouse=True)
+def threads(monkeypatch):
+    # Run the concurrent mode in parallel whatever the cores of the test machine
+    monkeypatch.setattr(orchestration, "job_threads", lambda: 4)
+
+
+def test_first_success_cancels_the_slower_methods():
+    recorder = Recorder()
+    orchestrator = ExtractionOrchestrator([
+        recorder.method("slow", True, priority=0, seconds=5),
+        recorder.method("fast", True, priority=1, seconds=0.05),
+    ], mode=MODE_CONCURRENT)
+    started = time.monotonic()
+    result, attempts = orchestrator.run(IMAGE)
+    assert time.monotonic() - started < 2
+    assert (result.method, result.ok, result.text) == ("fast", True, "fast text")
+    assert [a.method for a in attempts] == ["fast"]
+    assert recorder.stopped.wait(2)
+    assert recorder.outcomes["slow"] == SUPERSEDED
+
+
+def test_all_failing_reports_the_most_reliable_method():
+    recorder = Recorder()
+    orchestrator = ExtractionOrchestrator([
+        recorder.method("dct", False, priority=2, seconds=0.0),
+        recorder.method("tiled", False, priority=0, seconds=0.02),
+        recorder.method("legacy", False, priority=1, seconds=0.01),
+    ], mode=MODE_CONCURRENT)
+    result, attempts = orchestrator.run(IMAGE)
+    assert (result.method, result.ok) == ("tiled", False)
+    assert sorted(a.method for a in attempts) == ["dct", "legacy", "tiled"]
+
+
+def test_cascade_runs_by_priority_then_cost_and_stops_at_success():
+    recorder = Recorder()
+    orchestrator = ExtractionOrchestrator([
+        recorder.method("cheap", False, priority=1, cost=1.0),
+        recorder.method("first", False, priority=0, cost=50.0),
+        recorder.method("pricey", True, priority=1, cost=10.0),
+        recorder.method("never", True, priority=2),
+    ], mode=MODE_CASCADE)
+    result, attempts = orchestrator.run(IMAGE)
+    assert recorder.calls == ["first", "cheap", "pricey"]
+    assert result.method == "pricey"
+    assert [a.ok for a in attempts] == [False, False, True]
+
+
+def test_cancelled_request_cancels_every_method():
+    recorder = Recorder()
+    orchestrator = ExtractionOrchestrator([
+        recorder.method("a", True, priority=0, seconds=5),
+        recorder.method("b", True, priority=1, seconds=5),
+    ], mode=MODE_CONCURRENT)
+    token = CancelToken()
+    threading.Timer(0.1, token.cancel, (DEADLINE_EXCEEDED,)).start()
+    with cancel_scope(token), pytest.raises(OperationCancelled):
+        orchestrator.run(IMAGE)
+    deadline = time.monotonic() + 2
+    while len(recorder.outcomes) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert recorder.outcomes == {"a": DEADLINE_EXCEEDED, "b": DEADLINE_EXCEEDED}
+
+
+def test_invalid_configuration_is_rejected():
+    with pytest.raises(ValueError):
+        ExtractionOrchestrator(mode="sometimes")
+    with pytest.raises(ValueError):
+        ExtractionOrchestrator(mode=MODE_CASCADE).run(IMAGE)
+
+
+@pytest.mark.parametrize("mode", (MODE_CONCURRENT, MODE_CASCADE))
+def test_standard_methods_decode_a_tiled_embedding(mode):
+    rng = np.random.default_rng(0)
+    image = cv2.GaussianBlur(rng.integers(0, 256, (300, 300, 3), dtype=np.uint8), (7, 7), 0)
+    watermarked = WatermarkEmbedder().embed_watermark_dwt_qim(image, "orchestrated", 2.0, layout=LAYOUT_TILED)
+    result, _ = ExtractionOrchestrator(standard_methods(WatermarkExtractor()), mode=mode).run(watermarked)
+    assert (result.ok, result.text) == (True, "orchestrated")
+    assert result.info["alpha_detected"] == 2.0
@@ -0,0 +1,53 @@
+"""Opt-in profiling: only token holders are profiled, and only they can download the artifacts."""
+
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.services import profiling, storage
+
+TOKEN = "secret-token"
+
+
+@pytest.fixture
+def static_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", TOKEN)
+    os.makedirs(profiling.PROFILE_DIR)
+    os.makedirs(storage.OUTPUT_DIR)
+    return tmp_path
+
+
+def test_profiles_only_requests_with_the_token(static_dir):
+    app = FastAPI()
+    app.get("/work")(lambda: {"ok": True})
+    client = TestClient(profiling.ProfilingMiddleware(app))
+
+    assert profiling.PROFILE_ID_HEADER not in client.get("/work").headers
+    assert profiling.PROFILE_ID_HEADER not in client.get("/work", headers={profiling.PROFILE_HEADER: "wrong"}).headers
+    # The token is only accepted as a header, never from the query string
+    assert profiling.PROFILE_ID_HEADER not in client.get("/work", params={"profile": TOKEN}).headers
+    assert os.listdir(profiling.PROFILE_DIR) == []
+
+    response = client.get("/work", headers={profiling.PROFILE_HEADER: TOKEN})
+    assert response.json() == {"ok": True}
+    profile_id = response.headers[profiling.PROFILE_ID_HEADER]
+    assert f"profile_{profile_id}.txt" in os.listdir(profiling.PROFILE_DIR)
+
+
+def test_artifacts_require_the_token(static_dir):
+    with open(os.path.join(profiling.PROFILE_DIR, "profile_1.txt"), "w") as f:
+        f.write("summary")
+    with open(os.path.join(storage.OUTPUT_DIR, "output.png"), "wb") as f:
+        f.write(b"png")
+    app = FastAPI()
+    app.mount("/static", storage.OutputFiles(directory=storage.STATIC_DIR))
+    client = TestClient(app)
+
+    assert client.get("/static/debug/profile_1.txt").status_code == 404
+    assert client.get("/static/debug/profile_1.txt", headers={profiling.PROFILE_HEADER: "wrong"}).status_code == 404
+    assert client.get("/static/debug/profile_1.txt", params={"profile": TOKEN}).status_code == 404
+    assert client.get("/static/debug/profile_1.txt", headers={profiling.PROFILE_HEADER: TOKEN}).text == "summary"
+    assert client.get("/static/processed/output.png").content == b"png"
@@ -0,0 +1,46 @@
+"""Quality metrics: strip-only computation equals the full image, and matches the reference implementations."""
+
+import cv2
+import numpy as np
+import pytest
+from skimage.metrics import structural_similarity
+
+from src.core.quality import MAX_PSNR, measure
+
+
+@pytest.fixture(scope="module")
+def pair():
+    rng = np.random.default_rng(2)
+    original = cv2.GaussianBlur(rng.integers(0, 256, (240, 320, 3), dtype=np.uint8), (5, 5), 0)
+    processed = original.copy()
+    # Changes in both directions, so uint8 differences would wrap around
+    processed[:50] = np.clip(original[:50].astype(np.int16) + rng.integers(-4, 5, (50, 320, 3)), 0, 255)
+    return original, processed
+
+
+def test_matches_reference(pair):
+    original, processed = pair
+    mse = np.mean((original.astype(np.float64) - processed) ** 2)
+    gray = [cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) for image in pair]
+    metrics = measure(original, processed)
+    assert metrics["psnr"] == pytest.approx(20 * np.log10(255.0 / np.sqrt(mse)), abs=1e-9)
+    assert metrics["ssim"] == pytest.approx(structural_similarity(*gray), abs=1e-5)
+    gaussian = structural_similarity(*gray, gaussian_weights=True, sigma=1.5, use_sample_covariance=False)
+    assert measure(original, processed, window="gaussian")["ssim"] == pytest.approx(gaussian, abs=1e-5)
+
+
+@pytest.mark.parametrize("window", ("box", "gaussian"))
+def test_changed_rows_equal_full_image(pair, window):
+    full = measure(*pair, window=window)
+    strip = measure(*pair, changed_rows=50, window=window)
+    assert strip["psnr"] == pytest.approx(full["psnr"], abs=1e-9)
+    assert strip["ssim"] == pytest.approx(full["ssim"], abs=1e-6)
+
+
+def test_selection_and_identical_images(pair):
+    original, _ = pair
+    assert measure(original, original, changed_rows=0) == {"psnr": MAX_PSNR, "ssim": 1.0}
+    assert measure(*pair, metrics=("ssim",)).keys() == {"ssim"}
+    assert measure(*pair, metrics=()) == {}
+    with pytest.raises(ValueError):
+        measure(*pair, metrics=("mse",))
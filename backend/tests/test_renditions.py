@@ -0,0 +1,49 @@
+"""Preview renditions: bounded size, lazy caching, stable ETags and confinement to the source directory."""
+
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from src.services.renditions import RenditionCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    source_dir = tmp_path / "processed"
+    source_dir.mkdir()
+    image = np.random.default_rng(3).integers(0, 256, (600, 900, 3), dtype=np.uint8)
+    cv2.imwrite(str(source_dir / "output.png"), image)
+    return RenditionCache(str(source_dir), str(tmp_path / "renditions"))
+
+
+def test_generated_once_within_bounds(cache):
+    rendition = cache.lookup("output.png", 512, "jpeg")
+    assert not rendition.is_cached()
+    assert cache.source_dimensions(rendition) == (600, 900)
+    path = cache.generate(rendition)
+    assert cv2.imread(path).shape == (341, 512, 3)
+    assert rendition.is_cached()
+    # Same parameters, same ETag; other parameters, another one
+    assert cache.lookup("output.png", 512, "jpeg").etag == rendition.etag
+    assert cache.lookup("output.png", 256, "jpeg").etag != rendition.etag
+    assert os.listdir(cache.rendition_dir) == [os.path.basename(path)]
+
+
+def test_never_upscales(cache):
+    path = cache.generate(cache.lookup("output.png", 2048, "webp"))
+    assert cv2.imread(path).shape == (600, 900, 3)
+
+
+@pytest.mark.parametrize("filename", ("missing.png", "../processed/output.png", ".output.png"))
+def test_unknown_sources(cache, filename):
+    with pytest.raises(FileNotFoundError):
+        cache.lookup(filename)
+
+
+def test_unsupported_parameters(cache):
+    with pytest.raises(ValueError):
+        cache.lookup("output.png", 300)
+    with pytest.raises(ValueError):
+        cache.lookup("output.png", fmt="gif")
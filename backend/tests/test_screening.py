@@ -0,0 +1,68 @@
+"""Negative screening: the threshold comes from the calibration, clean images are rejected, watermarked ones pass."""
+
+import json
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from src.core.embedding import WatermarkEmbedder
+from src.core.extraction import SCREEN_MIN_COHERENCE, WatermarkExtractor
+from src.core.layout import LAYOUT_TILED, SUPPORTED_LAYOUTS, SUPPORTED_LEVELS
+from tests.conftest import photo
+
+CALIBRATION = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "screening_calibration.json")
+TEXT = "screen test"
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    return WatermarkExtractor()
+
+
+@pytest.fixture(scope="module")
+def calibration():
+    with open(CALIBRATION) as f:
+        return json.load(f)
+
+
+def test_threshold_is_the_calibrated_one(calibration):
+    # Re-run benchmarks/calibrate_screening.py and update SCREEN_MIN_COHERENCE together
+    assert SCREEN_MIN_COHERENCE == calibration["suggested_threshold"]
+    assert calibration["clean_valid_coherence"]["max"] < SCREEN_MIN_COHERENCE
+
+
+@pytest.mark.parametrize("name", ("camera", "coffee", "page", "moon"))
+def test_clean_photographs_are_screened_out(extractor, name):
+    image = photo(name)
+    assert not extractor.screen_watermark(image)[0]
+    jpeg = cv2.imdecode(cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 85])[1], cv2.IMREAD_COLOR)
+    assert not extractor.screen_watermark(jpeg)[0]
+    ok, _, info = extractor.extract_multi_delta(image)
+    assert not ok and info.get("screened_out")
+
+
+def test_flat_and_noise_images_are_screened_out(extractor):
+    rng = np.random.default_rng(0)
+    assert not extractor.screen_watermark(np.full((512, 512, 3), 200, np.uint8))[0]
+    assert not extractor.screen_watermark(rng.integers(0, 256, (512, 512, 3), dtype=np.uint8))[0]
+
+
+@pytest.mark.parametrize("layout", SUPPORTED_LAYOUTS)
+@pytest.mark.parametrize("level", SUPPORTED_LEVELS)
+def test_watermarked_images_pass(extractor, layout, level):
+    embedder = WatermarkEmbedder()
+    for name in ("astronaut", "coffee"):
+        for alpha in (0.3, 2.0):
+            watermarked = embedder.embed_watermark_dwt_qim(photo(name), TEXT, alpha, layout=layout, level=level)
+            likely, score = extractor.screen_watermark(watermarked)
+            assert likely and score >= SCREEN_MIN_COHERENCE
+            assert extractor.extract_multi_delta(watermarked)[1] == TEXT
+
+
+def test_cropped_tiled_image_passes(extractor):
+    watermarked = WatermarkEmbedder().embed_watermark_dwt_qim(photo("astronaut"), TEXT, 1.0, layout=LAYOUT_TILED)
+    cropped = watermarked[37:, 61:]
+    assert extractor.screen_watermark(cropped)[0]
+    assert extractor.extract_multi_delta(cropped)[1] == TEXT
@@ -0,0 +1,65 @@
+"""Content-hashed output storage and its cache headers."""
+
+import hashlib
+import os
+
+import numpy as np
+import pytest
+
+from src.core.layout import LAYOUT_LEGACY
+from src.services import storage
+from src.services.watermark import WatermarkService
+from src.utils.cancellation import CLIENT_DISCONNECTED, CancelToken, OperationCancelled, cancel_scope
+
+
+def test_content_hashed_names_deduplicate(tmp_path):
+    image = np.random.default_rng(4).integers(0, 256, (32, 48, 3), dtype=np.uint8)
+    filename, created = storage.save_output(image, "signal_", str(tmp_path))
+    content = (tmp_path / filename).read_bytes()
+    assert filename == f"signal_{hashlib.sha256(content).hexdigest()[:storage.HASH_LENGTH]}.png"
+    assert created
+    assert storage.save_output(image, "signal_", str(tmp_path)) == (filename, False)
+    other, _ = storage.save_output(image[::-1], "signal_", str(tmp_path))
+    assert other != filename
+    assert sorted(os.listdir(tmp_path)) == sorted([filename, other])
+
+
+def test_failed_write_leaves_no_temporary(tmp_path, monkeypatch):
+    def disk_full(source, destination):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(os, "replace", disk_full)
+    with pytest.raises(OSError):
+        storage.save_output(np.zeros((8, 8, 3), dtype=np.uint8), "", str(tmp_path))
+    assert os.listdir(tmp_path) == []
+
+
+def test_cancelled_embed_keeps_shared_outputs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(storage.OUTPUT_DIR)
+    image = np.random.default_rng(5).integers(0, 256, (256, 256, 3), dtype=np.uint8)
+    token = CancelToken()
+    save = storage.save_output
+    handed_out = []
+
+    def save_then_cancel(output, prefix=""):
+        result = save(output, prefix)
+        # A concurrent request with identical content is given the same file, then this one is abandoned
+        handed_out.append(save(output, prefix)[0])
+        token.cancel(CLIENT_DISCONNECTED)
+        return result
+
+    monkeypatch.setattr(storage, "save_output", save_then_cancel)
+    with cancel_scope(token), pytest.raises(OperationCancelled):
+        WatermarkService(max_workers=1)._embed(image, "shared", 1.0, LAYOUT_LEGACY)
+    assert handed_out
+    assert all(os.path.exists(os.path.join(storage.OUTPUT_DIR, name)) for name in handed_out)
+
+
+@pytest.mark.parametrize("path, headers", (
+    (os.path.join("static", "processed", f"{'a' * 32}.png"), {"Cache-Control": storage.IMMUTABLE, "ETag": f'"{"a" * 32}"'}),
+    (os.path.join("static", "renditions", f"{'a' * 32}_512.webp"), {"Cache-Control": storage.IMMUTABLE}),
+    (os.path.join("static", "debug", "profile_1.txt"), {}),
+))
+def test_cache_headers(path, headers):
+    assert storage.cache_headers(path) == headers
@@ -0,0 +1,90 @@
+"""Tiled layout and multi-delta verify: round trips, cropped regions and the reported embedding strength."""
+
+import cv2
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.api import routes
+from src.core.embedding import WatermarkEmbedder
+from src.core.extraction import WatermarkExtractor
+from src.core.layout import LAYOUT_TILED, SUPPORTED_LAYOUTS, SUPPORTED_LEVELS, TILE_SIZE
+from tests.conftest import photo
+
+TEXT = "tiled test"
+
+
+@pytest.fixture(scope="module")
+def engines():
+    return WatermarkEmbedder(), WatermarkExtractor()
+
+
+@pytest.fixture(scope="module")
+def tiled(engines):
+    return engines[0].embed_watermark_dwt_qim(photo("astronaut"), TEXT, 1.0, layout=LAYOUT_TILED)
+
+
+def test_tiled_round_trip_with_known_alpha(engines, tiled):
+    ok, text, info = engines[1].extract_watermark_tiled(tiled, alpha=1.0)
+    assert (ok, text) == (True, TEXT)
+    assert info["tile_origin"] == (0, 0)
+    assert info["tiles_tried"] == 1
+    # The wrong strength finds no sync marker
+    assert not engines[1].extract_watermark_tiled(tiled, alpha=2.0)[0]
+
+
+@pytest.mark.parametrize("top, left", ((0, 0), (17, 29), (101, 6)))
+def test_cropped_copy_verifies(engines, tiled, top, left):
+    cropped = tiled[top:top + 5 * TILE_SIZE, left:left + 5 * TILE_SIZE]
+    ok, text, info = engines[1].extract_multi_delta(cropped)
+    assert (ok, text) == (True, TEXT)
+    assert info["layout_version"] == LAYOUT_TILED
+    assert info["alpha_detected"] == 1.0
+
+
+def test_region_restricts_the_search(engines, tiled):
+    extractor = engines[1]
+    ok, text, _ = extractor.extract_watermark_tiled(tiled, alpha=1.0, region=(53, 31, 300, 280))
+    assert (ok, text) == (True, TEXT)
+    assert extractor.extract_multi_delta(tiled, region=(53, 31, 300, 280))[1] == TEXT
+    # A region smaller than a tile holds no complete copy
+    assert not extractor.extract_watermark_tiled(tiled, alpha=1.0, region=(53, 31, TILE_SIZE, TILE_SIZE))[0]
+
+
+def test_region_outside_the_image_is_rejected(engines, tiled):
+    # The engine fails cleanly on an empty crop ...
+    assert not engines[1].extract_multi_delta(tiled, region=(10000, 0, 10, 10))[0]
+    # ... and the API answers 400 before decoding; a region running over the edge is clipped
+    app = FastAPI()
+    app.include_router(routes.router, prefix="/v1")
+    client = TestClient(app)
+    image = cv2.imencode(".png", tiled)[1].tobytes()
+    height, width = tiled.shape[:2]
+
+    def verify(x, y, w, h):
+        return client.post("/v1/verify", files={"image": ("image.png", image, "image/png")},
+                           data={"region_x": x, "region_y": y, "region_width": w, "region_height": h})
+
+    response = verify(width, 0, 10, 10)
+    assert response.status_code == 400
+    assert response.json()["error_code"] == "INVALID_REGION"
+    assert verify(0, height + 5, 10, 10).status_code == 400
+    clipped = verify(53, 31, 10 * width, 10 * height)
+    assert clipped.status_code == 200
+    assert clipped.json()["data"]["watermark_text"] == TEXT
+
+
+@pytest.mark.parametrize("name", ("chelsea", "coffee"))
+@pytest.mark.parametrize("layout", SUPPORTED_LAYOUTS)
+@pytest.mark.parametrize("level", SUPPORTED_LEVELS)
+def test_multi_delta_reports_alpha(engines, name, layout, level):
+    embedder, extractor = engines
+    image = photo(name)
+    # Images smaller than one tile at this level fall back to the legacy layout
+    expected = embedder.plan_embedding(image.shape, TEXT, layout, level).layout
+    for alpha in (0.3, 0.5, 2.0, 3.7):
+        watermarked = embedder.embed_watermark_dwt_qim(image, TEXT, alpha, layout=layout, level=level)
+        ok, text, info = extractor.extract_multi_delta(watermarked)
+        assert (ok, text) == (True, TEXT)
+        assert (info["layout_version"], info["dwt_level"]) == (expected, level)
+        assert info["alpha_detected"] == alpha
@@ -0,0 +1,50 @@
+"""Quality-target alpha search: the chosen image and metrics match a direct embed at that alpha."""
+
+import cv2
+import numpy as np
+import pytest
+from skimage.metrics import structural_similarity
+
+from src.core.embedding import WatermarkEmbedder
+from src.core.layout import LAYOUT_LEGACY, LAYOUT_TILED
+from src.core.tuning import SEARCH_ALPHAS, AlphaSearch
+from tests.conftest import gradient_image
+
+TEXT = "target test"
+
+
+@pytest.fixture(scope="module")
+def image():
+    return gradient_image(480, 640, seed=1, noise=15, blur=5)
+
+
+def _psnr(a, b):
+    mse = np.mean((a.astype(np.float64) - b.astype(np.float64)) ** 2)
+    return 20 * np.log10(255.0 / np.sqrt(mse))
+
+
+def _ssim(a, b):
+    return structural_similarity(cv2.cvtColor(a, cv2.COLOR_BGR2GRAY), cv2.cvtColor(b, cv2.COLOR_BGR2GRAY))
+
+
+@pytest.mark.parametrize("layout", (LAYOUT_TILED, LAYOUT_LEGACY))
+@pytest.mark.parametrize("targets", ({"target_psnr": 45.0}, {"target_ssim": 0.99}, {"target_psnr": 45.0, "target_ssim": 0.995}))
+def test_search_matches_direct_embed(image, layout, targets):
+    embedder = WatermarkEmbedder()
+    result = AlphaSearch(embedder, image, TEXT, layout).run(**targets)
+    direct = embedder.embed_watermark_dwt_qim(image, TEXT, result.alpha, layout=layout)
+    assert np.array_equal(result.image, direct)
+    assert result.psnr == pytest.approx(_psnr(image, direct), abs=1e-9)
+    # SSIM is computed in float32
+    assert result.ssim == pytest.approx(_ssim(image, direct), abs=1e-5)
+    assert result.target_met
+    assert result.psnr >= targets.get("target_psnr", 0) and result.ssim >= targets.get("target_ssim", 0)
+    # The next stronger alpha misses a target (unless the search already picked the strongest)
+    if result.alpha != SEARCH_ALPHAS[-1]:
+        stronger = embedder.embed_watermark_dwt_qim(image, TEXT, round(result.alpha + 0.1, 1), layout=layout)
+        assert _psnr(image, stronger) < targets.get("target_psnr", 0) or _ssim(image, stronger) < targets.get("target_ssim", 0)
+
+
+def test_unreachable_target_uses_weakest_alpha(image):
+    result = AlphaSearch(WatermarkEmbedder(), image, TEXT).run(target_psnr=90.0)
+    assert (result.alpha, result.target_met) == (SEARCH_ALPHAS[0], False)
@@ -1,4 +1,5 @@
 import React, { useEffect, useRef, useState } from 'react'
+import { previewUrl } from '../services/api'
 
 export default function ComparisonView({ originalUrl, processedUrl, signalMapUrl, metrics }) {
   const [viewMode, setViewMode] = useState('processed')
@@ -94,13 +95,13 @@ export default function ComparisonView({ originalUrl, processedUrl, signalMapUrl
           </h4>
           <div className="rounded-2xl overflow-hidden border border-slate-200 shadow-sm bg-slate-50 aspect-auto relative group">
               {viewMode === 'processed' && (
-                <img src={processedUrl} alt="Watermarked" className="w-full h-full object-contain" />
+                <img src={previewUrl(processedUrl)} alt="Watermarked" className="w-full h-full object-contain" />
               )}
               {viewMode === 'diff' && (
                 <canvas ref={canvasRef} className="w-full h-full object-contain bg-black/90" />
               )}
               {viewMode === 'signal' && (
-                <img src={signalMapUrl} alt="Signal Map" className="w-full h-full object-contain" />
+                <img src={previewUrl(signalMapUrl)} alt="Signal Map" className="w-full h-full object-contain" />
               )}
           </div>
         </div>
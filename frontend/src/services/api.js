@@ -7,4 +7,9 @@ const api = axios.create({
   // For JSON, Axios will set application/json
 });
 
+// Bounded-size WebP preview of a processed output (image_url / signal_map_url), for display only:
+// downloads and the pixel-exact difference map keep using the full-resolution URL.
+export const previewUrl = (url, maxDim = 1024) =>
+  url ? `${api.defaults.baseURL}/renditions/${url.split('/').pop()}?max_dim=${maxDim}` : url;
+
 export default api;